@@ -51,13 +51,18 @@ def setup_logging(app):
     app.logger.info('Server Monitoring application starting...')
 
 
+def load_config(app, config_name=None):
+    """Load the configuration class selected by name or FLASK_ENV."""
+    from app.config import config
+    config_name = config_name or os.environ.get('FLASK_ENV', 'default')
+    app.config.from_object(config.get(config_name, config['default']))
+
+
 def create_app(config_name=None):
     app = Flask(__name__)
     
     # Load configuration
-    from app.config import config
-    config_name = config_name or os.environ.get('FLASK_ENV', 'default')
-    app.config.from_object(config.get(config_name, config['default']))
+    load_config(app, config_name)
     
     # Initialize logging
     setup_logging(app)
@@ -109,6 +114,19 @@ def create_app(config_name=None):
     return app
 
 
+def create_worker_app(config_name=None):
+    """Create a minimal app for background workers.
+    
+    Only configuration, logging and the database are set up: no blueprints,
+    login, CSRF or CORS, and the in-process scheduler is never started.
+    """
+    app = Flask(__name__)
+    load_config(app, config_name)
+    setup_logging(app)
+    db.init_app(app)
+    return app
+
+
 def register_error_handlers(app):
     """Register error handlers for the application."""
     from flask import render_template, jsonify, request, flash, redirect, url_for
@@ -28,6 +28,13 @@ class Config:
     
     # Pagination
     ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE', 20))
+    # Dashboard rows per page; further pages load while scrolling
+    DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', 100))
+    # Live dashboard updates (/api/events): streams reconnect after
+    # DASHBOARD_EVENTS_MAX_SECONDS; without PostgreSQL LISTEN/NOTIFY each web
+    # process checks for new poll results every DASHBOARD_EVENTS_POLL_SECONDS
+    DASHBOARD_EVENTS_MAX_SECONDS = int(os.environ.get('DASHBOARD_EVENTS_MAX_SECONDS', 300))
+    DASHBOARD_EVENTS_POLL_SECONDS = int(os.environ.get('DASHBOARD_EVENTS_POLL_SECONDS', 5))
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -35,6 +42,64 @@ class Config:
     
     # SNMP Polling
     SNMP_POLL_INTERVAL_MINUTES = int(os.environ.get('SNMP_POLL_INTERVAL', 5))
+    # Maximum number of SNMP requests in flight at once
+    SNMP_POLL_CONCURRENCY = int(os.environ.get('SNMP_POLL_CONCURRENCY', 50))
+    # Requests still pending after this many seconds are abandoned for the cycle
+    SNMP_POLL_DEADLINE_SECONDS = int(os.environ.get('SNMP_POLL_DEADLINE', 240))
+    SNMP_TIMEOUT_SECONDS = int(os.environ.get('SNMP_TIMEOUT', 2))
+    SNMP_RETRIES = int(os.environ.get('SNMP_RETRIES', 0))
+    # OIDs of one server are batched into GET PDUs of at most this many varbinds
+    SNMP_MAX_VARBINDS = int(os.environ.get('SNMP_MAX_VARBINDS', 20))
+    # Rows requested per GETBULK when walking vendor table columns (polling and discovery)
+    SNMP_MAX_REPETITIONS = int(os.environ.get('SNMP_MAX_REPETITIONS', 25))
+    
+    # JSON file of status classification rules (reloaded when it changes);
+    # unset uses app/scheduler/classification_rules.json
+    CLASSIFICATION_RULES = os.environ.get('CLASSIFICATION_RULES')
+    
+    # Poll results are bulk inserted and committed in chunks of this many rows.
+    # METRIC_WRITE_METHOD: 'copy' (PostgreSQL COPY), 'insert' (executemany) or 'auto'
+    METRIC_WRITE_CHUNK_SIZE = int(os.environ.get('METRIC_WRITE_CHUNK_SIZE', 1000))
+    METRIC_WRITE_METHOD = os.environ.get('METRIC_WRITE_METHOD', 'auto')
+    
+    # Rollups: minutes between runs of the hourly/daily downsampling job,
+    # raw metric ids read per batch, and the age in seconds below which raw
+    # rows are left for the next run (must exceed the longest poll write)
+    ROLLUP_INTERVAL_MINUTES = int(os.environ.get('ROLLUP_INTERVAL', 15))
+    ROLLUP_BATCH_SIZE = int(os.environ.get('ROLLUP_BATCH_SIZE', 50000))
+    ROLLUP_LAG_SECONDS = int(os.environ.get('ROLLUP_LAG_SECONDS', 600))
+    
+    # Monthly metric partitions (PostgreSQL) created ahead of the current month
+    METRIC_PARTITION_MONTHS_AHEAD = int(os.environ.get('METRIC_PARTITION_MONTHS_AHEAD', 3))
+    
+    # Raw metric retention: rows older than METRIC_RETENTION_DAYS (0 keeps them
+    # forever) are pruned daily at RETENTION_HOUR, RETENTION_BATCH_SIZE rows per
+    # transaction with RETENTION_BATCH_PAUSE seconds between batches, for at
+    # most RETENTION_MAX_SECONDS per run. Only months with archived monthly
+    # reports are pruned; the archives are built first unless
+    # RETENTION_KEEP_REPORTS is false.
+    METRIC_RETENTION_DAYS = int(os.environ.get('METRIC_RETENTION_DAYS', 365))
+    RETENTION_HOUR = int(os.environ.get('RETENTION_HOUR', 2))
+    RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', 5000))
+    RETENTION_BATCH_PAUSE = float(os.environ.get('RETENTION_BATCH_PAUSE', 0.5))
+    RETENTION_MAX_SECONDS = int(os.environ.get('RETENTION_MAX_SECONDS', 600))
+    RETENTION_KEEP_REPORTS = os.environ.get('RETENTION_KEEP_REPORTS', 'true').lower() == 'true'
+    
+    # Reports: rows fetched per server-side cursor round trip during export
+    REPORT_CHUNK_SIZE = int(os.environ.get('REPORT_CHUNK_SIZE', 5000))
+    
+    # Background report jobs: worker threads per web process, report cache
+    # directory, seconds without progress before a running job is considered
+    # dead, and hours a finished job is kept
+    REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+    REPORT_DIR = os.environ.get('REPORT_DIR', 'reports')
+    REPORT_JOB_STALE_SECONDS = int(os.environ.get('REPORT_JOB_STALE_SECONDS', 600))
+    REPORT_JOB_RETENTION_HOURS = int(os.environ.get('REPORT_JOB_RETENTION_HOURS', 24))
+    
+    # Scheduler leader election: only the process holding this lock polls.
+    # PostgreSQL uses an advisory lock with this key, other databases a lock file.
+    SCHEDULER_LOCK_ID = int(os.environ.get('SCHEDULER_LOCK_ID', 72616161))
+    SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE', 'logs/scheduler.lock')
 
 
 class DevelopmentConfig(Config):
@@ -48,8 +113,17 @@ class ProductionConfig(Config):
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
 
 
+class TestingConfig(Config):
+    TESTING = True
+    # In-memory SQLite unless TEST_DATABASE_URL points at a scratch database
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    WTF_CSRF_ENABLED = False
+    LOG_LEVEL = 'WARNING'
+
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
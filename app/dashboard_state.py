@@ -0,0 +1,222 @@
+"""Dashboard state: filtered, sorted and paginated rows of the latest metrics.
+
+Queries over servers, components and the latest_metric table shared by the
+dashboard routes and the event listener (app.events): keyset pagination
+cursors, the data version and change cursors of delta responses, the
+changes since a cursor, and the JSON form of a row.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, asc, desc, func, or_, select
+
+from app import db
+from app.models.metric import ComponentVersion, LatestMetric
+from app.models.server import Component, Server
+
+
+# ORDER BY key per sort option. Components without data sort after every
+# status and before the oldest timestamp (ascending).
+SORT_KEYS = {
+    'server': func.lower(Server.name),
+    'component': func.lower(Component.name),
+    'category': func.lower(Component.category),
+    'status': func.coalesce(LatestMetric.status, 'zzz'),
+    'timestamp': func.coalesce(LatestMetric.timestamp, datetime.min),
+}
+# Always ascending after the sort key; the last one is unique per row
+TIE_BREAKERS = (Server.name, Server.id, Component.id)
+
+
+class InvalidCursor(ValueError):
+    """Raised for a pagination cursor that can not be decoded or belongs to another sort."""
+
+
+def _pack(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _unpack(token):
+    return json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+
+
+def encode_cursor(sort_by, sort_order, values):
+    """Opaque cursor of the (sort key, *tie breakers) values of the last row of a page."""
+    return _pack([sort_by, sort_order, *values])
+
+
+def decode_cursor(cursor, sort_by, sort_order):
+    try:
+        cursor_sort, cursor_order, key, server_name, server_id, component_id = _unpack(cursor)
+        if sort_by == 'timestamp':
+            key = datetime.fromisoformat(key)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor') from None
+    if (cursor_sort, cursor_order) != (sort_by, sort_order):
+        raise InvalidCursor('Cursor does not match the sort order')
+    return key, server_name, server_id, component_id
+
+
+def get_data_version():
+    """Version of the dashboard data as a tuple, read in one round trip.
+
+    (newest change generation, newest poll timestamp, component count,
+    newest component id, newest component version id): the first changes
+    when a poll changes a value or status, the second with every poll and
+    the rest when components are added or deleted or, at their next poll,
+    when components or servers are edited.
+    """
+    return tuple(db.session.execute(select(
+        select(func.coalesce(func.max(LatestMetric.generation), 0)).scalar_subquery(),
+        select(func.max(LatestMetric.timestamp)).scalar_subquery(),
+        select(func.count(Component.id)).scalar_subquery(),
+        select(func.max(Component.id)).scalar_subquery(),
+        select(func.max(ComponentVersion.id)).scalar_subquery()
+    )).one())
+
+
+def encode_change_cursor(version):
+    """Opaque ``since`` cursor of a data version (see get_data_version)."""
+    return _pack(['changes', *version])
+
+
+def decode_change_cursor(cursor):
+    try:
+        kind, generation, polled, *catalog = _unpack(cursor)
+        if kind != 'changes' or len(catalog) != 3:
+            raise ValueError(kind)
+        return (int(generation), datetime.fromisoformat(polled) if polled else None, *catalog)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid change cursor') from None
+
+
+def _state_query(columns, server_filter=None, category='', status='', search='', changed_since=None):
+    """Query of ``columns`` over the servers, components and latest metrics matching the filters.
+
+    The latest metric comes from the latest_metric table maintained by the
+    poller and is NULL for components that have not been polled yet; status
+    'no_data' selects those. ``search`` is a case-insensitive substring of the
+    server name/IP or component name/OID. ``changed_since`` keeps only latest
+    metrics changed after that generation.
+    """
+    query = db.session.query(*columns).select_from(Server).join(
+        Component, Component.server_id == Server.id
+    ).outerjoin(
+        LatestMetric, LatestMetric.component_id == Component.id
+    )
+    if server_filter:
+        query = query.filter(Server.id.in_(server_filter))
+    if category:
+        query = query.filter(Component.category == category)
+    if status == 'no_data':
+        query = query.filter(LatestMetric.component_id.is_(None))
+    elif status:
+        query = query.filter(LatestMetric.status == status)
+    if search:
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query = query.filter(or_(
+            Server.name.ilike(pattern, escape='\\'),
+            Server.ip.ilike(pattern, escape='\\'),
+            Component.name.ilike(pattern, escape='\\'),
+            Component.oid.ilike(pattern, escape='\\')
+        ))
+    if changed_since is not None:
+        query = query.filter(LatestMetric.generation > changed_since)
+    return query
+
+
+def get_current_state(server_filter=None, category='', status='', search='', sort_by='server', sort_order='asc',
+                      cursor=None, limit=None, changed_since=None):
+    """Return the matching (server, component, latest metric) rows and the next cursor.
+
+    Filtering and sorting happen in SQL, ties keep the server name/component
+    order. With ``limit`` at most that many rows following ``cursor`` are
+    returned (keyset pagination, so later pages cost the same as the first)
+    and the next cursor is None once there are no more rows.
+    """
+    sort_key = SORT_KEYS.get(sort_by, SORT_KEYS['server'])
+    descending = sort_order == 'desc'
+    query = _state_query((Server, Component, LatestMetric, sort_key), server_filter, category, status, search,
+                         changed_since)
+
+    if cursor:
+        # Rows strictly after the cursor; only the sort key may be descending
+        keys = (sort_key,) + TIE_BREAKERS
+        values = decode_cursor(cursor, sort_by, sort_order)
+        query = query.filter(or_(*[
+            and_(*[key == value for key, value in zip(keys[:i], values[:i])],
+                 keys[i] < values[i] if descending and i == 0 else keys[i] > values[i])
+            for i in range(len(keys))
+        ]))
+
+    query = query.order_by(desc(sort_key) if descending else asc(sort_key), *TIE_BREAKERS)
+    if limit:
+        query = query.limit(limit + 1)
+    rows = query.all()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        server, component, _, key = rows[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, (key, server.name, server.id, component.id))
+    return [(server, component, metric) for server, component, metric, _ in rows], next_cursor
+
+
+def get_status_counts(server_filter=None, category='', status='', search='', **_):
+    """Number of matching components per latest status ('no_data' for never polled)."""
+    status_key = func.coalesce(LatestMetric.status, 'no_data')
+    query = _state_query((status_key, func.count(Component.id)), server_filter, category, status, search)
+    counts = {'OK': 0, 'Warning': 0, 'Critical': 0, 'no_data': 0}
+    counts.update(query.group_by(status_key).all())
+    return counts
+
+
+def get_changes(filters, since, version):
+    """Changes of the dashboard data after the ``since`` change cursor.
+
+    Returns None if they can not be expressed as a delta (components were
+    added, deleted or edited, or the cursor is invalid) and the client has to
+    reload. Otherwise returns (rows whose value or status changed and that
+    match the filters, ids of changed components that no longer match the
+    status filter, {server_id: poll timestamp} of servers polled since).
+    """
+    try:
+        generation, polled, *catalog = decode_change_cursor(since)
+    except InvalidCursor:
+        return None
+    if tuple(catalog) != version[2:]:
+        return None
+
+    rows, _ = get_current_state(**filters, changed_since=generation)
+    removed = []
+    if filters['status']:
+        matching = {component.id for _, component, _ in rows}
+        changed = _state_query((Component.id,), filters['server_filter'], filters['category'], '',
+                               filters['search'], generation).all()
+        removed = [component_id for component_id, in changed if component_id not in matching]
+
+    polls = db.session.query(LatestMetric.server_id, func.max(LatestMetric.timestamp)).group_by(LatestMetric.server_id)
+    if polled is not None:
+        polls = polls.filter(LatestMetric.timestamp > polled)
+    if filters['server_filter']:
+        polls = polls.filter(LatestMetric.server_id.in_(filters['server_filter']))
+    return rows, removed, dict(polls.all())
+
+
+def serialize_state(server, component, metric):
+    """JSON representation of a dashboard row."""
+    return {
+        'server_id': server.id,
+        'server_name': server.name,
+        'server_ip': server.ip,
+        'server_brand': server.brand,
+        'component_id': component.id,
+        'component_name': component.name,
+        'component_oid': component.oid,
+        'category': component.category,
+        'metric_value': metric.value if metric else None,
+        'metric_status': metric.status if metric else None,
+        'metric_timestamp': metric.timestamp.strftime('%Y-%m-%d %H:%M:%S') if metric else None
+    }
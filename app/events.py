@@ -0,0 +1,166 @@
+"""Push of dashboard changes to connected browsers (Server-Sent Events).
+
+The poller sends a PostgreSQL NOTIFY on ``CHANNEL`` in the transaction that
+commits a poll cycle (see upsert_latest_metrics). Every web process runs one
+listener thread that LISTENs on the channel and, per notification, reads the
+changes since its previous event once and hands them to the queues of all
+connected ``/api/events`` streams, which filter them per dashboard. Database
+load therefore grows with poll cycles, not with viewers. Without PostgreSQL
+the thread checks the data version every ``poll_seconds`` instead.
+"""
+import logging
+import queue
+import select
+import threading
+import time
+
+from sqlalchemy import text
+
+from app import db
+from app.dashboard_state import encode_change_cursor, get_changes, get_data_version, serialize_state
+from app.models.metric import LatestMetric
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'dashboard_changes'
+
+# Events a stream may lag behind; a stream further behind is told to reload
+QUEUE_SIZE = 16
+
+# Check interval while listening, in case a notification was missed
+LISTEN_CHECK_SECONDS = 60
+
+ALL_ROWS = {'server_filter': [], 'category': '', 'status': '', 'search': '', 'sort_by': 'server', 'sort_order': 'asc'}
+
+
+def notify_changes(generation):
+    """Announce a poll cycle to the web processes (PostgreSQL only).
+
+    The notification is delivered when the current transaction commits.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_notify(:channel, :payload)'),
+                           {'channel': CHANNEL, 'payload': str(generation)})
+
+
+class ChangeBroadcaster:
+    """Listener thread of one web process and the queues of its event streams.
+
+    Events are dicts with the change cursors before and after the change
+    (``from_cursor``, ``change_cursor``) and either ``reload`` or the changed
+    rows (serialize_state plus ``previous_status``) and ``polled`` (poll
+    timestamp per server).
+    """
+
+    def __init__(self, app, poll_seconds=5):
+        self.app = app
+        self.poll_seconds = poll_seconds
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._version = None
+        self._statuses = {}
+        self._thread = threading.Thread(target=self._run, name='dashboard-events', daemon=True)
+        self._thread.start()
+
+    def subscribe(self):
+        subscription = queue.Queue(QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _broadcast(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                with subscription.mutex:
+                    subscription.queue.clear()
+                subscription.put_nowait({'reload': True, 'from_cursor': None,
+                                         'change_cursor': event['change_cursor']})
+
+    def _load(self):
+        """Start from the current data version and statuses."""
+        self._version = get_data_version()
+        self._statuses = dict(db.session.query(LatestMetric.component_id, LatestMetric.status).all())
+        db.session.remove()
+
+    def _publish(self):
+        """Broadcast the changes since the previous event, if there are any."""
+        try:
+            version = get_data_version()
+            if version == self._version:
+                return
+            event = {'from_cursor': encode_change_cursor(self._version), 'change_cursor': encode_change_cursor(version)}
+            changes = get_changes(ALL_ROWS, event['from_cursor'], version)
+            if changes is None:
+                event['reload'] = True
+                self._statuses = dict(db.session.query(LatestMetric.component_id, LatestMetric.status).all())
+            else:
+                rows, _, polls = changes
+                event['data'] = []
+                for server, component, metric in rows:
+                    row = serialize_state(server, component, metric)
+                    row['previous_status'] = self._statuses.get(component.id)
+                    self._statuses[component.id] = metric.status
+                    event['data'].append(row)
+                event['polled'] = {server_id: timestamp.strftime('%Y-%m-%d %H:%M:%S')
+                                   for server_id, timestamp in polls.items()}
+            self._version = version
+        finally:
+            db.session.remove()
+
+        if self._subscribers:
+            self._broadcast(event)
+        logger.debug(f"Dashboard event: {len(event.get('data', []))} changed rows, "
+                     f"{len(self._subscribers)} streams")
+
+    def _listen(self):
+        connection = db.engine.raw_connection()
+        try:
+            listener = connection.driver_connection
+            listener.autocommit = True
+            with listener.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            # Changes committed before LISTEN took effect
+            self._publish()
+            while True:
+                if select.select([listener], [], [], LISTEN_CHECK_SECONDS) != ([], [], []):
+                    listener.poll()
+                    listener.notifies.clear()
+                self._publish()
+        finally:
+            connection.invalidate()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self._load()
+                    if db.engine.dialect.name == 'postgresql':
+                        self._listen()
+                    else:
+                        while True:
+                            time.sleep(self.poll_seconds)
+                            self._publish()
+            except Exception as e:
+                logger.error(f"Dashboard event listener failed, restarting: {e}", exc_info=True)
+                time.sleep(self.poll_seconds)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster(app):
+    """Return the process-wide broadcaster, started on first use (after fork)."""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            _broadcaster = ChangeBroadcaster(app, app.config.get('DASHBOARD_EVENTS_POLL_SECONDS', 5))
+    return _broadcaster
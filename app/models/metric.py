@@ -1,3 +1,5 @@
+import math
+
 from app import db
 from datetime import datetime, timezone, timedelta
 
@@ -7,16 +9,135 @@ def wib_now():
     wib_time = utc_now + timedelta(hours=7)
     return wib_time.replace(tzinfo=None)  # Remove timezone info for PostgreSQL
 
+def numeric_value(value):
+    """Return a metric value as a float, or None if it is not numeric."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+# Stored as a small integer in metric.status
+STATUS_CODES = {'OK': 0, 'Warning': 1, 'Critical': 2, 'Unknown': 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+
+class MetricStatus(db.TypeDecorator):
+    """Status name ('OK', 'Warning', ...) stored as a SMALLINT code."""
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return STATUS_CODES.get(value, STATUS_CODES['Unknown'])
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return STATUS_NAMES.get(value, 'Unknown')
+
+
+class ComponentVersion(db.Model):
+    """Snapshot of a component's and its server's descriptive attributes.
+
+    A new version is recorded when a component or its server is renamed (or
+    its IP, OID, brand or category changes), so metrics keep pointing at the
+    names they were polled under.
+    """
+    __tablename__ = 'component_version'
+
+    ATTRIBUTES = ('server_name', 'server_ip', 'brand', 'component_name', 'category', 'oid')
+
+    id = db.Column(db.Integer, primary_key=True)
+    component_id = db.Column(db.Integer, db.ForeignKey('component.id', ondelete='CASCADE'), nullable=False)
+    server_id = db.Column(db.Integer, db.ForeignKey('server.id', ondelete='CASCADE'), nullable=False)
+    server_name = db.Column(db.String(128), nullable=False)
+    server_ip = db.Column(db.String(64), nullable=False)
+    brand = db.Column(db.String(64), nullable=False)
+    component_name = db.Column(db.String(128), nullable=False)
+    category = db.Column(db.String(32), nullable=False)
+    oid = db.Column(db.String(128), nullable=False)
+    valid_from = db.Column(db.DateTime, nullable=False, default=wib_now)
+
+    @staticmethod
+    def snapshot(server, component):
+        """Current attribute values of a component, keyed like ATTRIBUTES."""
+        return {
+            'server_name': server.name,
+            'server_ip': server.ip,
+            'brand': server.brand,
+            'component_name': component.name,
+            'category': component.category,
+            'oid': component.oid,
+        }
+
+    def matches(self, snapshot):
+        return all(getattr(self, name) == snapshot[name] for name in self.ATTRIBUTES)
+
+
 class Metric(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     server_id = db.Column(db.Integer, db.ForeignKey('server.id'), nullable=False)
     component_id = db.Column(db.Integer, db.ForeignKey('component.id'), nullable=False)
-    oid = db.Column(db.String(128), nullable=False)
+    version_id = db.Column(db.Integer, db.ForeignKey('component_version.id'), nullable=False)
+    value = db.Column(db.String(128), nullable=False)  # raw SNMP value
+    value_num = db.Column(db.Float)  # measurement of threshold-rule values (scaled), else NULL
+    status = db.Column(MetricStatus, nullable=False)  # OK, Warning, Critical, Unknown
+    # Partition key of the metric table on PostgreSQL (monthly ranges), so
+    # the primary key there is (id, timestamp)
+    timestamp = db.Column(db.DateTime, nullable=False, default=wib_now)
+    version = db.relationship('ComponentVersion', lazy=True)
+
+    # Names as they were when the metric was polled
+    @property
+    def oid(self):
+        return self.version.oid
+
+    @property
+    def brand(self):
+        return self.version.brand
+
+    @property
+    def component_name(self):
+        return self.version.component_name
+
+    @property
+    def server_name(self):
+        return self.version.server_name
+
+    @property
+    def server_ip(self):
+        return self.version.server_ip
+
+    @property
+    def category(self):
+        return self.version.category
+
+
+# Access paths: latest/history per component, time-range reports, status filters
+db.Index('ix_metric_component_id_timestamp', Metric.component_id, Metric.timestamp.desc())
+db.Index('ix_metric_server_id_timestamp', Metric.server_id, Metric.timestamp.desc())
+db.Index('ix_metric_timestamp', Metric.timestamp)
+db.Index('ix_metric_status_timestamp', Metric.status, Metric.timestamp)
+# Threshold queries on numeric values (e.g. suhu above a limit)
+db.Index('ix_metric_value_num_timestamp', Metric.value_num, Metric.timestamp,
+         postgresql_where=Metric.value_num.isnot(None), sqlite_where=Metric.value_num.isnot(None))
+db.Index('ix_component_version_component_id', ComponentVersion.component_id, ComponentVersion.id.desc())
+
+
+class LatestMetric(db.Model):
+    """Most recent poll result per component, upserted by the poller."""
+    __tablename__ = 'latest_metric'
+    component_id = db.Column(db.Integer, db.ForeignKey('component.id', ondelete='CASCADE'), primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('server.id', ondelete='CASCADE'), nullable=False)
     value = db.Column(db.String(128), nullable=False)
-    status = db.Column(db.String(16), nullable=False)  # OK, Warning, Critical
-    timestamp = db.Column(db.DateTime, default=wib_now)
-    brand = db.Column(db.String(64), nullable=False)
-    component_name = db.Column(db.String(128), nullable=False)
-    server_name = db.Column(db.String(128), nullable=False)
-    server_ip = db.Column(db.String(64), nullable=False)
-    category = db.Column(db.String(32), nullable=False)
+    value_num = db.Column(db.Float)
+    status = db.Column(db.String(16), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    # Poll generation that last changed value or status (see upsert_latest_metrics)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Delta queries of the dashboard (rows changed after a generation)
+db.Index('ix_latest_metric_generation', LatestMetric.generation)
@@ -0,0 +1,89 @@
+from app import db
+from app.models.metric import wib_now
+
+# Report job lifecycle: queued -> running -> done | failed
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class ReportArtifact(db.Model):
+    """A cached month report, stored on disk as a rows file.
+
+    The rows file holds the layout's cell values, newest first, of every
+    metric of the month with an id up to ``last_metric_id``. An ``archived``
+    artifact is the only copy of raw metrics pruned by retention: it is never
+    invalidated, and retention only prunes months archived this way.
+    """
+    __tablename__ = 'report_artifact'
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    layout = db.Column(db.String(16), nullable=False)
+    rows_path = db.Column(db.String(255), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    last_metric_id = db.Column(db.Integer, nullable=False, default=0)
+    closed = db.Column(db.Boolean, nullable=False, default=False)  # month was over when built
+    archived = db.Column(db.Boolean, nullable=False, default=False)  # kept for pruned raw metrics
+    built_at = db.Column(db.DateTime, nullable=False, default=wib_now)
+
+    __table_args__ = (
+        db.UniqueConstraint('month', 'year', 'layout', name='uq_report_artifact_month_year_layout'),
+    )
+
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_job'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    month = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    layout = db.Column(db.String(16), nullable=False)  # admin, dashboard
+    export_format = db.Column(db.String(8), nullable=False)  # xlsx, csv
+    status = db.Column(db.String(16), nullable=False, default=JOB_QUEUED)
+    rows_total = db.Column(db.Integer)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    file_path = db.Column(db.String(255))
+    error = db.Column(db.String(255))
+    requested_by = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, nullable=False, default=wib_now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=wib_now)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # At most one queued/running job per report, shared by every web worker
+        db.Index(
+            'uq_report_job_active', 'month', 'year', 'layout', 'export_format', unique=True,
+            postgresql_where=db.text("status IN ('queued', 'running')"),
+            sqlite_where=db.text("status IN ('queued', 'running')")
+        ),
+        db.Index('ix_report_job_created_at', 'created_at'),
+    )
+
+    @property
+    def progress(self):
+        """Percentage of rows written, or None while the total is unknown."""
+        if self.status == JOB_DONE:
+            return 100
+        if not self.rows_total:
+            return None
+        return min(99, self.rows_written * 100 // self.rows_total)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'month': self.month,
+            'year': self.year,
+            'layout': self.layout,
+            'format': self.export_format,
+            'status': self.status,
+            'progress': self.progress,
+            'rows_written': self.rows_written,
+            'rows_total': self.rows_total,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None,
+        }
@@ -0,0 +1,70 @@
+from sqlalchemy.orm import declared_attr
+
+from app import db
+from app.models.metric import wib_now
+
+
+class RollupMixin:
+    """Per-component aggregate of raw metrics over a time bucket.
+
+    Sums (not averages) are stored so buckets can be merged incrementally
+    and re-aggregated into coarser ranges.
+    """
+
+    @declared_attr
+    def component_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('component.id', ondelete='CASCADE'), primary_key=True)
+
+    @declared_attr
+    def server_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('server.id', ondelete='CASCADE'), nullable=False)
+
+    bucket = db.Column(db.DateTime, primary_key=True)  # start of the hour/day
+    samples = db.Column(db.Integer, nullable=False, default=0)
+    ok_count = db.Column(db.Integer, nullable=False, default=0)
+    warning_count = db.Column(db.Integer, nullable=False, default=0)
+    critical_count = db.Column(db.Integer, nullable=False, default=0)
+    unknown_count = db.Column(db.Integer, nullable=False, default=0)
+    # Numeric values only (e.g. suhu); value_count is the number of them
+    value_count = db.Column(db.Integer, nullable=False, default=0)
+    value_min = db.Column(db.Float)
+    value_max = db.Column(db.Float)
+    value_sum = db.Column(db.Float)
+
+    @property
+    def value_avg(self):
+        return self.value_sum / self.value_count if self.value_count else None
+
+    def to_dict(self):
+        return {
+            'bucket': self.bucket.strftime('%Y-%m-%d %H:%M:%S'),
+            'samples': self.samples,
+            'ok': self.ok_count,
+            'warning': self.warning_count,
+            'critical': self.critical_count,
+            'unknown': self.unknown_count,
+            'value_min': self.value_min,
+            'value_max': self.value_max,
+            'value_avg': self.value_avg,
+        }
+
+
+class MetricHourly(RollupMixin, db.Model):
+    __tablename__ = 'metric_hourly'
+
+
+class MetricDaily(RollupMixin, db.Model):
+    __tablename__ = 'metric_daily'
+
+
+class RollupState(db.Model):
+    """Watermark of the rollup pipeline: raw metrics up to this id are rolled up."""
+    __tablename__ = 'rollup_state'
+
+    name = db.Column(db.String(32), primary_key=True)
+    last_metric_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=wib_now)
+
+
+db.Index('ix_metric_hourly_bucket', MetricHourly.bucket)
+db.Index('ix_metric_daily_bucket', MetricDaily.bucket)
@@ -23,3 +23,5 @@ class Component(db.Model):
     brand = db.Column(db.String(64), nullable=False)
     server_id = db.Column(db.Integer, db.ForeignKey('server.id'), nullable=False)
     metrics = db.relationship('Metric', backref='component', lazy=True, cascade="all, delete-orphan")
+    versions = db.relationship('ComponentVersion', lazy=True, cascade="all, delete-orphan")
+    latest_metric = db.relationship('LatestMetric', uselist=False, lazy=True, cascade="all, delete-orphan")
@@ -0,0 +1 @@
+# Reports package
\ No newline at end of file
@@ -0,0 +1,363 @@
+"""Cache of built monthly reports.
+
+Every (month, year, layout) report is kept on disk as a rows file holding
+the layout's cell values, newest first, of the month's metrics up to a
+watermark metric id. A month that is over is built once and then served as
+is. The current month is refreshed incrementally: only metrics above the
+watermark are read and put in front of the cached rows. Each refresh writes
+a new version, and xlsx/csv downloads are rendered once per version.
+Refreshes lock the artifact row, and only versions older than the one they
+replace are removed, so a concurrent download keeps its file.
+
+Artifacts are only dropped by ``invalidate_report_artifacts``, which must be
+called whenever metrics of past months are deleted or backfilled. Retention
+pruning builds the artifacts of a month first and marks them ``archived``:
+they are then the only copy of the pruned metrics, and invalidation skips
+them. A reclassification rewrites their statuses in place instead
+(``restamp_archived_artifacts``).
+"""
+import csv
+import glob
+import logging
+import os
+import uuid
+from datetime import timedelta
+from itertools import islice
+
+from flask import current_app, send_file
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.metric import ComponentVersion, Metric, wib_now
+from app.models.report import ReportArtifact
+from app.reports.export import (
+    LAYOUTS, MIMETYPES, count_month_rows, iter_report_values, number_rows, report_filename,
+    write_csv, write_xlsx
+)
+from app.reports.query import month_range
+
+logger = logging.getLogger(__name__)
+
+# Poll cycles stamp rows when they start, so rows of a month can still be
+# written shortly after it ends. A month counts as closed after this margin.
+CLOSE_MARGIN = timedelta(hours=1)
+
+ROWS_SUFFIX = '.rows.csv'
+
+# Cells of a rows file that restamp_archived_artifacts reads
+RESTAMP_COLUMNS = {
+    'value': Metric.value,
+    'status': Metric.status,
+    'brand': ComponentVersion.brand,
+    'category': ComponentVersion.category,
+    'oid': ComponentVersion.oid,
+}
+
+
+def _cache_dir():
+    path = os.path.abspath(current_app.config.get('REPORT_DIR', 'reports'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _version_prefix(layout, month, year):
+    return os.path.join(_cache_dir(), f'{layout}_{year}_{month:02d}_')
+
+
+def _rendition_path(artifact, export_format):
+    return f'{artifact.rows_path[:-len(ROWS_SUFFIX)]}.{export_format}'
+
+
+def _tmp_path(path):
+    return f'{path}.{uuid.uuid4().hex[:8]}.part'
+
+
+def _version(path):
+    """Watermark of the version a cached report file belongs to."""
+    return int(os.path.basename(path).split('.', 1)[0].rsplit('_', 1)[1])
+
+
+def _remove_versions(layout, month, year, below=None):
+    """Remove the cached files of a report, or only of versions older than ``below``."""
+    for path in glob.glob(f'{glob.escape(_version_prefix(layout, month, year))}*'):
+        if path.endswith('.part') or (below is not None and _version(path) >= below):
+            continue
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove cached report file {path}: {e}")
+
+
+def _read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.reader(f)
+
+
+def _build(month, year, layout, watermark, chunk_size, progress):
+    """Write the rows file of a month from the database. Returns (path, count)."""
+    path = f'{_version_prefix(layout, month, year)}{watermark}{ROWS_SUFFIX}'
+    tmp_path = _tmp_path(path)
+    if progress:
+        total = count_month_rows(month, year)
+        report_progress = lambda count: progress(count, total)
+    else:
+        report_progress = None
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            count = write_csv(
+                f, layout, iter_report_values(month, year, layout, chunk_size, upto_id=watermark),
+                chunk_size, report_progress, with_header=False
+            )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path, count
+
+
+def _extend(artifact, watermark, chunk_size):
+    """Write a new rows file with metrics above the artifact's watermark first.
+
+    Returns (path, rows added), or (None, 0) when there is nothing new.
+    """
+    path = f'{_version_prefix(artifact.layout, artifact.month, artifact.year)}{watermark}{ROWS_SUFFIX}'
+    tmp_path = _tmp_path(path)
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            added = write_csv(
+                f, artifact.layout,
+                iter_report_values(artifact.month, artifact.year, artifact.layout, chunk_size,
+                                   after_id=artifact.last_metric_id, upto_id=watermark),
+                chunk_size, with_header=False
+            )
+            if added:
+                with open(artifact.rows_path, newline='', encoding='utf-8') as cached:
+                    while True:
+                        block = cached.read(1024 * 1024)
+                        if not block:
+                            break
+                        f.write(block)
+        if not added:
+            return None, 0
+        os.replace(tmp_path, path)
+        return path, added
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def get_artifact(month, year, layout, chunk_size=5000, progress=None):
+    """Return the up-to-date artifact of a month report, building it if needed.
+
+    ``progress``, if given, is called with (rows written, rows total) while
+    a month is built from scratch.
+    """
+    artifact = ReportArtifact.query.filter_by(month=month, year=year, layout=layout).first()
+    if artifact is not None and artifact.closed and os.path.exists(artifact.rows_path):
+        return artifact
+    if artifact is not None:
+        # Serialises refreshes of the month across workers and threads: a
+        # refresh waiting here then sees the version committed before it
+        artifact = ReportArtifact.query.filter_by(id=artifact.id).with_for_update().populate_existing().first()
+    archived = False
+    if artifact is not None and not os.path.exists(artifact.rows_path):
+        archived = artifact.archived
+        if archived:
+            logger.error(f"Archived report file {artifact.rows_path} is missing, rebuilding from the "
+                         f"remaining raw metrics")
+        else:
+            logger.warning(f"Cached report file {artifact.rows_path} is missing, rebuilding")
+        db.session.delete(artifact)
+        db.session.commit()
+        artifact = None
+    if artifact is not None and artifact.closed:
+        db.session.commit()
+        return artifact
+
+    _, end = month_range(month, year)
+    # Read the watermark before deciding the month is closed: every row of
+    # a closed month then already has an id below it
+    watermark = db.session.query(func.max(Metric.id)).scalar() or 0
+    closed = end + CLOSE_MARGIN <= wib_now()
+
+    if artifact is not None:
+        previous = artifact.rows_path
+        path, added = _extend(artifact, watermark, chunk_size)
+        if path:
+            artifact.rows_path = path
+            artifact.row_count += added
+            artifact.built_at = wib_now()
+        artifact.last_metric_id = max(artifact.last_metric_id, watermark)
+        artifact.closed = closed
+        db.session.commit()
+        if path:
+            logger.info(f"Report cache {layout} {month:02d}/{year} refreshed: {added} new rows")
+            # Keep the previous version for downloads that are still streaming it
+            _remove_versions(layout, month, year, below=_version(previous))
+        return artifact
+
+    path, count = _build(month, year, layout, watermark, chunk_size, progress)
+    artifact = ReportArtifact(
+        month=month, year=year, layout=layout, rows_path=path,
+        row_count=count, last_metric_id=watermark, closed=closed, archived=archived
+    )
+    db.session.add(artifact)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Built concurrently by another worker; use theirs
+        db.session.rollback()
+        artifact = get_artifact(month, year, layout, chunk_size)
+        if artifact.rows_path != path:
+            os.remove(path)
+        return artifact
+    logger.info(f"Report cache {layout} {month:02d}/{year} built: {count} rows "
+                f"({'closed' if closed else 'open'} month)")
+    return artifact
+
+
+def get_report_file(month, year, layout, export_format='xlsx', chunk_size=5000, progress=None):
+    """Return (path, row count) of an up-to-date report file in ``export_format``."""
+    artifact = get_artifact(month, year, layout, chunk_size, progress)
+    path = _rendition_path(artifact, export_format)
+    if os.path.exists(path):
+        return path, artifact.row_count
+
+    total = artifact.row_count
+    report_progress = (lambda count: progress(count, total)) if progress else None
+    rows = number_rows(layout, _read_rows(artifact.rows_path))
+    tmp_path = _tmp_path(path)
+    try:
+        if export_format == 'csv':
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                write_csv(f, layout, rows, chunk_size, report_progress)
+        else:
+            with open(tmp_path, 'wb') as f:
+                write_xlsx(f, layout, rows, chunk_size, report_progress)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path, total
+
+
+def ready_report_file(month, year, layout, export_format='xlsx'):
+    """Return (path, row count) of a report file that needs no building, or None.
+
+    Only closed months already rendered in ``export_format`` qualify; the
+    rest is built by a report job (app.reports.jobs).
+    """
+    artifact = ReportArtifact.query.filter_by(month=month, year=year, layout=layout).first()
+    if artifact is None or not artifact.closed:
+        return None
+    path = _rendition_path(artifact, export_format)
+    if not os.path.exists(path):
+        return None
+    return path, artifact.row_count
+
+
+def report_response(month, year, layout, export_format='xlsx'):
+    """Send a month report download if it is ready in the cache, else return None."""
+    ready = ready_report_file(month, year, layout, export_format)
+    if ready is None:
+        return None
+    path, count = ready
+    logger.debug(f'Report {layout} {month:02d}/{year} served from {path}: {count} records')
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=report_filename(layout, month, year, export_format),
+        mimetype=MIMETYPES[export_format]
+    )
+
+
+def _row_positions(layout):
+    """Positions of the RESTAMP_COLUMNS cells in a rows file of ``layout``."""
+    columns = [column for _, column, _ in LAYOUTS[layout] if column is not None]
+    return {name: next(i for i, column in enumerate(columns) if column is wanted)
+            for name, wanted in RESTAMP_COLUMNS.items()}
+
+
+def _restamp(artifact, classify, chunk_size):
+    """Rewrite the status cells of an artifact's rows file. Returns the rows changed."""
+    positions = _row_positions(artifact.layout)
+    status = positions['status']
+    changed = 0
+    tmp_path = _tmp_path(artifact.rows_path)
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            rows = _read_rows(artifact.rows_path)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                columns = {name: [row[i] for row in chunk] for name, i in positions.items()}
+                for row, new_status in zip(chunk, classify(columns)):
+                    if row[status] != new_status:
+                        row[status] = new_status
+                        changed += 1
+                writer.writerows(chunk)
+        if changed:
+            os.replace(tmp_path, artifact.rows_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return changed
+
+
+def restamp_archived_artifacts(classify, start=None, end=None, chunk_size=50000):
+    """Re-evaluate the statuses of archived reports of months overlapping [start, end).
+
+    Archived reports can not be rebuilt from raw metrics, so after a
+    reclassification their rows are rewritten in place. ``classify`` is
+    called per chunk of rows with a dict of RESTAMP_COLUMNS value lists and
+    returns the new statuses. Rendered downloads of changed reports are
+    removed. Returns the number of rows changed.
+    """
+    changed = 0
+    for artifact in ReportArtifact.query.filter_by(archived=True).all():
+        month_start, month_end = month_range(artifact.month, artifact.year)
+        if (start is not None and month_end <= start) or (end is not None and month_start >= end):
+            continue
+        artifact = ReportArtifact.query.filter_by(id=artifact.id).with_for_update().populate_existing().first()
+        if artifact is None or not os.path.exists(artifact.rows_path):
+            db.session.commit()
+            continue
+        restamped = _restamp(artifact, classify, chunk_size)
+        if restamped:
+            for export_format in MIMETYPES:
+                path = _rendition_path(artifact, export_format)
+                if os.path.exists(path):
+                    os.remove(path)
+            artifact.built_at = wib_now()
+            logger.info(f"Archived report {artifact.layout} {artifact.month:02d}/{artifact.year}: "
+                        f"{restamped} statuses changed")
+        db.session.commit()
+        changed += restamped
+    return changed
+
+
+def invalidate_report_artifacts(first=None, last=None):
+    """Drop cached reports of months with timestamps in [first, last].
+
+    Either bound may be None for an open range. Call after deleting or
+    backfilling metrics; the next download rebuilds the month. Archived
+    reports are kept: their pruned metrics can not be read again.
+    """
+    dropped = 0
+    for artifact in ReportArtifact.query.all():
+        month_start, month_end = month_range(artifact.month, artifact.year)
+        if (first is not None and month_end <= first) or (last is not None and month_start > last):
+            continue
+        if artifact.archived:
+            logger.info(f"Keeping archived report {artifact.layout} {artifact.month:02d}/{artifact.year}")
+            continue
+        _remove_versions(artifact.layout, artifact.month, artifact.year)
+        db.session.delete(artifact)
+        dropped += 1
+    db.session.commit()
+    if dropped:
+        logger.info(f"Invalidated {dropped} cached reports")
+    return dropped
@@ -0,0 +1,165 @@
+"""Streaming export of monthly metric reports."""
+import csv
+import logging
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from sqlalchemy import func, select
+
+from app import db
+from app.models.metric import Metric, ComponentVersion
+from app.models.report import ReportArtifact
+from app.reports.query import month_range
+
+logger = logging.getLogger(__name__)
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+MIMETYPES = {
+    'xlsx': XLSX_MIMETYPE,
+    'csv': 'text/csv',
+}
+
+EXPORT_FORMATS = tuple(MIMETYPES)
+
+# Report layouts: (header, column or None for the row number, column width).
+# Names come from the component version a metric was polled under.
+LAYOUTS = {
+    'admin': [
+        ('No', None, 8),
+        ('Nama Server', ComponentVersion.server_name, 25),
+        ('IP', ComponentVersion.server_ip, 16),
+        ('Nama Komponen', ComponentVersion.component_name, 30),
+        ('OID', ComponentVersion.oid, 40),
+        ('Merk', ComponentVersion.brand, 12),
+        ('Value', Metric.value, 15),
+        ('Status Metric', Metric.status, 15),
+        ('Timestamp', Metric.timestamp, 21),
+        ('Kategori', ComponentVersion.category, 12),
+    ],
+    'dashboard': [
+        ('Nomor', None, 8),
+        ('Nama Server', ComponentVersion.server_name, 25),
+        ('IP Server', ComponentVersion.server_ip, 16),
+        ('Merk', ComponentVersion.brand, 12),
+        ('Kategori Komponen', ComponentVersion.category, 19),
+        ('Nama Komponen', ComponentVersion.component_name, 30),
+        ('OID', ComponentVersion.oid, 40),
+        ('Value', Metric.value, 15),
+        ('Status', Metric.status, 12),
+        ('Timestamp', Metric.timestamp, 21),
+    ],
+}
+
+# Download file name prefix of each layout
+FILENAMES = {
+    'admin': 'report',
+    'dashboard': 'laporan_monitoring',
+}
+
+
+def report_filename(layout, month, year, export_format=None):
+    """Return the download file name of a month report."""
+    filename = f"{FILENAMES[layout]}_{year}_{month:02d}"
+    return f'{filename}.{export_format}' if export_format else filename
+
+
+def month_has_data(month, year):
+    """Check whether any metric exists in the month without counting them.
+
+    Months whose raw metrics were pruned still have data in the report cache.
+    """
+    if ReportArtifact.query.filter(
+        ReportArtifact.month == month, ReportArtifact.year == year, ReportArtifact.row_count > 0
+    ).first():
+        return True
+    start, end = month_range(month, year)
+    return db.session.query(
+        Metric.query.filter(Metric.timestamp >= start, Metric.timestamp < end).exists()
+    ).scalar()
+
+
+def count_month_rows(month, year):
+    """Count the metrics of a month (a range scan on the timestamp index)."""
+    start, end = month_range(month, year)
+    return db.session.execute(
+        select(func.count()).select_from(Metric).where(Metric.timestamp >= start, Metric.timestamp < end)
+    ).scalar()
+
+
+def iter_report_values(month, year, layout, chunk_size=5000, after_id=None, upto_id=None):
+    """Yield the layout's cell values (without row number) of a month, newest first.
+
+    ``after_id``/``upto_id`` restrict the rows to metric ids in
+    (after_id, upto_id]. Rows are read through a server-side cursor
+    ``chunk_size`` at a time, so memory use does not depend on the number
+    of rows in the month.
+    """
+    columns = [column for _, column, _ in LAYOUTS[layout] if column is not None]
+    start, end = month_range(month, year)
+    stmt = select(*columns).select_from(Metric).join(
+        ComponentVersion, ComponentVersion.id == Metric.version_id
+    ).where(
+        Metric.timestamp >= start,
+        Metric.timestamp < end
+    ).order_by(Metric.timestamp.desc(), Metric.id.desc())
+    if after_id is not None:
+        stmt = stmt.where(Metric.id > after_id)
+    if upto_id is not None:
+        stmt = stmt.where(Metric.id <= upto_id)
+
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    for values in result:
+        yield [
+            value.strftime('%Y-%m-%d %H:%M:%S') if column is Metric.timestamp else value
+            for column, value in zip(columns, values)
+        ]
+
+
+def number_rows(layout, values):
+    """Insert the row number column into rows of layout values."""
+    position = [column for _, column, _ in LAYOUTS[layout]].index(None)
+    for number, row in enumerate(values, start=1):
+        row = list(row)
+        row.insert(position, number)
+        yield row
+
+
+def write_xlsx(fileobj, layout, rows, chunk_size=5000, progress=None):
+    """Write numbered report rows into ``fileobj`` with a write-only workbook.
+
+    ``progress``, if given, is called with the number of rows written so far
+    after every ``chunk_size`` rows. Returns the number of data rows written.
+    """
+    columns = LAYOUTS[layout]
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Report')
+    for idx, (_, _, width) in enumerate(columns, start=1):
+        worksheet.column_dimensions[get_column_letter(idx)].width = width
+    worksheet.append([header for header, _, _ in columns])
+
+    count = 0
+    for row in rows:
+        worksheet.append(row)
+        count += 1
+        if progress and count % chunk_size == 0:
+            progress(count)
+    workbook.save(fileobj)
+    return count
+
+
+def write_csv(fileobj, layout, rows, chunk_size=5000, progress=None, with_header=True):
+    """Write report rows as CSV into a text file opened with newline=''.
+
+    Returns the number of data rows written.
+    """
+    writer = csv.writer(fileobj)
+    if with_header:
+        writer.writerow([header for header, _, _ in LAYOUTS[layout]])
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if progress and count % chunk_size == 0:
+            progress(count)
+    return count
@@ -0,0 +1,166 @@
+"""Background report jobs.
+
+Reports are built by a small thread pool in the web process instead of
+inside the HTTP request. Job state lives in the ``report_job`` table, so any
+gunicorn worker can answer status and download requests, and a partial
+unique index keeps at most one queued/running job per report: identical
+requests share the job that is already in progress. Report files come from
+the report cache (``app.reports.cache``), which owns them.
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.metric import wib_now
+from app.models.report import (
+    ReportJob, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, ACTIVE_JOB_STATUSES
+)
+from app.reports.cache import get_report_file
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(max_workers):
+    """Return the process-wide job pool, created on first use (after fork)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+    return _executor
+
+
+def _find_active_job(month, year, layout, export_format):
+    return ReportJob.query.filter(
+        ReportJob.month == month,
+        ReportJob.year == year,
+        ReportJob.layout == layout,
+        ReportJob.export_format == export_format,
+        ReportJob.status.in_(ACTIVE_JOB_STATUSES)
+    ).first()
+
+
+def expire_jobs(stale_seconds=600, retention_hours=24):
+    """Fail jobs that stopped making progress and delete expired jobs.
+
+    A running job stops updating ``updated_at`` when the process building it
+    dies; failing it lets the next identical request start a new one.
+    """
+    now = wib_now()
+    stale = ReportJob.query.filter(
+        ReportJob.status.in_(ACTIVE_JOB_STATUSES),
+        ReportJob.updated_at < now - timedelta(seconds=stale_seconds)
+    ).all()
+    for job in stale:
+        logger.warning(f"Report job {job.id} made no progress for {stale_seconds}s, marking it failed")
+        job.status = JOB_FAILED
+        job.error = 'Job abandoned'
+        job.finished_at = now
+
+    expired = ReportJob.query.filter(
+        ReportJob.status.notin_(ACTIVE_JOB_STATUSES),
+        ReportJob.created_at < now - timedelta(hours=retention_hours)
+    ).delete(synchronize_session=False)
+
+    if stale or expired:
+        db.session.commit()
+
+
+def enqueue_report(month, year, layout, export_format='xlsx', requested_by=None):
+    """Queue a report build, or join the identical job already in progress.
+
+    Returns ``(job, created)``.
+    """
+    config = current_app.config
+    expire_jobs(config.get('REPORT_JOB_STALE_SECONDS', 600), config.get('REPORT_JOB_RETENTION_HOURS', 24))
+
+    job = _find_active_job(month, year, layout, export_format)
+    if job is not None:
+        return job, False
+
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        month=month,
+        year=year,
+        layout=layout,
+        export_format=export_format,
+        status=JOB_QUEUED,
+        requested_by=requested_by
+    )
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another web worker queued the same report a moment ago
+        db.session.rollback()
+        return _find_active_job(month, year, layout, export_format), False
+
+    app = current_app._get_current_object()
+    _get_executor(config.get('REPORT_JOB_WORKERS', 2)).submit(run_report_job, app, job.id)
+    logger.info(f"Report job {job.id} queued: {layout} {month:02d}/{year} ({export_format}) by {requested_by}")
+    return job, True
+
+
+def get_job(job_id):
+    return db.session.get(ReportJob, job_id)
+
+
+def _save_progress(job_id, rows_written, rows_total):
+    """Record progress on its own connection, leaving the export cursor open."""
+    table = ReportJob.__table__
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(table).where(table.c.id == job_id)
+                .values(rows_written=rows_written, rows_total=rows_total, updated_at=wib_now())
+            )
+    except Exception as e:
+        logger.warning(f"Could not save progress of report job {job_id}: {e}")
+
+
+def run_report_job(app, job_id):
+    """Build the report file of a queued job (runs in the job pool)."""
+    with app.app_context():
+        claimed = db.session.execute(
+            update(ReportJob)
+            .where(ReportJob.id == job_id, ReportJob.status == JOB_QUEUED)
+            .values(status=JOB_RUNNING, updated_at=wib_now())
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            logger.warning(f"Report job {job_id} is no longer queued, skipping")
+            return
+
+        job = get_job(job_id)
+        # SQLite cannot write from a second connection while the export cursor reads
+        progress = None if db.engine.dialect.name == 'sqlite' else partial(_save_progress, job_id)
+
+        try:
+            path, count = get_report_file(
+                job.month, job.year, job.layout, job.export_format,
+                app.config.get('REPORT_CHUNK_SIZE', 5000), progress
+            )
+            job = get_job(job_id)
+            job.status = JOB_DONE
+            job.rows_total = job.rows_written = count
+            job.file_path = path
+            logger.info(f"Report job {job_id} done: {count} rows in {path}")
+        except Exception as e:
+            logger.error(f"Report job {job_id} failed: {e}", exc_info=True)
+            db.session.rollback()
+            job = get_job(job_id)
+            job.status = JOB_FAILED
+            job.error = str(e)[:255]
+
+        job.finished_at = job.updated_at = wib_now()
+        db.session.commit()
@@ -0,0 +1,104 @@
+"""Shared queries for monthly reports."""
+from datetime import datetime
+
+from sqlalchemy import func, type_coerce
+
+from app import db
+from app.models.metric import Metric
+from app.models.rollup import MetricHourly, MetricDaily
+from app.models.server import Server, Component
+
+ROLLUP_MODELS = {
+    'hour': MetricHourly,
+    'day': MetricDaily,
+}
+
+
+def month_range(month, year):
+    """Return the half-open [start, end) timestamp range of a month."""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def month_metrics_query(month, year):
+    """Metrics of a month, newest first.
+
+    Filters on a plain timestamp range instead of extract(month/year) so the
+    timestamp index can be used.
+    """
+    start, end = month_range(month, year)
+    return Metric.query.options(db.joinedload(Metric.version)).filter(
+        Metric.timestamp >= start,
+        Metric.timestamp < end
+    ).order_by(Metric.timestamp.desc())
+
+
+def time_bucket(column, granularity='day'):
+    """SQL expression truncating a timestamp column to its hour or day."""
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc(granularity, column)
+    fmt = '%Y-%m-%d %H:00:00' if granularity == 'hour' else '%Y-%m-%d 00:00:00'
+    return type_coerce(func.strftime(fmt, column), db.DateTime)
+
+
+def value_stats(start, end, granularity='day', category=None, server_id=None):
+    """Numeric value aggregates per server per hour/day in [start, end), computed in SQL.
+
+    E.g. the max suhu per server per day is ``value_stats(start, end,
+    category='suhu')``. Returns rows of (server id, server name, bucket,
+    samples, value min, value max, value avg), oldest bucket first.
+    """
+    bucket = time_bucket(Metric.timestamp, granularity).label('bucket')
+    query = db.session.query(
+        Server.id, Server.name, bucket,
+        func.count(Metric.value_num),
+        func.min(Metric.value_num),
+        func.max(Metric.value_num),
+        func.avg(Metric.value_num),
+    ).join(Server, Server.id == Metric.server_id) \
+        .filter(Metric.timestamp >= start, Metric.timestamp < end, Metric.value_num.isnot(None))
+    if category:
+        query = query.join(Component, Component.id == Metric.component_id) \
+            .filter(Component.category == category)
+    if server_id is not None:
+        query = query.filter(Metric.server_id == server_id)
+    return query.group_by(Server.id, Server.name, bucket) \
+        .order_by(bucket, Server.name) \
+        .all()
+
+
+def component_history(component_id, start, end, granularity='hour'):
+    """Hourly or daily rollups of a component in [start, end), oldest first."""
+    model = ROLLUP_MODELS[granularity]
+    return model.query.filter(
+        model.component_id == component_id,
+        model.bucket >= start,
+        model.bucket < end
+    ).order_by(model.bucket)
+
+
+def month_summary(month, year):
+    """Per-component totals of a month, read from the daily rollups.
+
+    Returns rows of (server name, server ip, component name, category,
+    samples, ok, warning, critical, unknown, value min, value max, value avg).
+    """
+    start, end = month_range(month, year)
+    value_count = func.sum(MetricDaily.value_count)
+    return db.session.query(
+        Server.name, Server.ip, Component.name, Component.category,
+        func.sum(MetricDaily.samples),
+        func.sum(MetricDaily.ok_count),
+        func.sum(MetricDaily.warning_count),
+        func.sum(MetricDaily.critical_count),
+        func.sum(MetricDaily.unknown_count),
+        func.min(MetricDaily.value_min),
+        func.max(MetricDaily.value_max),
+        func.sum(MetricDaily.value_sum) / func.nullif(value_count, 0),
+    ).join(Component, Component.id == MetricDaily.component_id) \
+        .join(Server, Server.id == MetricDaily.server_id) \
+        .filter(MetricDaily.bucket >= start, MetricDaily.bucket < end) \
+        .group_by(Server.id, Server.name, Server.ip, Component.id, Component.name, Component.category) \
+        .order_by(Server.name, Component.name) \
+        .all()
@@ -2,6 +2,10 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app import db
 from app.models.server import Server, Component
+from app.models.metric import Metric
+from app.reports.cache import invalidate_report_artifacts
+from app.scheduler.discovery import DISCOVERY_TABLES, discover_components
+from sqlalchemy import func
 from app.validators import (
     admin_required, validate_required, validate_oid, 
     validate_category, ValidationError
@@ -87,7 +91,8 @@ def components(server_id):
             'components.html',
             server=server,
             components=components,
-            pagination=pagination
+            pagination=pagination,
+            can_discover=server.brand in DISCOVERY_TABLES
         )
     except Exception as e:
         logger.error(f'Error loading components for server {server_id}: {e}', exc_info=True)
@@ -204,8 +209,14 @@ def delete_component(server_id, component_id):
             return redirect(url_for('component.components', server_id=server_id))
         
         component_name = component.name
+        # Reports of the months holding its metrics are no longer valid
+        first, last = db.session.query(
+            func.min(Metric.timestamp), func.max(Metric.timestamp)
+        ).filter(Metric.component_id == component_id).one()
         db.session.delete(component)
         db.session.commit()
+        if first is not None:
+            invalidate_report_artifacts(first, last)
         
         logger.info(f'Component {component_id} ({component_name}) deleted by {current_user.username}')
         flash('Component deleted successfully!', 'success')
@@ -215,3 +226,32 @@ def delete_component(server_id, component_id):
         flash('An error occurred while deleting the component.', 'danger')
     
     return redirect(url_for('component.components', server_id=server_id))
+
+@component_bp.route('/admin/server/<int:server_id>/components/discover', methods=['POST'])
+@login_required
+@admin_required
+def discover(server_id):
+    server = Server.query.get_or_404(server_id)
+    if server.brand not in DISCOVERY_TABLES:
+        flash(f'Component discovery is not available for brand {server.brand}.', 'warning')
+        return redirect(url_for('component.components', server_id=server_id))
+
+    try:
+        config = current_app.config
+        stats = discover_components(
+            server,
+            max_repetitions=config.get('SNMP_MAX_REPETITIONS', 25),
+            timeout=config.get('SNMP_TIMEOUT_SECONDS', 2),
+            retries=config.get('SNMP_RETRIES', 0)
+        )
+        logger.info(f'Components of server {server_id} discovered by {current_user.username}: {stats}')
+        flash(f"Discovery finished: {stats['created']} added, {stats['updated']} updated, "
+              f"{stats['unchanged']} unchanged.", 'success')
+        if stats['failed']:
+            flash(f"{stats['failed']} SNMP tables could not be read from {server.ip}.", 'warning')
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Error discovering components for server {server_id}: {e}', exc_info=True)
+        flash('An error occurred while discovering components.', 'danger')
+
+    return redirect(url_for('component.components', server_id=server_id))
@@ -1,101 +1,80 @@
-from flask import Blueprint, render_template, request, current_app, send_file, flash, session
+from flask import Blueprint, render_template, request, current_app, send_file, flash, session, redirect, url_for
 from flask_login import login_required, current_user
 from app.models.server import Server, Component
-from app.models.metric import Metric
+from app.models.metric import wib_now
 from app import db
-from sqlalchemy import desc, asc, extract
-from datetime import datetime
-from io import BytesIO
-import pandas as pd
+from app.dashboard_state import (
+    InvalidCursor, encode_change_cursor, get_changes, get_current_state, get_data_version, get_status_counts,
+    serialize_state
+)
+from app.events import get_broadcaster
+from app.reports.export import EXPORT_FORMATS, month_has_data
+from app.reports.cache import report_response
+from app.reports.jobs import enqueue_report
+from app.reports.query import ROLLUP_MODELS, component_history, value_stats
+from datetime import timedelta
+import hashlib
+import json
 import logging
+import queue
+import time
 
 logger = logging.getLogger(__name__)
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Upper bound of the limit parameter of /api/data
+MAX_PAGE_SIZE = 1000
+
+
+def get_dashboard_filters():
+    """Filter and sort parameters of the dashboard request."""
+    return {
+        'server_filter': request.args.getlist('server_id', type=int),
+        'category': request.args.get('category', ''),
+        'status': request.args.get('status', ''),
+        'search': request.args.get('search', '').strip(),
+        'sort_by': request.args.get('sort', 'server'),
+        'sort_order': request.args.get('order', 'asc'),
+    }
+
+
 @dashboard_bp.route('/')
 @login_required
 def dashboard():
     try:
-        # Get filter parameters
-        server_filter = request.args.getlist('server_id', type=int)  # Multiple server filter
-        category_filter = request.args.get('category', '')
-        status_filter = request.args.get('status', '')
-        search_query = request.args.get('search', '').strip()
+        # Get filter and sort parameters
+        filters = get_dashboard_filters()
+        server_filter = filters['server_filter']  # Multiple server filter
+        category_filter = filters['category']
+        status_filter = filters['status']
+        search_query = filters['search']
+        sort_by = filters['sort_by']
+        sort_order = filters['sort_order']
         
         # Get view type (table or card), default to table
         view_type = request.args.get('view', session.get('dashboard_view', 'table'))
         session['dashboard_view'] = view_type
         
-        # Get sort parameters
-        sort_by = request.args.get('sort', 'server')  # Default sort by server
-        sort_order = request.args.get('order', 'asc')  # Default ascending
-        
         # Get all servers for filter dropdown
         all_servers = Server.query.order_by(Server.name).all()
         
-        # Build servers query
-        if server_filter:
-            servers = Server.query.filter(Server.id.in_(server_filter)).all()
-        else:
-            servers = all_servers  # Show all by default
-        
-        # Build data for dashboard with latest metrics
-        dashboard_data = []
-        for server in servers:
-            for component in server.components:
-                metric = Metric.query.filter_by(
-                    server_id=server.id,
-                    component_id=component.id
-                ).order_by(desc(Metric.timestamp)).first()
-                
-                # Apply category filter
-                if category_filter and component.category != category_filter:
-                    continue
-                
-                # Apply status filter
-                if status_filter:
-                    if status_filter == 'no_data' and metric:
-                        continue
-                    elif status_filter != 'no_data' and (not metric or metric.status != status_filter):
-                        continue
-                
-                # Apply search filter
-                if search_query:
-                    search_lower = search_query.lower()
-                    if not (search_lower in server.name.lower() or 
-                            search_lower in component.name.lower() or
-                            search_lower in server.ip.lower() or
-                            search_lower in component.oid.lower()):
-                        continue
-                
-                dashboard_data.append({
-                    'server': server,
-                    'component': component,
-                    'metric': metric
-                })
-        
-        # Sort data
-        def get_sort_key(item):
-            if sort_by == 'server':
-                return item['server'].name.lower()
-            elif sort_by == 'component':
-                return item['component'].name.lower()
-            elif sort_by == 'category':
-                return item['component'].category.lower()
-            elif sort_by == 'status':
-                return item['metric'].status if item['metric'] else 'zzz'
-            elif sort_by == 'timestamp':
-                return item['metric'].timestamp if item['metric'] else datetime.min
-            return item['server'].name.lower()
-        
-        dashboard_data.sort(key=get_sort_key, reverse=(sort_order == 'desc'))
+        # First page of the dashboard data (filtered and sorted in SQL); the
+        # page loads the following pages from /api/data while scrolling
+        page_size = current_app.config.get('DASHBOARD_PAGE_SIZE', 100)
+        change_cursor = encode_change_cursor(get_data_version())
+        rows, next_cursor = get_current_state(**filters, limit=page_size)
+        dashboard_data = [
+            {'server': server, 'component': component, 'metric': metric}
+            for server, component, metric in rows
+        ]
+        status_counts = get_status_counts(**filters)
         
         # Get unique categories for filter
         categories = db.session.query(Component.category).distinct().all()
         categories = [c[0] for c in categories]
         
-        total_items = len(dashboard_data)
+        total_items = sum(status_counts.values())
         
         # For card view, group by server
         card_data = {}
@@ -124,7 +103,11 @@ def dashboard():
             sort_by=sort_by,
             sort_order=sort_order,
             categories=categories,
-            total_items=total_items
+            total_items=total_items,
+            status_counts=status_counts,
+            next_cursor=next_cursor,
+            change_cursor=change_cursor,
+            page_size=page_size
         )
         
     except Exception as e:
@@ -143,6 +126,10 @@ def dashboard():
             sort_order='asc',
             categories=[],
             total_items=0,
+            status_counts={},
+            next_cursor=None,
+            change_cursor=None,
+            page_size=current_app.config.get('DASHBOARD_PAGE_SIZE', 100),
             error='Failed to load dashboard data'
         )
 
@@ -150,97 +137,70 @@ def dashboard():
 @dashboard_bp.route('/api/data')
 @login_required
 def api_dashboard_data():
-    """API endpoint untuk mendapatkan data dashboard terbaru (JSON)."""
+    """API endpoint untuk mendapatkan data dashboard terbaru (JSON).
+    
+    Tanpa ``limit`` semua baris dikembalikan; dengan ``limit`` (maks.
+    MAX_PAGE_SIZE) satu halaman, dan halaman berikutnya diminta dengan
+    ``cursor=<next_cursor>``. total_items dan status_counts selalu dihitung
+    untuk seluruh hasil filter.
+    
+    Setiap respons membawa ETag (If-None-Match -> 304 selama tidak ada poll
+    atau perubahan) dan ``change_cursor``. Dengan ``since=<change_cursor>``
+    hanya komponen yang value/status-nya berubah yang dikembalikan
+    (``delta``), atau ``reload`` jika klien harus memuat ulang semua data.
+    """
+    from flask import jsonify
     try:
-        from flask import jsonify
-        
-        # Get filter parameters
-        server_filter = request.args.getlist('server_id', type=int)
-        category_filter = request.args.get('category', '')
-        status_filter = request.args.get('status', '')
-        search_query = request.args.get('search', '').strip()
-        sort_by = request.args.get('sort', 'server')
-        sort_order = request.args.get('order', 'asc')
-        
-        # Get all servers
-        all_servers = Server.query.order_by(Server.name).all()
-        
-        # Build servers query
-        if server_filter:
-            servers = Server.query.filter(Server.id.in_(server_filter)).all()
+        filters = get_dashboard_filters()
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        # Read before the rows, so changes committed meanwhile are in the next delta
+        version = get_data_version()
+        etag = hashlib.sha1(f'{version}|{request.query_string.decode()}'.encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        
+        result = {'success': True, 'change_cursor': encode_change_cursor(version)}
+        since = request.args.get('since')
+        if since:
+            changes = get_changes(filters, since, version)
+            if changes is None:
+                result.update(delta=True, reload=True, data=[])
+            else:
+                rows, removed, polls = changes
+                result.update(
+                    delta=True,
+                    reload=False,
+                    data=[serialize_state(*row) for row in rows],
+                    removed=removed,
+                    polled={server_id: timestamp.strftime('%Y-%m-%d %H:%M:%S')
+                            for server_id, timestamp in polls.items()}
+                )
         else:
-            servers = all_servers
-        
-        # Build data for dashboard with latest metrics
-        dashboard_data = []
-        for server in servers:
-            for component in server.components:
-                metric = Metric.query.filter_by(
-                    server_id=server.id,
-                    component_id=component.id
-                ).order_by(desc(Metric.timestamp)).first()
-                
-                # Apply category filter
-                if category_filter and component.category != category_filter:
-                    continue
-                
-                # Apply status filter
-                if status_filter:
-                    if status_filter == 'no_data' and metric:
-                        continue
-                    elif status_filter != 'no_data' and (not metric or metric.status != status_filter):
-                        continue
-                
-                # Apply search filter
-                if search_query:
-                    search_lower = search_query.lower()
-                    if not (search_lower in server.name.lower() or 
-                            search_lower in component.name.lower() or
-                            search_lower in server.ip.lower() or
-                            search_lower in component.oid.lower()):
-                        continue
-                
-                dashboard_data.append({
-                    'server_id': server.id,
-                    'server_name': server.name,
-                    'server_ip': server.ip,
-                    'server_brand': server.brand,
-                    'component_id': component.id,
-                    'component_name': component.name,
-                    'component_oid': component.oid,
-                    'category': component.category,
-                    'metric_value': metric.value if metric else None,
-                    'metric_status': metric.status if metric else None,
-                    'metric_timestamp': metric.timestamp.strftime('%Y-%m-%d %H:%M:%S') if metric else None
-                })
-        
-        # Sort data
-        def get_sort_key(item):
-            if sort_by == 'server':
-                return item['server_name'].lower()
-            elif sort_by == 'component':
-                return item['component_name'].lower()
-            elif sort_by == 'category':
-                return item['category'].lower()
-            elif sort_by == 'status':
-                return item['metric_status'] if item['metric_status'] else 'zzz'
-            elif sort_by == 'timestamp':
-                return item['metric_timestamp'] if item['metric_timestamp'] else ''
-            return item['server_name'].lower()
-        
-        dashboard_data.sort(key=get_sort_key, reverse=(sort_order == 'desc'))
-        
-        # Get last update time from newest metric
-        latest_metric = Metric.query.order_by(desc(Metric.timestamp)).first()
-        last_update = latest_metric.timestamp.strftime('%Y-%m-%d %H:%M:%S') if latest_metric else None
-        
-        return jsonify({
-            'success': True,
-            'data': dashboard_data,
-            'total_items': len(dashboard_data),
-            'last_update': last_update
-        })
+            # Build data for dashboard with latest metrics (filtered and sorted in SQL)
+            rows, next_cursor = get_current_state(**filters, cursor=request.args.get('cursor') or None, limit=limit)
+            result.update(delta=False, data=[serialize_state(*row) for row in rows], next_cursor=next_cursor)
+        
+        # Last update time from the newest metric
+        last_update = version[1].strftime('%Y-%m-%d %H:%M:%S') if version[1] else None
+        
+        status_counts = get_status_counts(**filters)
+        result.update(
+            total_items=sum(status_counts.values()),
+            status_counts=status_counts,
+            last_update=last_update
+        )
+        response = jsonify(result)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
         
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'error': str(e), 'data': [], 'total_items': 0}), 400
     except Exception as e:
         logger.error(f'API Dashboard error: {e}', exc_info=True)
         return jsonify({
@@ -251,6 +211,123 @@ def api_dashboard_data():
         }), 500
 
 
+def filter_event(event, filters):
+    """The part of a broadcast dashboard event (see app.events) a stream shows.
+
+    Rows are kept if they match the server, category and search filters; the
+    status filter is left to the client, which also needs the rows leaving it.
+    """
+    if event.get('reload'):
+        return event
+    search = filters['search'].lower()
+    data = [
+        row for row in event['data']
+        if (not filters['server_filter'] or row['server_id'] in filters['server_filter'])
+        and (not filters['category'] or row['category'] == filters['category'])
+        and (not search or any(search in row[key].lower()
+                               for key in ('server_name', 'server_ip', 'component_name', 'component_oid')))
+    ]
+    polled = {server_id: timestamp for server_id, timestamp in event['polled'].items()
+              if not filters['server_filter'] or server_id in filters['server_filter']}
+    return dict(event, data=data, polled=polled)
+
+
+@dashboard_bp.route('/api/events')
+@login_required
+def api_events():
+    """Server-Sent Events: perubahan data dashboard setelah setiap siklus poll.
+    
+    Event ``changes`` berisi baris yang value/status-nya berubah (dengan
+    ``previous_status``), waktu poll per server, dan change cursor sebelum
+    (``from_cursor``) dan sesudah perubahan; atau ``reload``. Stream ditutup
+    setelah DASHBOARD_EVENTS_MAX_SECONDS dan browser menyambung ulang.
+    """
+    filters = get_dashboard_filters()
+    broadcaster = get_broadcaster(current_app._get_current_object())
+    max_seconds = current_app.config.get('DASHBOARD_EVENTS_MAX_SECONDS', 300)
+    
+    def stream():
+        subscription = broadcaster.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                try:
+                    event = subscription.get(timeout=15)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: changes\ndata: {json.dumps(filter_event(event, filters))}\n\n'
+        finally:
+            broadcaster.unsubscribe(subscription)
+    
+    return current_app.response_class(stream(), mimetype='text/event-stream',
+                                      headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@dashboard_bp.route('/api/components/<int:component_id>/history')
+@login_required
+def api_component_history(component_id):
+    """API endpoint untuk riwayat komponen per jam/hari dari tabel rollup (JSON)."""
+    from flask import jsonify
+    
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in ROLLUP_MODELS:
+        return jsonify({'success': False, 'error': 'Invalid granularity', 'data': []}), 400
+    
+    component = db.session.get(Component, component_id)
+    if component is None:
+        return jsonify({'success': False, 'error': 'Component not found', 'data': []}), 404
+    
+    # Default window: last day of hourly buckets or last 30 days of daily buckets
+    days = request.args.get('days', 1 if granularity == 'hour' else 30, type=int)
+    days = max(1, min(days, 366))
+    end = wib_now()
+    start = end - timedelta(days=days)
+    
+    history = component_history(component_id, start, end, granularity)
+    return jsonify({
+        'success': True,
+        'component_id': component_id,
+        'granularity': granularity,
+        'data': [bucket.to_dict() for bucket in history]
+    })
+
+
+@dashboard_bp.route('/api/values')
+@login_required
+def api_value_stats():
+    """API endpoint untuk min/max/rata-rata nilai numerik per server per jam/hari (JSON)."""
+    from flask import jsonify
+    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ROLLUP_MODELS:
+        return jsonify({'success': False, 'error': 'Invalid granularity', 'data': []}), 400
+    
+    category = request.args.get('category', 'suhu')
+    server_id = request.args.get('server_id', type=int)
+    days = request.args.get('days', 1 if granularity == 'hour' else 7, type=int)
+    days = max(1, min(days, 366))
+    end = wib_now()
+    start = end - timedelta(days=days)
+    
+    rows = value_stats(start, end, granularity, category=category, server_id=server_id)
+    return jsonify({
+        'success': True,
+        'category': category,
+        'granularity': granularity,
+        'data': [{
+            'server_id': sid,
+            'server_name': server_name,
+            'bucket': bucket.strftime('%Y-%m-%d %H:%M:%S'),
+            'samples': samples,
+            'value_min': value_min,
+            'value_max': value_max,
+            'value_avg': value_avg,
+        } for sid, server_name, bucket, samples, value_min, value_max, value_avg in rows]
+    })
+
+
 @dashboard_bp.route('/download-report', methods=['POST'])
 @login_required
 def download_report():
@@ -273,63 +350,28 @@ def download_report():
                                    search_query='', sort_by='server', sort_order='asc',
                                    categories=[], total_items=0)
         
-        # Query metrics for the specified month/year
-        metrics = Metric.query.filter(
-            extract('month', Metric.timestamp) == month,
-            extract('year', Metric.timestamp) == year
-        ).order_by(Metric.timestamp.desc()).all()
+        export_format = request.form.get('format', 'xlsx')
+        if export_format not in EXPORT_FORMATS:
+            export_format = 'xlsx'
         
-        if not metrics:
+        if not month_has_data(month, year):
             flash(f'Tidak ada data untuk bulan {month:02d}/{year}.', 'warning')
             return render_template('dashboard.html', dashboard_data=[], servers=[],
                                    server_filter=[], category_filter='', status_filter='',
                                    search_query='', sort_by='server', sort_order='asc',
                                    categories=[], total_items=0)
         
-        # Build report data dengan kolom sesuai permintaan
-        data = []
-        for i, m in enumerate(metrics):
-            data.append({
-                'Nomor': i + 1,
-                'Nama Server': m.server_name,
-                'IP Server': m.server_ip,
-                'Merk': m.brand,
-                'Kategori Komponen': m.category,
-                'Nama Komponen': m.component_name,
-                'OID': m.oid,
-                'Value': m.value,
-                'Status': m.status,
-                'Timestamp': m.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-            })
-        
-        df = pd.DataFrame(data)
-        output = BytesIO()
-        
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Report')
-            
-            # Auto-adjust column widths
-            worksheet = writer.sheets['Report']
-            for idx, col in enumerate(df.columns):
-                max_length = max(
-                    df[col].astype(str).map(len).max(),
-                    len(col)
-                ) + 2
-                # Gunakan openpyxl get_column_letter untuk kolom lebih dari 26
-                from openpyxl.utils import get_column_letter
-                worksheet.column_dimensions[get_column_letter(idx + 1)].width = min(max_length, 50)
-        
-        output.seek(0)
-        filename = f"laporan_monitoring_{year}_{month:02d}.xlsx"
-        
-        logger.info(f'Report downloaded from dashboard for {month:02d}/{year} by {current_user.username}: {len(metrics)} records')
-        
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        response = report_response(month, year, 'dashboard', export_format)
+        if response is not None:
+            logger.info(f'Report downloaded from dashboard for {month:02d}/{year} ({export_format}) by {current_user.username}')
+            return response
+        
+        # Not built yet: build it in the background instead of in this request
+        job, _ = enqueue_report(month, year, 'dashboard', export_format, current_user.username)
+        if job is None:
+            flash('Report tidak dapat diantrekan, silakan coba lagi.', 'warning')
+            return redirect(url_for('dashboard.dashboard'))
+        return redirect(url_for('report.download_report_job', job_id=job.id), code=303)
         
     except Exception as e:
         logger.error(f'Error downloading report: {e}', exc_info=True)
@@ -1,13 +1,16 @@
-from flask import Blueprint, render_template, request, send_file, flash, current_app
+from flask import Blueprint, render_template, request, send_file, flash, current_app, jsonify, redirect, url_for
 from flask_login import login_required, current_user
 from app.models.metric import Metric
 from app.models.server import Server, Component
-from io import BytesIO
-import pandas as pd
 from datetime import datetime
 from app import db
 from app.validators import admin_required, validate_month_year, ValidationError
-from sqlalchemy import extract
+from app.reports.query import month_metrics_query, month_summary
+from app.reports.export import EXPORT_FORMATS, LAYOUTS, MIMETYPES, month_has_data, report_filename
+from app.reports.cache import report_response
+from app.reports.jobs import enqueue_report, get_job
+from app.models.report import ACTIVE_JOB_STATUSES, JOB_DONE
+import os
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,59 +29,25 @@ def report():
                 request.form.get('year')
             )
             
-            # Query metrics for the specified month/year
-            metrics = Metric.query.filter(
-                extract('month', Metric.timestamp) == month,
-                extract('year', Metric.timestamp) == year
-            ).order_by(Metric.timestamp.desc()).all()
+            export_format = request.form.get('format', 'xlsx')
+            if export_format not in EXPORT_FORMATS:
+                raise ValidationError('Invalid report format', 'format')
             
-            if not metrics:
+            if not month_has_data(month, year):
                 flash(f'No data found for {month:02d}/{year}.', 'warning')
                 return render_template('report.html')
             
-            # Build report data
-            data = [
-                {
-                    'No': i + 1,
-                    'Nama Server': m.server_name,
-                    'IP': m.server_ip,
-                    'Nama Komponen': m.component_name,
-                    'OID': m.oid,
-                    'Merk': m.brand,
-                    'Value': m.value,
-                    'Status Metric': m.status,
-                    'Timestamp': m.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                    'Kategori': m.category
-                }
-                for i, m in enumerate(metrics)
-            ]
+            response = report_response(month, year, 'admin', export_format)
+            if response is not None:
+                logger.info(f'Report downloaded for {month:02d}/{year} ({export_format}) by {current_user.username}')
+                return response
             
-            df = pd.DataFrame(data)
-            output = BytesIO()
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Report')
-                
-                # Auto-adjust column widths
-                worksheet = writer.sheets['Report']
-                for idx, col in enumerate(df.columns):
-                    max_length = max(
-                        df[col].astype(str).map(len).max(),
-                        len(col)
-                    ) + 2
-                    worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
-            
-            output.seek(0)
-            filename = f"report_{year}_{month:02d}.xlsx"
-            
-            logger.info(f'Report generated for {month:02d}/{year} by {current_user.username}: {len(metrics)} records')
-            
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
+            # Not built yet: build it in the background instead of in this request
+            job, _ = enqueue_report(month, year, 'admin', export_format, current_user.username)
+            if job is None:
+                flash('Report job could not be queued, please retry.', 'warning')
+                return render_template('report.html')
+            return redirect(url_for('report.download_report_job', job_id=job.id), code=303)
             
         except ValidationError as e:
             flash(e.message, 'danger')
@@ -105,10 +74,7 @@ def report_preview():
             try:
                 month, year = validate_month_year(month, year)
                 
-                pagination = Metric.query.filter(
-                    extract('month', Metric.timestamp) == month,
-                    extract('year', Metric.timestamp) == year
-                ).order_by(Metric.timestamp.desc()).paginate(
+                pagination = month_metrics_query(month, year).paginate(
                     page=page, per_page=per_page, error_out=False
                 )
                 
@@ -116,6 +82,7 @@ def report_preview():
                     'report.html',
                     metrics=pagination.items,
                     pagination=pagination,
+                    summary=month_summary(month, year),
                     month=month,
                     year=year
                 )
@@ -128,3 +95,92 @@ def report_preview():
         logger.error(f'Error loading report preview: {e}', exc_info=True)
         flash('An error occurred while loading the report preview.', 'danger')
         return render_template('report.html')
+
+
+def _job_visible(job):
+    """Admin layout reports are only visible to admins."""
+    return job is not None and (job.layout != 'admin' or current_user.role.value == 'admin')
+
+
+def _job_payload(job):
+    payload = job.to_dict()
+    payload['status_url'] = url_for('report.report_job_status', job_id=job.id)
+    payload['download_url'] = (
+        url_for('report.download_report_job', job_id=job.id) if job.status == JOB_DONE else None
+    )
+    return payload
+
+
+@report_bp.route('/reports/jobs', methods=['POST'])
+@login_required
+def create_report_job():
+    """Queue a monthly report build in the background and return its job id."""
+    try:
+        month, year = validate_month_year(
+            request.form.get('month'),
+            request.form.get('year')
+        )
+        layout = request.form.get('layout', 'dashboard')
+        export_format = request.form.get('format', 'xlsx')
+        if layout not in LAYOUTS:
+            raise ValidationError('Invalid report layout', 'layout')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError('Invalid report format', 'format')
+        
+        if layout == 'admin' and current_user.role.value != 'admin':
+            return jsonify({'success': False, 'error': 'Admin access required.'}), 403
+        
+        if not month_has_data(month, year):
+            return jsonify({'success': False, 'error': f'No data found for {month:02d}/{year}.'}), 404
+        
+        job, created = enqueue_report(month, year, layout, export_format, current_user.username)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Report job could not be queued, please retry.'}), 409
+        
+        return jsonify({'success': True, 'created': created, **_job_payload(job)}), 202
+        
+    except ValidationError as e:
+        logger.warning(f'Validation error queueing report: {e.message}')
+        return jsonify({'success': False, 'error': e.message}), 400
+    except Exception as e:
+        logger.error(f'Error queueing report: {e}', exc_info=True)
+        return jsonify({'success': False, 'error': 'An error occurred while queueing the report.'}), 500
+
+
+@report_bp.route('/reports/jobs/<job_id>', methods=['GET'])
+@login_required
+def report_job_status(job_id):
+    """Return the status and progress of a report job."""
+    job = get_job(job_id)
+    if not _job_visible(job):
+        return jsonify({'success': False, 'error': 'Report job not found.'}), 404
+    return jsonify({'success': True, **_job_payload(job)})
+
+
+@report_bp.route('/reports/jobs/<job_id>/download', methods=['GET'])
+@login_required
+def download_report_job(job_id):
+    """Serve the file built by a finished report job.
+
+    While the job is still queued or running, answers 202 with the job's
+    progress and a Refresh header, so a browser without JavaScript waits on
+    this page until the download starts.
+    """
+    job = get_job(job_id)
+    if _job_visible(job) and job.status in ACTIVE_JOB_STATUSES:
+        progress = '' if job.progress is None else f' {job.progress}%'
+        return current_app.response_class(
+            f'Report {job.month:02d}/{job.year} (job {job.id}) is being generated...{progress}\n',
+            status=202, mimetype='text/plain', headers={'Refresh': '3'}
+        )
+    if not _job_visible(job) or job.status != JOB_DONE or not job.file_path or not os.path.exists(job.file_path):
+        flash('Report is not available, please generate it again.', 'warning')
+        return redirect(url_for('dashboard.dashboard'))
+    
+    logger.info(f'Report job {job.id} downloaded by {current_user.username}')
+    return send_file(
+        job.file_path,
+        as_attachment=True,
+        download_name=report_filename(job.layout, job.month, job.year, job.export_format),
+        mimetype=MIMETYPES[job.export_format]
+    )
@@ -3,6 +3,10 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app import db
 from app.models.server import Server, Component
+from app.models.metric import Metric
+from app.reports.cache import invalidate_report_artifacts
+from app.scheduler.snmp import invalidate_server
+from sqlalchemy import func
 from app.validators import (
     admin_required, validate_required, validate_ip_address, 
     validate_snmp_version, validate_brand, ValidationError
@@ -51,6 +55,7 @@ def edit_server(server_id):
             server.snmp_priv_proto = request.form.get('snmp_priv_proto', '').strip() or None
             
             db.session.commit()
+            invalidate_server(server.id)
             logger.info(f'Server {server.id} ({server.name}) updated by {current_user.username}')
             flash('Server updated successfully!', 'success')
             return redirect(url_for('server.servers'))
@@ -72,8 +77,15 @@ def delete_server(server_id):
     try:
         server = Server.query.get_or_404(server_id)
         server_name = server.name
+        # Reports of the months holding its metrics are no longer valid
+        first, last = db.session.query(
+            func.min(Metric.timestamp), func.max(Metric.timestamp)
+        ).filter(Metric.server_id == server_id).one()
         db.session.delete(server)
         db.session.commit()
+        invalidate_server(server_id)
+        if first is not None:
+            invalidate_report_artifacts(first, last)
         logger.info(f'Server {server_id} ({server_name}) deleted by {current_user.username}')
         flash('Server deleted successfully!', 'success')
     except Exception as e:
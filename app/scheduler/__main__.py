@@ -0,0 +1,69 @@
+"""Standalone SNMP poller worker.
+
+Runs periodic polling outside the web application, so the web tier only
+reads metrics and both can be scaled independently:
+
+    python -m app.scheduler
+    python -m app.scheduler --once
+    python -m app.scheduler --concurrency 200 --deadline 120
+    python -m app.scheduler --rollup
+
+Command line options override the corresponding SNMP_* settings. ``--once``
+takes the scheduler leader lock like the scheduled jobs, so it exits with
+status 1 while another poller is running.
+"""
+import argparse
+import signal
+import sys
+
+from app import create_worker_app
+from app.scheduler.monitor import init_leader_lock, poll_all_with_context, run_poller
+from app.scheduler.rollup import run_rollup
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.scheduler', description='Run the SNMP poller worker.')
+    parser.add_argument('--once', action='store_true', help='run a single poll cycle and exit')
+    parser.add_argument('--interval', type=int, help='minutes between poll cycles (SNMP_POLL_INTERVAL)')
+    parser.add_argument('--concurrency', type=int, help='max SNMP requests in flight (SNMP_POLL_CONCURRENCY)')
+    parser.add_argument('--deadline', type=int, help='seconds before a cycle abandons pending requests (SNMP_POLL_DEADLINE)')
+    parser.add_argument('--rollup', action='store_true', help='roll up new raw metrics into hourly/daily tables and exit')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_worker_app()
+
+    if args.interval is not None:
+        app.config['SNMP_POLL_INTERVAL_MINUTES'] = args.interval
+    if args.concurrency is not None:
+        app.config['SNMP_POLL_CONCURRENCY'] = args.concurrency
+    if args.deadline is not None:
+        app.config['SNMP_POLL_DEADLINE_SECONDS'] = args.deadline
+
+    if args.rollup:
+        with app.app_context():
+            run_rollup(batch_size=app.config.get('ROLLUP_BATCH_SIZE', 50000),
+                       lag_seconds=app.config.get('ROLLUP_LAG_SECONDS', 600))
+        return 0
+
+    if args.once:
+        init_leader_lock(app)
+        if not app.leader_lock.acquire():
+            print('Another poller holds the scheduler leader lock, not polling', file=sys.stderr)
+            return 1
+        try:
+            poll_all_with_context(app)
+        finally:
+            app.leader_lock.release()
+        return 0
+
+    # Stop cleanly on `docker stop` so the leader lock is released right away
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    run_poller(app)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Classification of polled SNMP values into metric statuses.
+
+Rules live in a JSON file (``CLASSIFICATION_RULES``, by default
+classification_rules.json next to this module) and are compiled once into
+lookup tables: a rule per (brand, category) plus overrides per OID and per
+OID prefix (e.g. a vendor table column). Two kinds of rules exist:
+
+- ``state``: the normalized value is looked up in frozensets of OK and
+  Warning states, anything else gets ``otherwise``.
+- ``threshold``: the numeric value, multiplied by ``scale`` (default 1,
+  e.g. 0.1 for readings in tenths of a degree), is placed among ascending
+  ``bounds`` with bisect; ``statuses`` has one more entry than ``bounds``
+  and non-numeric values get ``invalid``.
+
+Numbers of values under threshold rules are also stored as the metric's
+``value_num`` (scaled); other values have none.
+
+Empty values are ``empty_status``, unknown brands use ``default_brand`` and
+values of categories without a rule get ``default_status``. The file is
+re-read when its modification time changes, so rule edits apply on the next
+poll.
+"""
+import json
+import logging
+import os
+import threading
+from bisect import bisect_right
+
+from app.models.metric import numeric_value
+
+logger = logging.getLogger(__name__)
+
+# Stored as the value of components that did not answer a poll (status Critical)
+NO_RESPONSE = 'N/A'
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'classification_rules.json')
+
+
+class RulesError(ValueError):
+    """Raised for an invalid classification rules file."""
+
+
+class StateRule:
+    """Status from sets of normalized (stripped, lower-case) states."""
+
+    def __init__(self, ok, warning, otherwise='Critical'):
+        self.ok = frozenset(str(state).strip().lower() for state in ok)
+        self.warning = frozenset(str(state).strip().lower() for state in warning)
+        self.otherwise = otherwise
+
+    def measure(self, number):
+        """States are codes, not measurements: nothing is stored as value_num."""
+        return None
+
+    def __call__(self, text, number):
+        if text in self.ok:
+            return 'OK'
+        if text in self.warning:
+            return 'Warning'
+        return self.otherwise
+
+
+class ThresholdRule:
+    """Status from the position of a numeric value among ascending bounds."""
+
+    def __init__(self, bounds, statuses, invalid='Critical', scale=1):
+        self.bounds = tuple(float(bound) for bound in bounds)
+        self.statuses = tuple(statuses)
+        self.invalid = invalid
+        self.scale = float(scale)
+        if list(self.bounds) != sorted(self.bounds):
+            raise RulesError(f'Threshold bounds must be ascending: {bounds}')
+        if len(self.statuses) != len(self.bounds) + 1:
+            raise RulesError(f'Threshold rule needs {len(self.bounds) + 1} statuses, got {statuses}')
+
+    def measure(self, number):
+        """The value stored as value_num: the scaled number."""
+        return None if number is None else number * self.scale
+
+    def __call__(self, text, number):
+        if number is None:
+            return self.invalid
+        return self.statuses[bisect_right(self.bounds, number * self.scale)]
+
+
+RULE_TYPES = {
+    'state': lambda spec: StateRule(spec['ok'], spec.get('warning', ()), spec.get('otherwise', 'Critical')),
+    'threshold': lambda spec: ThresholdRule(spec['bounds'], spec['statuses'], spec.get('invalid', 'Critical'),
+                                            spec.get('scale', 1)),
+}
+
+
+def _compile_rule(spec, named):
+    """Compile an inline rule spec, or look up a named rule."""
+    if isinstance(spec, str):
+        if spec not in named:
+            raise RulesError(f'Unknown classification rule: {spec}')
+        return named[spec]
+    try:
+        return RULE_TYPES[spec['type']](spec)
+    except KeyError as e:
+        raise RulesError(f'Invalid classification rule {spec}: missing {e}') from None
+
+
+class Classifier:
+    """Compiled classification rules."""
+
+    def __init__(self, rules):
+        named = {}
+        for name, spec in rules.get('rules', {}).items():
+            named[name] = _compile_rule(spec, named)
+        self.rules = named
+        self.brands = {
+            brand: {category: _compile_rule(spec, named) for category, spec in categories.items()}
+            for brand, categories in rules.get('brands', {}).items()
+        }
+        self.oids = {oid: _compile_rule(spec, named) for oid, spec in rules.get('oids', {}).items()}
+        self.oid_prefixes = {
+            prefix.rstrip('.') + '.': _compile_rule(spec, named)
+            for prefix, spec in rules.get('oid_prefixes', {}).items()
+        }
+        self.default_brand = self.brands.get(rules.get('default_brand', 'custom'), {})
+        self.default_status = rules.get('default_status', 'OK')
+        self.empty_status = rules.get('empty_status', 'Unknown')
+
+    def rule_for(self, brand, category, oid=None):
+        """The compiled rule of a component, or None for default_status."""
+        rule = self._oid_rule(oid)
+        if rule is None:
+            rule = self.brands.get(brand, self.default_brand).get(category)
+        return rule
+
+    def _oid_rule(self, oid):
+        """The override rule of an OID, or None. Prefix matches are memoized in oids."""
+        if oid is None:
+            return None
+        if oid in self.oids:
+            return self.oids[oid]
+        rule = None
+        for prefix, prefix_rule in self.oid_prefixes.items():
+            if oid.startswith(prefix):
+                rule = prefix_rule
+                break
+        self.oids[oid] = rule
+        return rule
+
+    def apply(self, rule, value, number=None):
+        """Classify one value with a compiled rule (see rule_for)."""
+        if rule is None:
+            return self.default_status
+        if value is None:
+            return self.empty_status
+        text = str(value).strip().lower()
+        if not text:
+            return self.empty_status
+        if number is None:
+            number = numeric_value(text)
+        return rule(text, number)
+
+    def classify(self, brand, category, oid, value, number=None):
+        return self.apply(self.rule_for(brand, category, oid), value, number)
+
+    def measure(self, rule, number):
+        """The value_num of a parsed number under a compiled rule.
+
+        Only threshold rules measure something; values under state rules or
+        without a rule get None, so rollups and /api/values average real
+        measurements only.
+        """
+        if rule is None or number is None:
+            return None
+        return rule.measure(number)
+
+    def classify_server(self, server, results):
+        """Classify the (component, value, number) results of one server.
+
+        Returns (status, value_num) pairs in the order of ``results``.
+        """
+        brand_rules = self.brands.get(server.brand, self.default_brand)
+        classified = []
+        for component, value, number in results:
+            rule = self._oid_rule(component.oid) or brand_rules.get(component.category)
+            classified.append((self.apply(rule, value, number), self.measure(rule, number)))
+        return classified
+
+
+def load_classifier(path):
+    with open(path, encoding='utf-8') as f:
+        try:
+            rules = json.load(f)
+        except json.JSONDecodeError as e:
+            raise RulesError(f'Invalid JSON in {path}: {e}') from None
+    return Classifier(rules)
+
+
+_lock = threading.Lock()
+_cache = {}  # path -> (mtime, Classifier)
+
+
+def get_classifier(path=None):
+    """Return the compiled rules of ``path``, recompiled when the file changes.
+
+    If the file can not be read or compiled, the last good rules of the path
+    are kept (or the built-in rules if there are none yet).
+    """
+    with _lock:
+        return _get_classifier(path or DEFAULT_RULES_PATH)
+
+
+def _get_classifier(path):
+    cached = _cache.get(path)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError as e:
+        mtime, error = None, e
+    else:
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            classifier = load_classifier(path)
+        except (OSError, RulesError) as e:
+            error = e
+        else:
+            if cached:
+                logger.info(f"Reloaded classification rules from {path}")
+            _cache[path] = (mtime, classifier)
+            return classifier
+
+    if cached is None:
+        if path == DEFAULT_RULES_PATH:
+            raise error
+        cached = (None, _get_classifier(DEFAULT_RULES_PATH))
+    elif cached[0] == mtime:
+        return cached[1]
+    # Logged once per change of the file, not on every poll
+    logger.error(f"Could not load classification rules from {path}, keeping previous rules: {error}")
+    _cache[path] = (mtime, cached[1])
+    return cached[1]
@@ -0,0 +1,112 @@
+"""Discovery of components from vendor SNMP health tables.
+
+Each table is a column of per-row values (a status, or a reading such as a
+temperature), optionally with a column of row names. Discovery walks them
+with GETBULK and creates a Component per row (OID ``<value column>.<row
+index>``); the poller then reads all rows of a column with one walk instead
+of a GET per component.
+"""
+import logging
+
+from app import db
+from app.models.server import Component
+from app.scheduler.snmp import walk_columns
+
+logger = logging.getLogger(__name__)
+
+# Value (and name) columns per brand: CPQHLTH/CPQIDA-MIB for HPE, IDRAC-MIB for Dell.
+# HPE columns are conditions (1 other, 2 ok, 3 degraded, 4 failed), which the
+# generic state rule classifies; drives use cpqDaPhyDrvCondition rather than
+# cpqDaPhyDrvStatus, whose 3 means failed (hpe_drive_status rule).
+# Dell status columns use ObjectStatusEnum (3 = ok) and are classified by the
+# dell_status rule in classification_rules.json; Dell temperatures are the
+# probe readings in tenths of a degree (dell_temperature rule). ``replaces`` is
+# a column earlier versions discovered for the table: its components are moved
+# to the value column.
+DISCOVERY_TABLES = {
+    'HPE': [
+        {'category': 'fan', 'label': 'Fan', 'value': '1.3.6.1.4.1.232.6.2.6.7.1.9'},
+        {'category': 'suhu', 'label': 'Temperature', 'value': '1.3.6.1.4.1.232.6.2.6.8.1.4'},
+        {'category': 'PSU', 'label': 'Power Supply', 'value': '1.3.6.1.4.1.232.6.2.9.3.1.4'},
+        {'category': 'harddisk', 'label': 'Drive', 'value': '1.3.6.1.4.1.232.3.2.5.1.1.37',
+         'replaces': '1.3.6.1.4.1.232.3.2.5.1.1.6',
+         'name': '1.3.6.1.4.1.232.3.2.5.1.1.64'},
+    ],
+    'Dell': [
+        {'category': 'fan', 'label': 'Fan', 'value': '1.3.6.1.4.1.674.10892.5.4.700.12.1.5',
+         'name': '1.3.6.1.4.1.674.10892.5.4.700.12.1.8'},
+        {'category': 'suhu', 'label': 'Temperature', 'value': '1.3.6.1.4.1.674.10892.5.4.700.20.1.6',
+         'replaces': '1.3.6.1.4.1.674.10892.5.4.700.20.1.5',
+         'name': '1.3.6.1.4.1.674.10892.5.4.700.20.1.8'},
+        {'category': 'PSU', 'label': 'Power Supply', 'value': '1.3.6.1.4.1.674.10892.5.4.600.12.1.5',
+         'name': '1.3.6.1.4.1.674.10892.5.4.600.12.1.8'},
+        {'category': 'harddisk', 'label': 'Disk', 'value': '1.3.6.1.4.1.674.10892.5.5.1.20.130.4.1.24',
+         'name': '1.3.6.1.4.1.674.10892.5.5.1.20.130.4.1.55'},
+    ],
+}
+
+
+def table_columns():
+    """Value columns of all discovery tables; the poller walks these."""
+    return tuple(table['value'] for tables in DISCOVERY_TABLES.values() for table in tables)
+
+
+def discover_components(server, max_repetitions=25, timeout=2, retries=0):
+    """Create or update the components of a server from its vendor tables.
+
+    New rows become components named after the name column (or
+    "<label> <index>"); existing components of a row get the table's
+    category and the agent's name, and components of a ``replaces`` column
+    get the OID of the value column. Components are never deleted.
+
+    Returns a dict with components created, updated and unchanged, and the
+    number of tables that could not be walked.
+    """
+    stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+    tables = DISCOVERY_TABLES.get(server.brand, [])
+    if not tables:
+        return stats
+
+    columns = [table['value'] for table in tables] + [table['name'] for table in tables if table.get('name')]
+    walked = walk_columns(server, columns, max_repetitions, timeout=timeout, retries=retries)
+    existing = {component.oid: component for component in server.components}
+
+    for table in tables:
+        rows = walked.get(table['value'])
+        if rows is None:
+            stats['failed'] += 1
+            continue
+        names = walked.get(table.get('name')) or {}
+        for oid in rows:
+            index = oid[len(table['value']) + 1:]
+            agent_name = names.get(f"{table.get('name')}.{index}", '').strip()[:128]
+            component = existing.get(oid)
+            replaced = existing.get(f"{table['replaces']}.{index}") if table.get('replaces') else None
+            if component is None and replaced is not None:
+                replaced.oid = oid
+                replaced.category = table['category']
+                replaced.name = agent_name or replaced.name
+                existing[oid] = replaced
+                stats['updated'] += 1
+            elif component is None:
+                component = Component(
+                    name=agent_name or f"{table['label']} {index}",
+                    oid=oid,
+                    category=table['category'],
+                    brand=server.brand,
+                    server_id=server.id
+                )
+                db.session.add(component)
+                existing[oid] = component
+                stats['created'] += 1
+            elif component.category != table['category'] or (agent_name and component.name != agent_name):
+                component.category = table['category']
+                component.name = agent_name or component.name
+                stats['updated'] += 1
+            else:
+                stats['unchanged'] += 1
+
+    db.session.commit()
+    logger.info(f"Discovery on {server.name}: {stats['created']} created, {stats['updated']} updated, "
+                f"{stats['unchanged']} unchanged, {stats['failed']} tables failed")
+    return stats
@@ -0,0 +1,124 @@
+"""Leader election so only one process in the deployment runs scheduled jobs."""
+import logging
+import os
+import threading
+
+from sqlalchemy import text
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """Session-scoped lock held by the process that runs scheduled polling.
+
+    On PostgreSQL the lock is an advisory lock held on a dedicated
+    connection, so it is shared by every process and container using the
+    database and released by the server as soon as the holder dies. Other
+    databases fall back to an exclusive lock on a local file, which only
+    coordinates processes on the same host.
+
+    Followers call ``acquire`` on every scheduler tick, so one of them takes
+    over within an interval of the leader going away. Scheduled jobs run on
+    separate worker threads, so the lock connection is only used under
+    ``_lock``.
+    """
+
+    def __init__(self, engine, lock_id, lock_file):
+        self.engine = engine
+        self.lock_id = lock_id
+        self.lock_file = lock_file
+        self._conn = None
+        self._fd = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self):
+        return self._conn is not None or self._fd is not None
+
+    def acquire(self):
+        """Try to become (or confirm being) the leader. Returns True if leader."""
+        with self._lock:
+            if self.engine.dialect.name == 'postgresql':
+                return self._acquire_advisory()
+            return self._acquire_file()
+
+    def _acquire_advisory(self):
+        if self._conn is not None:
+            try:
+                # The lock lives as long as this connection does
+                self._conn.execute(text('SELECT 1'))
+                return True
+            except Exception as e:
+                logger.warning(f"Lost scheduler leadership, lock connection failed: {e}")
+                self._close_conn()
+
+        conn = None
+        try:
+            conn = self.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+            acquired = conn.execute(
+                text('SELECT pg_try_advisory_lock(:lock_id)'), {'lock_id': self.lock_id}
+            ).scalar()
+        except Exception as e:
+            logger.error(f"Error acquiring scheduler leadership: {e}", exc_info=True)
+            acquired = False
+
+        if not acquired:
+            if conn is not None:
+                conn.close()
+            return False
+
+        self._conn = conn
+        logger.info(f"Acquired scheduler leadership (advisory lock {self.lock_id}, pid {os.getpid()})")
+        return True
+
+    def _acquire_file(self):
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            logger.warning("File locking unavailable on this platform, running scheduler without leader election")
+            self._fd = -1
+            return True
+
+        lock_dir = os.path.dirname(self.lock_file)
+        if lock_dir and not os.path.exists(lock_dir):
+            os.makedirs(lock_dir)
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        logger.info(f"Acquired scheduler leadership (lock file {self.lock_file}, pid {os.getpid()})")
+        return True
+
+    def release(self):
+        """Give up leadership, letting another process take over."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute(text('SELECT pg_advisory_unlock(:lock_id)'), {'lock_id': self.lock_id})
+                except Exception as e:
+                    logger.warning(f"Error releasing scheduler advisory lock: {e}")
+                self._close_conn()
+            if self._fd is not None:
+                if self._fd >= 0:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    os.close(self._fd)
+                self._fd = None
+
+    def _close_conn(self):
+        # Not the leader any more, even if closing the connection fails
+        conn, self._conn = self._conn, None
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -1,9 +1,10 @@
 import time
 from app import db
 from app.models.server import Server, Component
-from app.models.metric import Metric
+from app.models.metric import Metric, numeric_value
 from datetime import datetime, timezone, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
 
 def wib_now():
     """Return current time in WIB (UTC+7) as naive datetime."""
@@ -12,162 +13,22 @@ def wib_now():
     return wib_time.replace(tzinfo=None)  # Remove timezone info for PostgreSQL
 
 from flask import current_app
-from pysnmp.hlapi import (
-    getCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, 
-    ObjectType, ObjectIdentity, UsmUserData, 
-    usmHMACMD5AuthProtocol, usmHMACSHAAuthProtocol, 
-    usmHMAC128SHA224AuthProtocol, usmHMAC192SHA256AuthProtocol,
-    usmDESPrivProtocol, usmAesCfb128Protocol
-)
+from app.scheduler.discovery import table_columns
+from app.scheduler.snmp import poll_targets
+from app.scheduler.leader import LeaderLock
+from app.scheduler.writer import write_metrics, upsert_latest_metrics, component_versions
+from app.scheduler.rollup import run_rollup
+from app.scheduler.retention import prune_metrics
+from app.scheduler.partitions import ensure_partitions
+from app.scheduler.classification import get_classifier, NO_RESPONSE
 
 import logging
 logger = logging.getLogger(__name__)
 
-# SNMP value classification per brand/component
-SNMP_CLASSIFICATION = {
-    'HPE': {
-        'fan': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'PSU': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'harddisk': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'suhu': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if float(v) < 50 else ('Warning' if float(v) < 60 else 'Critical')),
-    },
-    'Dell': {
-        'fan': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'PSU': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'harddisk': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'suhu': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if float(v) < 55 else ('Warning' if float(v) < 65 else 'Critical')),
-    },
-    'supermicro': {
-        'fan': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'PSU': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'harddisk': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'suhu': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if float(v) < 50 else ('Warning' if float(v) < 60 else 'Critical')),
-    },
-    'custom': {
-        'fan': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'PSU': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'harddisk': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-        'suhu': lambda v: 'Unknown' if v is None or str(v).strip() == '' else
-            ('OK' if str(v).lower() in ['ok', 'good', '1', '2']
-             else ('Warning' if str(v).lower() in ['warning', 'degraded', '3']
-                   else 'Critical')),
-    }
-}
-
-def snmp_get(server, component):
-    """Perform SNMP GET operation for a component on a server."""
-    logger.debug(f"SNMP GET: server={server.name} ip={server.ip} oid={component.oid} v={server.snmp_version}")
-    try:
-        if server.snmp_version == 'v2c':
-            if not server.community:
-                logger.error(f"SNMP v2c requires community string for server {server.name}")
-                return None
-            iterator = getCmd(
-                SnmpEngine(),
-                CommunityData(server.community, mpModel=1),
-                UdpTransportTarget((server.ip, 161), timeout=2, retries=0),
-                ContextData(),
-                ObjectType(ObjectIdentity(component.oid))
-            )
-        else:  # v3
-            if not server.snmp_auth_user or not server.snmp_auth_pass:
-                logger.error(f"SNMP v3 requires auth credentials for server {server.name}")
-                return None
-            
-            # Map auth protocol
-            auth_proto_map = {
-                'MD5': usmHMACMD5AuthProtocol,
-                'SHA': usmHMACSHAAuthProtocol,
-                'SHA-224': usmHMAC128SHA224AuthProtocol,
-                'SHA-256': usmHMAC192SHA256AuthProtocol
-            }
-            auth_proto = auth_proto_map.get(server.snmp_auth_proto, usmHMACMD5AuthProtocol)
-            
-            # Map priv protocol
-            priv_proto = usmDESPrivProtocol if server.snmp_priv_proto == 'DES' else usmAesCfb128Protocol
-            
-            iterator = getCmd(
-                SnmpEngine(),
-                UsmUserData(
-                    server.snmp_auth_user,
-                    server.snmp_auth_pass,
-                    server.snmp_priv_pass,
-                    authProtocol=auth_proto,
-                    privProtocol=priv_proto
-                ),
-                UdpTransportTarget((server.ip, 161), timeout=2, retries=0),
-                ContextData(),
-                ObjectType(ObjectIdentity(component.oid))
-            )
-        
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-        
-        if errorIndication:
-            logger.warning(f"SNMP Error Indication for {server.name}/{component.name}: {errorIndication}")
-            return None
-        if errorStatus:
-            logger.warning(f"SNMP Error Status for {server.name}/{component.name}: {errorStatus.prettyPrint()} at {errorIndex}")
-            return None
-        
-        for varBind in varBinds:
-            value = str(varBind[1])
-            logger.debug(f"SNMP Result for {server.name}/{component.name}: {value}")
-            return value
-            
-    except Exception as e:
-        logger.error(f"SNMP Exception for {server.name}/{component.name}: {e}", exc_info=True)
-        return None
-    
-    return None
-
 def classify_value(server, component, value):
     """Classify SNMP value based on brand and component category."""
-    try:
-        brand_classifiers = SNMP_CLASSIFICATION.get(server.brand, SNMP_CLASSIFICATION['custom'])
-        classifier = brand_classifiers.get(component.category, lambda v: 'OK')
-        return classifier(value)
-    except (ValueError, TypeError) as e:
-        logger.warning(f"Classification error for {server.name}/{component.name}: {e}")
-        return 'Critical'
+    classifier = get_classifier(current_app.config.get('CLASSIFICATION_RULES'))
+    return classifier.classify(server.brand, component.category, component.oid, value)
 
 def poll_all():
     """Poll all servers and components for SNMP metrics."""
@@ -178,52 +39,78 @@ def poll_all():
     error_count = 0
     
     try:
-        servers = Server.query.all()
+        servers = Server.query.options(db.selectinload(Server.components)).all()
         
         if not servers:
             logger.info("No servers configured for polling")
             return
         
+        targets = []
         for server in servers:
             if not server.components:
                 logger.debug(f"Server {server.name} has no components configured")
                 continue
-            
-            for component in server.components:
-                try:
-                    value = snmp_get(server, component)
-                    
-                    if value is None:
-                        status = 'Critical'
-                        value = 'N/A'
-                        error_count += 1
-                    else:
-                        status = classify_value(server, component, value)
-                        success_count += 1
-                    
-                    metric = Metric(
-                        server_id=server.id,
-                        component_id=component.id,
-                        oid=component.oid,
-                        value=value,
-                        status=status,
-                        brand=server.brand,
-                        component_name=component.name,
-                        server_name=server.name,
-                        server_ip=server.ip,
-                        category=component.category,
-                        timestamp=wib_now()
-                    )
-                    db.session.add(metric)
-                    
-                except Exception as e:
-                    logger.error(f"Error polling {server.name}/{component.name}: {e}", exc_info=True)
-                    error_count += 1
+            targets.extend((server, component) for component in server.components)
         
+        config = current_app.config
+        values = poll_targets(
+            targets,
+            concurrency=config.get('SNMP_POLL_CONCURRENCY', 50),
+            deadline=config.get('SNMP_POLL_DEADLINE_SECONDS', 240),
+            timeout=config.get('SNMP_TIMEOUT_SECONDS', 2),
+            retries=config.get('SNMP_RETRIES', 0),
+            max_varbinds=config.get('SNMP_MAX_VARBINDS', 20),
+            table_columns=table_columns(),
+            max_repetitions=config.get('SNMP_MAX_REPETITIONS', 25)
+        )
+        
+        classifier = get_classifier(config.get('CLASSIFICATION_RULES'))
+        versions = component_versions(targets)
+        rows = []
+        for server in servers:
+            if not server.components:
+                continue
+            try:
+                # Classify the results of the server in one batch
+                polled = [
+                    (component, values[component.id], numeric_value(values[component.id]))
+                    for component in server.components if values.get(component.id) is not None
+                ]
+                results = classifier.classify_server(server, polled)
+                classified = {component.id: (value, number, status)
+                              for (component, value, _), (status, number) in zip(polled, results)}
+                timestamp = wib_now()
+                
+                for component in server.components:
+                    value, number, status = classified.get(component.id, (NO_RESPONSE, None, 'Critical'))
+                    rows.append({
+                        'server_id': server.id,
+                        'component_id': component.id,
+                        'version_id': versions[component.id],
+                        'value': value,
+                        'value_num': number,
+                        'status': status,
+                        'timestamp': timestamp
+                    })
+                success_count += len(polled)
+                error_count += len(server.components) - len(polled)
+                
+            except Exception as e:
+                logger.error(f"Error classifying results of {server.name}: {e}", exc_info=True)
+                error_count += len(server.components)
+        
+        # Release the read transaction before the chunked writes
         db.session.commit()
+        write_stats = write_metrics(
+            rows,
+            chunk_size=config.get('METRIC_WRITE_CHUNK_SIZE', 1000),
+            method=config.get('METRIC_WRITE_METHOD', 'auto')
+        )
+        upsert_latest_metrics(rows, chunk_size=config.get('METRIC_WRITE_CHUNK_SIZE', 1000))
         
         poll_duration = (datetime.utcnow() - poll_start).total_seconds()
-        logger.info(f"SNMP polling completed: {success_count} success, {error_count} errors, duration: {poll_duration:.2f}s")
+        logger.info(f"SNMP polling completed: {success_count} success, {error_count} errors, "
+                    f"{write_stats['written']} rows written in {write_stats['duration']:.2f}s, duration: {poll_duration:.2f}s")
         
     except Exception as e:
         db.session.rollback()
@@ -237,23 +124,158 @@ def poll_all_with_context(app):
     except Exception as e:
         logger.error(f"Error running poll_all_with_context: {e}", exc_info=True)
 
+def scheduled_poll(app):
+    """Run a scheduled poll cycle if this process is the scheduler leader."""
+    if not app.leader_lock.acquire():
+        logger.debug("Skipping scheduled SNMP poll, another process is the scheduler leader")
+        return
+    poll_all_with_context(app)
+
+def scheduled_rollup(app):
+    """Roll up new raw metrics if this process is the scheduler leader."""
+    if not app.leader_lock.acquire():
+        logger.debug("Skipping metric rollup, another process is the scheduler leader")
+        return
+    try:
+        with app.app_context():
+            run_rollup(
+                batch_size=app.config.get('ROLLUP_BATCH_SIZE', 50000),
+                chunk_size=app.config.get('METRIC_WRITE_CHUNK_SIZE', 1000),
+                lag_seconds=app.config.get('ROLLUP_LAG_SECONDS', 600)
+            )
+    except Exception as e:
+        logger.error(f"Error running metric rollup: {e}", exc_info=True)
+
+def scheduled_retention(app):
+    """Prune old raw metrics if this process is the scheduler leader."""
+    if not app.leader_lock.acquire():
+        logger.debug("Skipping metric retention, another process is the scheduler leader")
+        return
+    config = app.config
+    try:
+        with app.app_context():
+            # Only rolled up rows are pruned, so catch up first
+            run_rollup(batch_size=config.get('ROLLUP_BATCH_SIZE', 50000),
+                       lag_seconds=config.get('ROLLUP_LAG_SECONDS', 600))
+            prune_metrics(
+                config.get('METRIC_RETENTION_DAYS'),
+                batch_size=config.get('RETENTION_BATCH_SIZE', 5000),
+                pause=config.get('RETENTION_BATCH_PAUSE', 0.5),
+                max_seconds=config.get('RETENTION_MAX_SECONDS', 600),
+                keep_reports=config.get('RETENTION_KEEP_REPORTS', True),
+                chunk_size=config.get('REPORT_CHUNK_SIZE', 5000)
+            )
+    except Exception as e:
+        logger.error(f"Error running metric retention: {e}", exc_info=True)
+
+def scheduled_partitions(app):
+    """Create upcoming metric partitions if this process is the scheduler leader."""
+    if not app.leader_lock.acquire():
+        logger.debug("Skipping metric partition maintenance, another process is the scheduler leader")
+        return
+    try:
+        with app.app_context():
+            ensure_partitions(app.config.get('METRIC_PARTITION_MONTHS_AHEAD', 3))
+    except Exception as e:
+        logger.error(f"Error creating metric partitions: {e}", exc_info=True)
+
+def init_leader_lock(app):
+    """Attach the scheduler leader lock to the app."""
+    with app.app_context():
+        app.leader_lock = LeaderLock(
+            db.engine,
+            app.config.get('SCHEDULER_LOCK_ID'),
+            app.config.get('SCHEDULER_LOCK_FILE')
+        )
+
+def add_poll_job(scheduler, app, **kwargs):
+    """Register the periodic SNMP poll job on a scheduler."""
+    poll_interval = app.config.get('SNMP_POLL_INTERVAL_MINUTES', 5)
+    scheduler.add_job(
+        func=lambda: scheduled_poll(app),
+        trigger="interval",
+        minutes=poll_interval,
+        id='snmp_polling',
+        replace_existing=True,
+        **kwargs
+    )
+    return poll_interval
+
+def add_rollup_job(scheduler, app, **kwargs):
+    """Register the periodic metric rollup job on a scheduler."""
+    rollup_interval = app.config.get('ROLLUP_INTERVAL_MINUTES', 15)
+    scheduler.add_job(
+        func=lambda: scheduled_rollup(app),
+        trigger="interval",
+        minutes=rollup_interval,
+        id='metric_rollup',
+        replace_existing=True,
+        **kwargs
+    )
+    return rollup_interval
+
+def add_retention_job(scheduler, app, **kwargs):
+    """Register the daily raw metric retention job, unless retention is disabled."""
+    retention_days = app.config.get('METRIC_RETENTION_DAYS', 0)
+    if retention_days <= 0:
+        logger.info("Metric retention disabled, raw metrics are kept forever")
+        return None
+    scheduler.add_job(
+        func=lambda: scheduled_retention(app),
+        trigger="cron",
+        hour=app.config.get('RETENTION_HOUR', 2),
+        id='metric_retention',
+        replace_existing=True,
+        **kwargs
+    )
+    return retention_days
+
+def add_partition_job(scheduler, app, **kwargs):
+    """Register the daily job creating future metric partitions."""
+    scheduler.add_job(
+        func=lambda: scheduled_partitions(app),
+        trigger="interval",
+        hours=24,
+        id='metric_partitions',
+        replace_existing=True,
+        **kwargs
+    )
+
 def start_scheduler(app):
     """Start the background scheduler for periodic SNMP polling."""
     try:
-        poll_interval = app.config.get('SNMP_POLL_INTERVAL_MINUTES', 5)
+        init_leader_lock(app)
         
         scheduler = BackgroundScheduler()
-        scheduler.add_job(
-            func=lambda: poll_all_with_context(app),
-            trigger="interval",
-            minutes=poll_interval,
-            id='snmp_polling',
-            replace_existing=True
-        )
+        poll_interval = add_poll_job(scheduler, app)
+        add_rollup_job(scheduler, app)
+        add_retention_job(scheduler, app)
+        add_partition_job(scheduler, app, next_run_time=datetime.now())
         scheduler.start()
         
         app.scheduler = scheduler
         logger.info(f"SNMP polling scheduler started with {poll_interval} minute interval")
         
     except Exception as e:
-        logger.error(f"Failed to start scheduler: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"Failed to start scheduler: {e}", exc_info=True)
+
+def run_poller(app):
+    """Run the SNMP poller in the foreground until interrupted.
+    
+    Used by the standalone worker process; the first cycle starts immediately.
+    """
+    init_leader_lock(app)
+    
+    scheduler = BlockingScheduler()
+    poll_interval = add_poll_job(scheduler, app, next_run_time=datetime.now())
+    add_rollup_job(scheduler, app)
+    add_retention_job(scheduler, app)
+    add_partition_job(scheduler, app, next_run_time=datetime.now())
+    logger.info(f"SNMP poller worker started with {poll_interval} minute interval, "
+                f"concurrency {app.config.get('SNMP_POLL_CONCURRENCY')}")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("SNMP poller worker stopped")
+    finally:
+        app.leader_lock.release()
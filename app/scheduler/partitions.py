@@ -0,0 +1,122 @@
+"""Monthly range partitions of the metric table (PostgreSQL).
+
+Migration 1b145658db82 turns ``metric`` into a table partitioned by month
+on ``timestamp``, with one partition per month plus a default partition.
+The scheduler creates partitions ahead of time, and retention drops whole
+partitions once every row in them has expired.
+"""
+import logging
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import db
+from app.models.metric import wib_now
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r'^metric_y(\d{4})m(\d{2})$')
+
+
+def partition_name(month, year):
+    return f'metric_y{year:04d}m{month:02d}'
+
+
+def _next_month(month, year):
+    return (1, year + 1) if month == 12 else (month + 1, year)
+
+
+def is_partitioned():
+    """True if the metric table is a partitioned table."""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('metric')")
+    ).scalar() or False
+
+
+def list_partitions():
+    """Return the monthly partitions as (name, start, end), oldest first."""
+    names = db.session.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass('metric')
+    """)).scalars()
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if not match:
+            continue  # metric_default
+        year, month = int(match.group(1)), int(match.group(2))
+        next_month, next_year = _next_month(month, year)
+        partitions.append((name, datetime(year, month, 1), datetime(next_year, next_month, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(month, year):
+    """Create the partition of a month if it does not exist yet.
+
+    Rows of the month already in the default partition (written while the
+    partition was missing) are moved into the new partition.
+    """
+    next_month, next_year = _next_month(month, year)
+    name = partition_name(month, year)
+    bounds = {'start': datetime(year, month, 1), 'end': datetime(next_year, next_month, 1)}
+    create = (f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF metric "
+              f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')")
+
+    stray = db.session.execute(text(
+        'SELECT EXISTS (SELECT 1 FROM metric_default WHERE timestamp >= :start AND timestamp < :end)'
+    ), bounds).scalar()
+    if not stray:
+        db.session.execute(text(create))
+        return
+
+    db.session.execute(text('ALTER TABLE metric DETACH PARTITION metric_default'))
+    db.session.execute(text(create))
+    db.session.execute(text(
+        'INSERT INTO metric SELECT * FROM metric_default WHERE timestamp >= :start AND timestamp < :end'
+    ), bounds)
+    db.session.execute(text(
+        'DELETE FROM metric_default WHERE timestamp >= :start AND timestamp < :end'
+    ), bounds)
+    db.session.execute(text('ALTER TABLE metric ATTACH PARTITION metric_default DEFAULT'))
+    logger.warning(f"Moved rows of {month:02d}/{year} from metric_default into {name}")
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """Create the partitions of the current month and the next ``months_ahead``.
+
+    Returns the names of the partitions that were created.
+    """
+    if not is_partitioned():
+        return []
+    now = now or wib_now()
+    existing = {name for name, _, _ in list_partitions()}
+    month, year = now.month, now.year
+    created = []
+    for _ in range(months_ahead + 1):
+        name = partition_name(month, year)
+        if name not in existing:
+            try:
+                create_partition(month, year)
+                db.session.commit()
+                created.append(name)
+                logger.info(f"Created metric partition {name}")
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Could not create metric partition {name}: {e}")
+        month, year = _next_month(month, year)
+    return created
+
+
+def drop_partition(name):
+    """Detach and drop a monthly partition with all its rows."""
+    if not PARTITION_NAME.match(name):
+        raise ValueError(f'Not a monthly metric partition: {name}')
+    db.session.execute(text(f'ALTER TABLE metric DETACH PARTITION {name}'))
+    db.session.execute(text(f'DROP TABLE {name}'))
+    db.session.commit()
+    logger.info(f"Dropped metric partition {name}")
@@ -0,0 +1,196 @@
+"""Bulk reclassification of stored metrics after classification rules change.
+
+Metrics are streamed by id in chunks and classified with vectorized
+NumPy/pandas operations: rows are grouped by the rule of their component
+(brand, category, OID), state rules become ``isin`` lookups and threshold
+rules a ``searchsorted`` over the bounds. Changed statuses are written back
+per chunk together with the matching corrections of the hourly/daily
+rollup counts. Archived monthly reports, the only copy of pruned metrics,
+are reclassified in place.
+"""
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, select, update
+
+from app import db
+from app.models.metric import Metric, ComponentVersion, numeric_value
+from app.reports.cache import invalidate_report_artifacts, restamp_archived_artifacts
+from app.scheduler.classification import NO_RESPONSE, StateRule, ThresholdRule, get_classifier
+from app.scheduler.rollup import ROLLUPS, STATUS_COUNTS, get_state
+
+logger = logging.getLogger(__name__)
+
+STATUS_COLUMNS = ('ok_count', 'warning_count', 'critical_count', 'unknown_count')
+
+# Vectorized equivalents of hour_bucket/day_bucket for each rollup model
+BUCKET_FREQUENCIES = {'metric_hourly': 'h', 'metric_daily': 'D'}
+
+COLUMNS = (Metric.id, Metric.component_id, Metric.timestamp, Metric.value, Metric.status,
+           ComponentVersion.brand, ComponentVersion.category, ComponentVersion.oid)
+
+
+def _apply_rule(rule, text, number):
+    """Statuses of arrays of normalized values and parsed numbers under one rule."""
+    if isinstance(rule, StateRule):
+        statuses = np.full(len(text), rule.otherwise, dtype=object)
+        statuses[np.isin(text, list(rule.warning))] = 'Warning'
+        statuses[np.isin(text, list(rule.ok))] = 'OK'
+        return statuses
+    if isinstance(rule, ThresholdRule):
+        choices = np.array(rule.statuses + (rule.invalid,), dtype=object)
+        position = np.searchsorted(np.array(rule.bounds), number * rule.scale, side='right')
+        position[np.isnan(number)] = len(choices) - 1
+        return choices[position]
+    return np.array([rule(t, None if np.isnan(n) else n) for t, n in zip(text, number)], dtype=object)
+
+
+def classify_frame(classifier, frame):
+    """Return the statuses of a frame of metrics under ``classifier``.
+
+    ``frame`` has value, brand, category and oid columns. Gives the same
+    result as Classifier.apply row by row. Numbers are parsed from the value
+    (value_num holds the measurement, scaled by the rule it was polled under).
+    """
+    text = frame['value'].astype(str).str.strip().str.lower().to_numpy(dtype=object)
+    number = pd.Series(text).map(numeric_value).astype(float).to_numpy()
+
+    # One group per distinct rule; components sharing a rule are classified together
+    keys = frame[['brand', 'category', 'oid']]
+    codes = keys.groupby(['brand', 'category', 'oid'], sort=False).ngroup().to_numpy()
+    rules, rule_codes = [], []
+    for brand, category, oid in keys.drop_duplicates().itertuples(index=False):
+        rule = classifier.rule_for(brand, category, oid)
+        if rule not in rules:
+            rules.append(rule)
+        rule_codes.append(rules.index(rule))
+    row_rules = np.array(rule_codes)[codes]
+
+    statuses = np.empty(len(frame), dtype=object)
+    for index, rule in enumerate(rules):
+        rows = row_rules == index
+        if rule is None:
+            statuses[rows] = classifier.default_status
+        else:
+            statuses[rows] = np.where(text[rows] == '', classifier.empty_status,
+                                      _apply_rule(rule, text[rows], number[rows]))
+    return statuses
+
+
+def _archive_statuses(classifier):
+    """Status function of restamp_archived_artifacts; components that did not answer keep theirs."""
+    def statuses(columns):
+        frame = pd.DataFrame(columns)
+        return np.where(frame['value'] == NO_RESPONSE, frame['status'], classify_frame(classifier, frame))
+    return statuses
+
+
+def _adjust_rollups(changed, rolled_up_id):
+    """Move the counts of reclassified, already rolled up metrics to their new status."""
+    changed = changed[changed['id'] <= rolled_up_id]
+    if changed.empty:
+        return
+    deltas = pd.concat([
+        pd.DataFrame({'component_id': changed['component_id'], 'timestamp': changed['timestamp'],
+                      'column': changed['status'].map(STATUS_COUNTS).fillna('unknown_count'), 'delta': -1}),
+        pd.DataFrame({'component_id': changed['component_id'], 'timestamp': changed['timestamp'],
+                      'column': changed['new_status'].map(STATUS_COUNTS).fillna('unknown_count'), 'delta': 1}),
+    ])
+    for model, _ in ROLLUPS:
+        table = model.__table__
+        deltas['bucket'] = pd.to_datetime(deltas['timestamp']).dt.floor(BUCKET_FREQUENCIES[table.name])
+        per_bucket = deltas.pivot_table(index=['component_id', 'bucket'], columns='column', values='delta',
+                                        aggfunc='sum', fill_value=0)
+        per_bucket = per_bucket.reindex(columns=list(STATUS_COLUMNS), fill_value=0)
+        stmt = update(table).where(
+            table.c.component_id == bindparam('b_component_id'),
+            table.c.bucket == bindparam('b_bucket')
+        ).values({column: table.c[column] + bindparam(f'b_{column}') for column in STATUS_COLUMNS})
+        params = [
+            {'b_component_id': int(component_id), 'b_bucket': bucket.to_pydatetime(),
+             **{f'b_{column}': int(value) for column, value in zip(STATUS_COLUMNS, counts)}}
+            for (component_id, bucket), counts in zip(per_bucket.index, per_bucket.to_numpy())
+        ]
+        db.session.execute(stmt, params)
+
+
+def _write_chunk(changed):
+    """Write the new statuses of a chunk and fix the rollups, in one transaction."""
+    table = Metric.__table__
+    try:
+        # Locks the rollup watermark so a concurrent rollup run can not count these rows twice
+        rolled_up_id = get_state().last_metric_id
+        for status, ids in changed.groupby('new_status')['id']:
+            db.session.execute(update(table).where(table.c.id.in_(ids.tolist())).values(status=status))
+        _adjust_rollups(changed, rolled_up_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def reclassify_metrics(start=None, end=None, chunk_size=50000, dry_run=False, rules_path=None, progress=None):
+    """Re-evaluate the status of stored metrics with the current rules.
+
+    Only metrics with timestamps in [start, end) are read (either bound may
+    be None). Metrics of components that did not answer keep their status.
+    ``progress``, if given, is called with the stats after every chunk.
+    Cached reports of the months with changed metrics are invalidated, and
+    archived reports of the range get their statuses rewritten.
+
+    Returns a dict with rows read, rows changed, transitions ('old -> new'
+    counts), first/last changed timestamp, archived report rows changed,
+    duration and rows per second.
+    """
+    classifier = get_classifier(rules_path)
+    began = time.perf_counter()
+    stats = {'rows': 0, 'changed': 0, 'transitions': {}, 'first': None, 'last': None, 'archived': 0,
+             'duration': 0.0, 'rate': 0.0, 'dry_run': dry_run}
+    stmt = select(*COLUMNS).join(ComponentVersion, ComponentVersion.id == Metric.version_id)
+    if start is not None:
+        stmt = stmt.where(Metric.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(Metric.timestamp < end)
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            stmt.where(Metric.id > last_id).order_by(Metric.id).limit(chunk_size)
+        ).all()
+        db.session.commit()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        frame = pd.DataFrame(rows, columns=[column.key for column in COLUMNS])
+        frame = frame[frame['value'] != NO_RESPONSE].copy()
+        frame['new_status'] = classify_frame(classifier, frame) if len(frame) else []
+        changed = frame[frame['new_status'] != frame['status']]
+
+        if not changed.empty:
+            for (old, new), count in changed.groupby(['status', 'new_status']).size().items():
+                key = f'{old} -> {new}'
+                stats['transitions'][key] = stats['transitions'].get(key, 0) + int(count)
+            first, last = changed['timestamp'].min().to_pydatetime(), changed['timestamp'].max().to_pydatetime()
+            stats['first'] = min(stats['first'] or first, first)
+            stats['last'] = max(stats['last'] or last, last)
+            if not dry_run:
+                _write_chunk(changed)
+
+        stats['rows'] += len(rows)
+        stats['changed'] += len(changed)
+        stats['duration'] = time.perf_counter() - began
+        stats['rate'] = stats['rows'] / stats['duration'] if stats['duration'] else 0.0
+        logger.info(f"Reclassification: {stats['rows']} rows read, {stats['changed']} changed, "
+                    f"{stats['rate']:.0f} rows/s")
+        if progress:
+            progress(stats)
+
+    if not dry_run:
+        if stats['changed']:
+            invalidate_report_artifacts(stats['first'], stats['last'])
+        stats['archived'] = restamp_archived_artifacts(_archive_statuses(classifier), start, end, chunk_size)
+    logger.info(f"Reclassification {'(dry run) ' if dry_run else ''}finished: {stats['changed']} of "
+                f"{stats['rows']} metrics changed in {stats['duration']:.2f}s ({stats['rate']:.0f} rows/s)")
+    return stats
@@ -0,0 +1,152 @@
+"""Retention of raw metrics: pruning of rows older than a cutoff.
+
+On a partitioned metric table, months that expired entirely are dropped as
+whole partitions; the remaining rows are deleted in small batches. Rows are
+only pruned from months whose reports are archived in the report cache.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select, text
+
+from app import db
+from app.models.metric import Metric, wib_now
+from app.models.report import ReportArtifact
+from app.models.rollup import RollupState
+from app.reports.cache import get_artifact
+from app.reports.export import LAYOUTS
+from app.reports.query import month_range
+from app.scheduler.partitions import drop_partition, is_partitioned, list_partitions
+from app.scheduler.rollup import STATE_NAME
+
+logger = logging.getLogger(__name__)
+
+
+def _rolled_up_id():
+    """Highest raw metric id already counted in the rollups."""
+    state = db.session.get(RollupState, STATE_NAME)
+    return state.last_metric_id if state else 0
+
+
+def _months_between(first, last):
+    """(month, year) pairs from the month of ``first`` to the month of ``last``."""
+    month, year = first.month, first.year
+    while (year, month) <= (last.year, last.month):
+        yield month, year
+        month, year = (1, year + 1) if month == 12 else (month + 1, year)
+
+
+def keep_report_artifacts(first, last, chunk_size=5000):
+    """Build the cached reports of every month in [first, last] and archive them.
+
+    Pruned months stay downloadable from the report cache.
+    """
+    built = 0
+    for month, year in _months_between(first, last):
+        for layout in LAYOUTS:
+            artifact = get_artifact(month, year, layout, chunk_size)
+            if not artifact.archived:
+                artifact.archived = True
+                db.session.commit()
+            built += 1
+    return built
+
+
+def unarchived_month_start(first, last):
+    """Start of the first month in [first, last] lacking an archived report of every layout, or None."""
+    for month, year in _months_between(first, last):
+        archived = ReportArtifact.query.filter_by(month=month, year=year, archived=True).count()
+        if archived < len(LAYOUTS):
+            return month_range(month, year)[0]
+    return None
+
+
+def expired_partitions(cutoff, max_id):
+    """Monthly partitions that end before ``cutoff`` and are fully rolled up.
+
+    Returns (name, row count) pairs, oldest first.
+    """
+    expired = []
+    for name, _, end in list_partitions():
+        if end > cutoff:
+            break
+        newest_id, rows = db.session.execute(text(f'SELECT max(id), count(*) FROM {name}')).one()
+        if newest_id is not None and newest_id > max_id:
+            break
+        expired.append((name, rows))
+    return expired
+
+
+def prune_metrics(retention_days, batch_size=5000, pause=0.5, max_seconds=300,
+                  keep_reports=True, dry_run=False, chunk_size=5000):
+    """Delete raw metrics older than ``retention_days`` in small batches.
+
+    Only rows already rolled up are deleted, and only from months whose
+    reports are archived; with ``keep_reports`` the archives of the affected
+    months are built first, otherwise months without one are left. Expired monthly
+    partitions are dropped whole. Other rows are deleted in batches, each
+    its own short transaction followed by ``pause`` seconds of sleep, so the
+    poller's inserts are never blocked for long; a run stops after
+    ``max_seconds`` and the next run continues.
+
+    Returns a dict with the cutoff, rows pruned (or prunable on a dry run),
+    partitions dropped, batches and duration in seconds.
+    """
+    start = time.perf_counter()
+    cutoff = wib_now() - timedelta(days=retention_days)
+    max_id = _rolled_up_id()
+    stats = {'cutoff': cutoff, 'rows': 0, 'partitions': 0, 'batches': 0, 'duration': 0.0, 'dry_run': dry_run}
+
+    first, last = db.session.query(func.min(Metric.timestamp), func.max(Metric.timestamp)) \
+        .filter(Metric.timestamp < cutoff, Metric.id <= max_id).one()
+    if first is None:
+        logger.info(f"Metric retention: nothing older than {cutoff:%Y-%m-%d %H:%M} to prune")
+        return stats
+
+    if keep_reports and not dry_run:
+        keep_report_artifacts(first, last, chunk_size)
+    if not (keep_reports and dry_run):  # a dry run would have built the archives
+        unarchived = unarchived_month_start(first, last)
+        if unarchived is not None and unarchived < cutoff:
+            logger.warning(f"Metric retention: no report archive of {unarchived:%m/%Y}, "
+                           f"not pruning from that month on")
+            cutoff = stats['cutoff'] = unarchived
+    candidates = (Metric.timestamp < cutoff, Metric.id <= max_id)
+    partitions = expired_partitions(cutoff, max_id) if is_partitioned() else []
+
+    if dry_run:
+        stats['rows'] = db.session.query(func.count(Metric.id)).filter(*candidates).scalar()
+        stats['partitions'] = len(partitions)
+        stats['duration'] = time.perf_counter() - start
+        logger.info(f"Metric retention (dry run): {stats['rows']} rows from {first:%Y-%m-%d} "
+                    f"to {last:%Y-%m-%d} would be pruned, {len(partitions)} partitions dropped "
+                    f"(cutoff {cutoff:%Y-%m-%d %H:%M})")
+        return stats
+
+    for name, rows in partitions:
+        drop_partition(name)
+        stats['rows'] += rows
+        stats['partitions'] += 1
+
+    table = Metric.__table__
+    while time.perf_counter() - start < max_seconds:
+        ids = select(table.c.id).where(
+            table.c.timestamp < cutoff, table.c.id <= max_id
+        ).order_by(table.c.id).limit(batch_size).scalar_subquery()
+        try:
+            deleted = db.session.execute(delete(table).where(table.c.id.in_(ids))).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        stats['rows'] += deleted
+        stats['batches'] += 1
+        if deleted < batch_size:
+            break
+        time.sleep(pause)
+
+    stats['duration'] = time.perf_counter() - start
+    logger.info(f"Metric retention: {stats['rows']} rows pruned, {stats['partitions']} partitions dropped, "
+                f"{stats['batches']} batches, {stats['duration']:.2f}s (cutoff {cutoff:%Y-%m-%d %H:%M})")
+    return stats
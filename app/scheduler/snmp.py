@@ -0,0 +1,385 @@
+"""Asynchronous SNMP client used by the poller."""
+import asyncio
+import atexit
+import logging
+
+from pysnmp.hlapi.asyncio import (
+    getCmd, bulkCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData,
+    ObjectType, ObjectIdentity, UsmUserData,
+    usmHMACMD5AuthProtocol, usmHMACSHAAuthProtocol,
+    usmHMAC128SHA224AuthProtocol, usmHMAC192SHA256AuthProtocol,
+    usmDESPrivProtocol, usmAesCfb128Protocol
+)
+from pysnmp.proto.rfc1905 import NoSuchObject, NoSuchInstance, EndOfMibView
+
+logger = logging.getLogger(__name__)
+
+AUTH_PROTOCOLS = {
+    'MD5': usmHMACMD5AuthProtocol,
+    'SHA': usmHMACSHAAuthProtocol,
+    'SHA-224': usmHMAC128SHA224AuthProtocol,
+    'SHA-256': usmHMAC192SHA256AuthProtocol
+}
+
+# Event loop reused by every poll cycle of this process
+_loop = None
+
+# Long-lived SNMP engines, keyed by _engine_key(). pysnmp registers USM users
+# by user name inside an engine, so each distinct v3 credential set gets its
+# own engine while every v2c server shares one.
+_engines = {}
+
+# Per-server (settings key, auth data, transport target, engine key), so the
+# credential objects and v3 key localization are only built once per server
+_sessions = {}
+
+
+def build_auth_data(server):
+    """Build pysnmp credentials for a server, or None if they are incomplete."""
+    if server.snmp_version == 'v2c':
+        if not server.community:
+            logger.error(f"SNMP v2c requires community string for server {server.name}")
+            return None
+        return CommunityData(server.community, mpModel=1)
+
+    if not server.snmp_auth_user or not server.snmp_auth_pass:
+        logger.error(f"SNMP v3 requires auth credentials for server {server.name}")
+        return None
+
+    auth_proto = AUTH_PROTOCOLS.get(server.snmp_auth_proto, usmHMACMD5AuthProtocol)
+    priv_proto = usmDESPrivProtocol if server.snmp_priv_proto == 'DES' else usmAesCfb128Protocol
+    return UsmUserData(
+        server.snmp_auth_user,
+        server.snmp_auth_pass,
+        server.snmp_priv_pass,
+        authProtocol=auth_proto,
+        privProtocol=priv_proto
+    )
+
+
+def _engine_key(server):
+    if server.snmp_version == 'v2c':
+        return ('v2c',)
+    return ('v3', server.snmp_auth_user, server.snmp_auth_pass, server.snmp_priv_pass,
+            server.snmp_auth_proto, server.snmp_priv_proto)
+
+
+def _settings_key(server, timeout, retries):
+    return (server.ip, server.snmp_version, server.community, _engine_key(server), timeout, retries)
+
+
+def get_session(server, timeout=2, retries=0):
+    """Return cached (engine, auth data, transport target) for a server.
+
+    The entry is rebuilt whenever the server's SNMP settings differ from the
+    ones it was built with. Returns None if the credentials are incomplete.
+    """
+    key = _settings_key(server, timeout, retries)
+    cached = _sessions.get(server.id)
+    if cached is None or cached[0] != key:
+        auth_data = build_auth_data(server)
+        if auth_data is None:
+            _sessions.pop(server.id, None)
+            return None
+        target = UdpTransportTarget((server.ip, 161), timeout=timeout, retries=retries)
+        cached = (key, auth_data, target, _engine_key(server))
+        _sessions[server.id] = cached
+
+    _, auth_data, target, engine_key = cached
+    engine = _engines.get(engine_key)
+    if engine is None:
+        engine = _engines[engine_key] = SnmpEngine()
+    return engine, auth_data, target
+
+
+def invalidate_server(server_id):
+    """Drop the cached SNMP session of a server after its settings change."""
+    _sessions.pop(server_id, None)
+
+
+def _prune_engines():
+    """Close engines no longer referenced by any cached session."""
+    in_use = {session[3] for session in _sessions.values()}
+    for engine_key in list(_engines):
+        if engine_key not in in_use:
+            engine = _engines.pop(engine_key)
+            if engine.transportDispatcher is not None:
+                engine.transportDispatcher.closeDispatcher()
+
+
+async def snmp_get(server, components, timeout=2, retries=0):
+    """GET the OIDs of several components of one server in a single PDU.
+
+    Returns a dict mapping component id to the polled value. Components whose
+    OID the agent does not expose (noSuchObject/noSuchInstance) map to None
+    without affecting the rest of the request.
+    """
+    results = {component.id: None for component in components}
+    oids = ', '.join(component.oid for component in components)
+    logger.debug(f"SNMP GET: server={server.name} ip={server.ip} oids={oids} v={server.snmp_version}")
+    try:
+        session = get_session(server, timeout=timeout, retries=retries)
+        if session is None:
+            return results
+        engine, auth_data, target = session
+
+        errorIndication, errorStatus, errorIndex, varBinds = await getCmd(
+            engine,
+            auth_data,
+            target,
+            ContextData(),
+            *[ObjectType(ObjectIdentity(component.oid)) for component in components]
+        )
+
+        if errorIndication:
+            logger.warning(f"SNMP Error Indication for {server.name}: {errorIndication}")
+            return results
+        if errorStatus:
+            if len(components) > 1:
+                # tooBig/genErr reject the whole PDU; retry each OID on its own
+                # so only the offending component is lost
+                logger.info(f"SNMP Error Status for {server.name}: {errorStatus.prettyPrint()}, retrying {len(components)} OIDs individually")
+                for component in components:
+                    results.update(await snmp_get(server, [component], timeout, retries))
+                return results
+            logger.warning(f"SNMP Error Status for {server.name}/{components[0].name}: {errorStatus.prettyPrint()} at {errorIndex}")
+            return results
+
+        # Response varbinds come back in request order
+        for component, varBind in zip(components, varBinds):
+            if isinstance(varBind[1], (NoSuchObject, NoSuchInstance, EndOfMibView)):
+                logger.warning(f"SNMP OID {component.oid} not available on {server.name}/{component.name}")
+                continue
+            value = str(varBind[1])
+            logger.debug(f"SNMP Result for {server.name}/{component.name}: {value}")
+            results[component.id] = value
+
+    except Exception as e:
+        logger.error(f"SNMP Exception for {server.name}: {e}", exc_info=True)
+
+    return results
+
+
+def _oid_tuple(oid):
+    return tuple(int(arc) for arc in str(oid).strip('.').split('.'))
+
+
+async def snmp_walk(server, columns, max_repetitions=25, timeout=2, retries=0, session=None):
+    """Walk table columns of one server with GETBULK requests.
+
+    All columns still being walked are requested together, each response
+    carrying up to ``max_repetitions`` rows. ``session`` is an (engine, auth
+    data, transport target) tuple, by default the cached one of the server.
+    Returns a dict mapping each column OID to {instance OID: value}, or to
+    None if the walk failed.
+    """
+    results = {column: {} for column in columns}
+    prefixes = {column: _oid_tuple(column) for column in columns}
+    cursors = {column: prefixes[column] for column in columns}  # last OID seen per column
+    logger.debug(f"SNMP BULK: server={server.name} ip={server.ip} columns={', '.join(columns)}")
+    try:
+        session = session or get_session(server, timeout=timeout, retries=retries)
+        if session is None:
+            return {column: None for column in columns}
+        engine, auth_data, target = session
+
+        while cursors:
+            pending = list(cursors)
+            errorIndication, errorStatus, errorIndex, varBindTable = await bulkCmd(
+                engine,
+                auth_data,
+                target,
+                ContextData(),
+                0, max_repetitions,
+                *[ObjectType(ObjectIdentity(cursors[column])) for column in pending],
+                lookupMib=False
+            )
+
+            if errorIndication:
+                logger.warning(f"SNMP Error Indication for {server.name}: {errorIndication}")
+                return {column: None if column in cursors else results[column] for column in columns}
+            if errorStatus:
+                if errorStatus.prettyPrint() == 'tooBig' and max_repetitions > 1:
+                    max_repetitions //= 2
+                    continue
+                logger.warning(f"SNMP Error Status for {server.name}: {errorStatus.prettyPrint()} at {errorIndex}")
+                return {column: None if column in cursors else results[column] for column in columns}
+            if not varBindTable:
+                break
+
+            # Rows of the response hold the next OID of every requested column
+            for row in varBindTable:
+                for column, (oid, value) in zip(pending, row):
+                    if column not in cursors:
+                        continue
+                    oid = _oid_tuple(oid)
+                    prefix = prefixes[column]
+                    if (isinstance(value, EndOfMibView) or oid[:len(prefix)] != prefix
+                            or oid <= cursors[column]):
+                        del cursors[column]
+                        continue
+                    results[column]['.'.join(map(str, oid))] = str(value)
+                    cursors[column] = oid
+
+    except Exception as e:
+        logger.error(f"SNMP Exception for {server.name}: {e}", exc_info=True)
+        return {column: None if column in cursors else results[column] for column in columns}
+
+    return results
+
+
+def _table_column(oid, table_columns):
+    """The known table column an instance OID belongs to, or None."""
+    for column in table_columns:
+        if oid.startswith(column + '.'):
+            return column
+    return None
+
+
+def _batches(targets, max_varbinds, table_columns=()):
+    """Group targets per server into GET batches and table walks.
+
+    Components of a server whose OIDs are rows of the same known table
+    column are read with one walk of that column when there are at least two
+    of them; the rest are split into PDU-sized GET chunks. Yields
+    ('get', server, components) and ('walk', server, {column: components}).
+    """
+    by_server = {}
+    for server, component in targets:
+        by_server.setdefault(server.id, (server, []))[1].append(component)
+
+    for server, components in by_server.values():
+        by_column = {}
+        for component in components:
+            column = _table_column(component.oid, table_columns)
+            if column is not None:
+                by_column.setdefault(column, []).append(component)
+        walks = {column: rows for column, rows in by_column.items() if len(rows) > 1}
+        walked = {component.id for rows in walks.values() for component in rows}
+        scalars = [component for component in components if component.id not in walked]
+
+        for i in range(0, len(scalars), max_varbinds):
+            yield 'get', server, scalars[i:i + max_varbinds]
+        columns = list(walks)
+        for i in range(0, len(columns), max_varbinds):
+            yield 'walk', server, {column: walks[column] for column in columns[i:i + max_varbinds]}
+
+
+async def _walk_components(server, walks, max_repetitions, timeout, retries):
+    """Walk table columns and map the rows back to the polled components."""
+    tables = await snmp_walk(server, list(walks), max_repetitions, timeout=timeout, retries=retries)
+    results = {}
+    for column, components in walks.items():
+        rows = tables.get(column) or {}
+        for component in components:
+            results[component.id] = rows.get(component.oid)
+            if tables.get(column) is not None and component.oid not in rows:
+                logger.warning(f"SNMP OID {component.oid} not available on {server.name}/{component.name}")
+    return results
+
+
+async def _poll_targets(targets, concurrency, deadline, timeout, retries, max_varbinds,
+                        table_columns=(), max_repetitions=25):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_request(kind, server, components):
+        async with semaphore:
+            if kind == 'walk':
+                return await _walk_components(server, components, max_repetitions, timeout, retries)
+            return await snmp_get(server, components, timeout=timeout, retries=retries)
+
+    tasks = [
+        asyncio.ensure_future(bounded_request(kind, server, components))
+        for kind, server, components in _batches(targets, max_varbinds, table_columns)
+    ]
+    results = {}
+    if not tasks:
+        return results
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.warning(f"SNMP poll deadline of {deadline}s reached, {len(pending)} requests cancelled")
+    for task in done:
+        results.update(task.result())
+    return results
+
+
+def _get_loop():
+    global _loop
+    if _loop is None or _loop.is_closed():
+        # Engines are bound to the loop their dispatcher was created on
+        _loop = asyncio.new_event_loop()
+        _engines.clear()
+        _sessions.clear()
+    return _loop
+
+
+def poll_targets(targets, concurrency=50, deadline=240, timeout=2, retries=0, max_varbinds=20,
+                 table_columns=(), max_repetitions=25):
+    """Poll (server, component) pairs concurrently.
+
+    The OIDs of each server are sent together in GET requests of at most
+    ``max_varbinds`` variable bindings, except rows of the ``table_columns``
+    which are read by walking the column with GETBULK (``max_repetitions``
+    rows per response). At most ``concurrency`` requests are in flight at
+    once and the whole batch is abandoned after ``deadline`` seconds.
+    Returns a dict mapping component id to the polled value; components
+    that failed or did not answer before the deadline map to None.
+    """
+    loop = _get_loop()
+
+    # Forget servers that were deleted since the last cycle
+    polled = {server.id for server, _ in targets}
+    for server_id in list(_sessions):
+        if server_id not in polled:
+            invalidate_server(server_id)
+
+    results = loop.run_until_complete(
+        _poll_targets(targets, max(1, concurrency), deadline, timeout, retries, max(1, max_varbinds),
+                      table_columns, max(1, max_repetitions))
+    )
+    _prune_engines()
+    return {component.id: results.get(component.id) for _, component in targets}
+
+
+def walk_columns(server, columns, max_repetitions=25, timeout=2, retries=0):
+    """Walk table columns of one server (see snmp_walk), blocking until done.
+
+    Runs on its own event loop and engine instead of the poller's, so it can
+    be called from a web request while the poller runs in the same process.
+    """
+    auth_data = build_auth_data(server)
+    if auth_data is None:
+        return {column: None for column in columns}
+
+    async def walk():
+        engine = SnmpEngine()
+        try:
+            target = UdpTransportTarget((server.ip, 161), timeout=timeout, retries=retries)
+            return await snmp_walk(server, list(columns), max(1, max_repetitions),
+                                   session=(engine, auth_data, target))
+        finally:
+            if engine.transportDispatcher is not None:
+                engine.transportDispatcher.closeDispatcher()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(walk())
+    finally:
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+
+
+@atexit.register
+def shutdown():
+    """Close all SNMP engines and the poll event loop of this process."""
+    global _loop
+    _sessions.clear()
+    _prune_engines()
+    if _loop is not None and not _loop.is_closed():
+        # Let the dispatchers' cancelled timer tasks finish before closing
+        _loop.run_until_complete(asyncio.sleep(0))
+        _loop.close()
+    _loop = None
@@ -0,0 +1,177 @@
+"""Bulk writes of poll results."""
+import io
+import logging
+import time
+
+from sqlalchemy import case, func, insert, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.events import notify_changes
+from app.models.metric import Metric, LatestMetric, ComponentVersion, wib_now
+
+logger = logging.getLogger(__name__)
+
+
+def _copy_value(value):
+    """Format a value for PostgreSQL COPY text format."""
+    if value is None:
+        return '\\N'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat(sep=' ')
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _copy_rows(table, rows):
+    """Insert rows with COPY FROM STDIN on the session's connection."""
+    columns = list(rows[0].keys())
+    # COPY bypasses SQLAlchemy, so apply custom column types (metric.status) here
+    dialect = db.engine.dialect
+    convert = {
+        c: table.c[c].type.process_bind_param for c in columns
+        if isinstance(table.c[c].type, db.TypeDecorator)
+    }
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(
+            _copy_value(convert[c](row[c], dialect) if c in convert else row[c]) for c in columns
+        ))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY {table.name} ({", ".join(columns)}) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_rows(table, rows):
+    """Insert rows with a single executemany INSERT."""
+    db.session.execute(insert(table), rows)
+
+
+def bulk_insert(table, rows, chunk_size=1000, method='auto'):
+    """Insert row dicts into a table in chunks, committing after each chunk.
+
+    ``method`` is 'copy' (PostgreSQL COPY), 'insert' (executemany) or 'auto'
+    to use COPY when the database supports it. A chunk that fails is rolled
+    back and retried row by row, so a bad row only loses itself.
+
+    Returns a dict with rows written, rows failed and duration in seconds.
+    """
+    start = time.perf_counter()
+    written = failed = 0
+    if method == 'auto':
+        method = 'copy' if db.engine.dialect.name == 'postgresql' else 'insert'
+    write = _copy_rows if method == 'copy' else _insert_rows
+
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        try:
+            write(table, chunk)
+            db.session.commit()
+            written += len(chunk)
+            continue
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Bulk write of {len(chunk)} rows into {table.name} failed, retrying row by row: {e}")
+
+        for row in chunk:
+            try:
+                _insert_rows(table, [row])
+                db.session.commit()
+                written += 1
+            except Exception as e:
+                db.session.rollback()
+                failed += 1
+                logger.error(f"Dropped {table.name} row {row}: {e}")
+
+    return {'written': written, 'failed': failed, 'duration': time.perf_counter() - start}
+
+
+def component_versions(targets):
+    """Return {component id: id of its current ComponentVersion} for (server, component) pairs.
+
+    A new version is added for components seen for the first time or whose
+    names/attributes changed since their latest version.
+    """
+    component_ids = [component.id for _, component in targets]
+    latest_ids = db.session.query(func.max(ComponentVersion.id)) \
+        .filter(ComponentVersion.component_id.in_(component_ids)) \
+        .group_by(ComponentVersion.component_id)
+    latest = {
+        version.component_id: version
+        for version in ComponentVersion.query.filter(ComponentVersion.id.in_(latest_ids))
+    }
+
+    added = []
+    now = wib_now()
+    for server, component in targets:
+        snapshot = ComponentVersion.snapshot(server, component)
+        version = latest.get(component.id)
+        if version is None or not version.matches(snapshot):
+            version = ComponentVersion(component_id=component.id, server_id=server.id,
+                                       valid_from=now, **snapshot)
+            latest[component.id] = version
+            added.append(version)
+    if added:
+        db.session.add_all(added)
+        db.session.flush()  # assigns ids; committed with the poll's read transaction
+        logger.info(f"Recorded {len(added)} new component versions")
+    return {component_id: version.id for component_id, version in latest.items()}
+
+
+def write_metrics(rows, chunk_size=1000, method='auto'):
+    """Bulk insert poll results into the metric table and log the outcome."""
+    stats = bulk_insert(Metric.__table__, rows, chunk_size=chunk_size, method=method)
+    logger.info(f"Metrics written: {stats['written']} rows, {stats['failed']} failed, "
+                f"write latency: {stats['duration']:.3f}s")
+    return stats
+
+
+def upsert_latest_metrics(rows, chunk_size=1000):
+    """Upsert the newest poll result of each component into latest_metric.
+
+    Uses INSERT ... ON CONFLICT (component_id) DO UPDATE per chunk. Rows whose
+    value or status changed (and new rows) get the next poll generation, which
+    the dashboard uses for delta responses. All chunks are committed together
+    so readers never see half a cycle; a failed chunk is rolled back to its
+    savepoint and skipped. The commit notifies the dashboard event listeners.
+
+    Returns the generation.
+    """
+    table = LatestMetric.__table__
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    columns = [c.name for c in table.columns if c.name != 'generation']
+    start = time.perf_counter()
+
+    try:
+        generation = db.session.query(func.coalesce(func.max(LatestMetric.generation), 0)).scalar() + 1
+        latest = [{**{c: row[c] for c in columns}, 'generation': generation} for row in rows]
+        for i in range(0, len(latest), chunk_size):
+            stmt = dialect.insert(table).values(latest[i:i + chunk_size])
+            # NULL-safe: a change between NULL and a value counts too
+            changed = or_(table.c.value.is_distinct_from(stmt.excluded.value),
+                          table.c.status.is_distinct_from(stmt.excluded.status))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.component_id],
+                set_={**{c: stmt.excluded[c] for c in columns if c != 'component_id'},
+                      'generation': case((changed, stmt.excluded.generation), else_=table.c.generation)}
+            )
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(stmt)
+            except Exception as e:
+                logger.error(f"Error upserting latest metrics: {e}", exc_info=True)
+        notify_changes(generation)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error upserting latest metrics: {e}", exc_info=True)
+        return None
+
+    logger.debug(f"Latest metrics upserted: {len(latest)} rows in {time.perf_counter() - start:.3f}s "
+                 f"(generation {generation})")
+    return generation
@@ -15,6 +15,9 @@ document.addEventListener("DOMContentLoaded", function () {
 
   // Clear filters button
   initClearFilters();
+
+  // Report downloads built by background jobs
+  initReportJobs();
 });
 
 /**
@@ -149,6 +152,85 @@ function initClearFilters() {
   }
 }
 
+/**
+ * Submit report forms as background jobs and download the file when ready.
+ * Forms opt in with data-report-job="<enqueue url>"; without JavaScript they
+ * post to their action, which serves a ready report or queues the same job.
+ */
+function initReportJobs() {
+  const forms = document.querySelectorAll("form[data-report-job]");
+  forms.forEach(function (form) {
+    form.addEventListener("submit", function (e) {
+      e.preventDefault();
+      const button = form.querySelector('button[type="submit"]');
+      const statusBox = form.querySelector(".report-job-status");
+
+      function showStatus(message, category) {
+        if (!statusBox) return;
+        statusBox.className = "report-job-status flash flash-" + category;
+        statusBox.textContent = message;
+        statusBox.style.display = "block";
+      }
+
+      function finish() {
+        if (button) button.disabled = false;
+      }
+
+      function poll(statusUrl) {
+        fetch(statusUrl, { credentials: "same-origin" })
+          .then(function (response) {
+            return response.json();
+          })
+          .then(function (job) {
+            if (!job.success || job.status === "failed") {
+              showStatus(job.error || "Report generation failed.", "danger");
+              finish();
+            } else if (job.status === "done") {
+              showStatus("Report ready (" + formatNumber(job.rows_written) + " rows).", "success");
+              finish();
+              window.location.href = job.download_url;
+            } else {
+              const progress = job.progress === null ? "" : " " + job.progress + "%";
+              showStatus("Generating report..." + progress, "info");
+              setTimeout(function () {
+                poll(statusUrl);
+              }, 1500);
+            }
+          })
+          .catch(function (err) {
+            console.error("Report job status error:", err);
+            showStatus("Lost connection while generating the report.", "danger");
+            finish();
+          });
+      }
+
+      if (button) button.disabled = true;
+      showStatus("Queueing report...", "info");
+      fetch(form.dataset.reportJob, {
+        method: "POST",
+        body: new FormData(form),
+        credentials: "same-origin",
+      })
+        .then(function (response) {
+          return response.json();
+        })
+        .then(function (job) {
+          if (!job.success) {
+            showStatus(job.error, "warning");
+            finish();
+            return;
+          }
+          poll(job.status_url);
+        })
+        .catch(function (err) {
+          console.error("Report job error:", err);
+          showStatus("An error occurred while queueing the report.", "danger");
+          finish();
+        });
+    });
+  });
+}
+
 /**
  * Format number with thousand separator
  */
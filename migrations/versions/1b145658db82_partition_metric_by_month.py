@@ -0,0 +1,107 @@
+"""partition metric by month
+
+Revision ID: 1b145658db82
+Revises: f96f23619291
+Create Date: 2026-10-17 06:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b145658db82'
+down_revision = 'f96f23619291'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ('id, server_id, component_id, oid, value, status, timestamp, '
+           'brand, component_name, server_name, server_ip, category')
+
+# Same definitions as migration e8e613fa6d60 (metric indexes)
+INDEXES = [
+    ('ix_metric_component_id_timestamp', '(component_id, timestamp DESC)'),
+    ('ix_metric_server_id_timestamp', '(server_id, timestamp DESC)'),
+    ('ix_metric_timestamp', '(timestamp)'),
+    ('ix_metric_status_timestamp', '(status, timestamp)'),
+]
+
+# Monthly partitions are named like app.scheduler.partitions.partition_name
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    month_start timestamp := date_trunc('month', coalesce((SELECT min(timestamp) FROM metric_old), now()));
+    last_month timestamp := date_trunc('month', now() + interval '3 months');
+BEGIN
+    WHILE month_start <= last_month LOOP
+        EXECUTE 'CREATE TABLE IF NOT EXISTS '
+            || quote_ident('metric_y' || to_char(month_start, 'YYYY') || 'm' || to_char(month_start, 'MM'))
+            || ' PARTITION OF metric FOR VALUES FROM (' || quote_literal(month_start)
+            || ') TO (' || quote_literal(month_start + interval '1 month') || ')';
+        month_start := month_start + interval '1 month';
+    END LOOP;
+END $$
+"""
+
+
+def _create_metric_table(partitioned):
+    op.execute(f"""
+        CREATE TABLE metric (
+            id integer NOT NULL DEFAULT nextval('metric_id_seq'),
+            server_id integer NOT NULL REFERENCES server (id),
+            component_id integer NOT NULL REFERENCES component (id),
+            oid varchar(128) NOT NULL,
+            value varchar(128) NOT NULL,
+            status varchar(16) NOT NULL,
+            timestamp timestamp {'NOT NULL' if partitioned else ''},
+            brand varchar(64) NOT NULL,
+            component_name varchar(128) NOT NULL,
+            server_name varchar(128) NOT NULL,
+            server_ip varchar(64) NOT NULL,
+            category varchar(32) NOT NULL,
+            PRIMARY KEY ({'id, timestamp' if partitioned else 'id'})
+        ) {'PARTITION BY RANGE (timestamp)' if partitioned else ''}
+    """)
+
+
+def _swap_metric_table(partitioned):
+    """Rebuild metric (partitioned or plain) and move every row into it."""
+    op.execute('ALTER TABLE metric RENAME TO metric_old')
+    op.execute('ALTER TABLE metric_old RENAME CONSTRAINT metric_pkey TO metric_old_pkey')
+    _create_metric_table(partitioned)
+
+    if partitioned:
+        op.execute(CREATE_PARTITIONS)
+        # Catches rows outside the monthly partitions so inserts never fail
+        op.execute('CREATE TABLE metric_default PARTITION OF metric DEFAULT')
+
+    for name, _ in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+    # Rows without a timestamp were never shown in reports or on the
+    # dashboard and have no month partition to go to; they are not carried over
+    op.execute(f"""
+        INSERT INTO metric ({COLUMNS})
+        SELECT {COLUMNS} FROM metric_old
+        {'WHERE timestamp IS NOT NULL' if partitioned else ''}
+    """)
+    op.execute('ALTER SEQUENCE metric_id_seq OWNED BY metric.id')
+    op.execute('DROP TABLE metric_old')
+
+    for name, columns in INDEXES:
+        op.execute(f'CREATE INDEX {name} ON metric {columns}')
+    op.execute('ANALYZE metric')
+
+
+def upgrade():
+    # Declarative partitioning is PostgreSQL only; other databases keep one table
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    _swap_metric_table(partitioned=True)
+
+
+def downgrade():
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    _swap_metric_table(partitioned=False)
@@ -0,0 +1,52 @@
+"""latest metric table
+
+Revision ID: 1fc612179cbd
+Revises: 7f54ec0aef8f
+Create Date: 2026-10-17 06:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1fc612179cbd'
+down_revision = '7f54ec0aef8f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('latest_metric',
+    sa.Column('component_id', sa.Integer(), nullable=False),
+    sa.Column('server_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.String(length=128), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['component_id'], ['component.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['server_id'], ['server.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('component_id')
+    )
+
+    # Seed with the newest existing metric of every component (the highest
+    # id among its rows with the newest timestamp), portable across databases
+    op.execute("""
+        INSERT INTO latest_metric (component_id, server_id, value, status, timestamp)
+        SELECT metric.component_id, metric.server_id, metric.value, metric.status, metric.timestamp
+        FROM metric
+        JOIN (
+            SELECT metric.component_id, max(metric.id) AS id
+            FROM metric
+            JOIN (
+                SELECT component_id, max(timestamp) AS timestamp
+                FROM metric
+                WHERE timestamp IS NOT NULL
+                GROUP BY component_id
+            ) newest ON newest.component_id = metric.component_id AND newest.timestamp = metric.timestamp
+            GROUP BY metric.component_id
+        ) latest ON latest.id = metric.id
+    """)
+
+
+def downgrade():
+    op.drop_table('latest_metric')
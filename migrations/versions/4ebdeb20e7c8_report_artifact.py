@@ -0,0 +1,36 @@
+"""report artifact cache table
+
+Revision ID: 4ebdeb20e7c8
+Revises: 54b0f66daddf
+Create Date: 2026-10-17 06:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4ebdeb20e7c8'
+down_revision = '54b0f66daddf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_artifact',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('layout', sa.String(length=16), nullable=False),
+    sa.Column('rows_path', sa.String(length=255), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('last_metric_id', sa.Integer(), nullable=False),
+    sa.Column('closed', sa.Boolean(), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('month', 'year', 'layout', name='uq_report_artifact_month_year_layout')
+    )
+
+
+def downgrade():
+    op.drop_table('report_artifact')
@@ -0,0 +1,48 @@
+"""report job table
+
+Revision ID: 54b0f66daddf
+Revises: e8e613fa6d60
+Create Date: 2026-10-17 06:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '54b0f66daddf'
+down_revision = 'e8e613fa6d60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('layout', sa.String(length=16), nullable=False),
+    sa.Column('export_format', sa.String(length=8), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('rows_total', sa.Integer(), nullable=True),
+    sa.Column('rows_written', sa.Integer(), nullable=False),
+    sa.Column('file_path', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('requested_by', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_report_job_created_at', 'report_job', ['created_at'], unique=False)
+    op.create_index(
+        'uq_report_job_active', 'report_job', ['month', 'year', 'layout', 'export_format'], unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+        sqlite_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade():
+    op.drop_index('uq_report_job_active', table_name='report_job')
+    op.drop_index('ix_report_job_created_at', table_name='report_job')
+    op.drop_table('report_job')
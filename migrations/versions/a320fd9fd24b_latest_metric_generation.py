@@ -0,0 +1,27 @@
+"""latest metric change generation
+
+Revision ID: a320fd9fd24b
+Revises: b527e8612fda
+Create Date: 2026-10-17 07:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a320fd9fd24b'
+down_revision = 'b527e8612fda'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('latest_metric', sa.Column('generation', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('ix_latest_metric_generation', 'latest_metric', ['generation'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_latest_metric_generation', table_name='latest_metric')
+    with op.batch_alter_table('latest_metric') as batch_op:
+        batch_op.drop_column('generation')
@@ -0,0 +1,168 @@
+"""compact metric rows with a component_version dimension
+
+Revision ID: a872688efcdc
+Revises: 1b145658db82
+Create Date: 2026-10-17 07:00:00.000000
+
+Moves the server/component names copied into every metric row into
+component_version (one row per distinct set of names of a component) and
+stores metric.status as a SMALLINT code. Existing rows are backfilled by id
+range, ``BATCH_SIZE`` rows per committed UPDATE, so the poller is only held up
+briefly; the revision is therefore not atomic, take a backup first. Rows the
+poller writes meanwhile (and versions of components added meanwhile) are
+picked up by further passes, and the last pass runs with writes to metric
+blocked until the old columns are gone. On PostgreSQL run VACUUM (FULL)
+metric afterwards to give the space of the old columns back.
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a872688efcdc'
+down_revision = '1b145658db82'
+branch_labels = None
+depends_on = None
+
+
+NAME_COLUMNS = [
+    ('server_name', sa.String(length=128)),
+    ('server_ip', sa.String(length=64)),
+    ('brand', sa.String(length=64)),
+    ('component_name', sa.String(length=128)),
+    ('category', sa.String(length=32)),
+    ('oid', sa.String(length=128)),
+]
+
+# Same codes as app.models.metric.STATUS_CODES
+STATUS_TO_CODE = ("CASE metric.status WHEN 'OK' THEN 0 WHEN 'Warning' THEN 1 "
+                  "WHEN 'Critical' THEN 2 ELSE 3 END")
+CODE_TO_STATUS = ("CASE metric.status WHEN 0 THEN 'OK' WHEN 1 THEN 'Warning' "
+                  "WHEN 2 THEN 'Critical' ELSE 'Unknown' END")
+
+# Metric ids per UPDATE (and commit) of the backfills
+BATCH_SIZE = 100000
+
+NAMES = ', '.join(name for name, _ in NAME_COLUMNS)
+
+VERSION_MATCH = ' AND '.join(
+    [f'component_version.{name} = metric.{name}' for name, _ in NAME_COLUMNS]
+    + ['component_version.component_id = metric.component_id',
+       'component_version.server_id = metric.server_id']
+)
+
+# Versions of the names of metrics without one yet, oldest first
+INSERT_VERSIONS = f"""
+    INSERT INTO component_version (component_id, server_id, {NAMES}, valid_from)
+    SELECT component_id, server_id, {NAMES}, coalesce(min(timestamp), CURRENT_TIMESTAMP)
+    FROM metric
+    WHERE version_id IS NULL AND NOT EXISTS (SELECT 1 FROM component_version WHERE {VERSION_MATCH})
+    GROUP BY component_id, server_id, {NAMES}
+    ORDER BY min(timestamp)
+"""
+
+UPDATE_VERSIONS = f"""
+    UPDATE metric
+    SET version_id = component_version.id, status_code = {STATUS_TO_CODE}
+    FROM component_version
+    WHERE metric.version_id IS NULL AND {VERSION_MATCH} AND {{ids}}
+"""
+
+
+def _backfill(statement):
+    """Run an UPDATE of metric rows per id range, committing each range.
+
+    ``statement`` has an ``{ids}`` placeholder for the id range condition.
+    In offline (--sql) mode the ids are unknown and one UPDATE is emitted.
+    """
+    if context.is_offline_mode():
+        op.execute(statement.format(ids='1 = 1'))
+        return
+    low, high = op.get_bind().execute(sa.text('SELECT min(id), max(id) FROM metric')).first()
+    if low is None:
+        return
+    with op.get_context().autocommit_block():
+        for start in range(low, high + 1, BATCH_SIZE):
+            op.execute(sa.text(statement.format(ids='metric.id >= :low AND metric.id < :high'))
+                       .bindparams(low=start, high=start + BATCH_SIZE))
+
+
+def upgrade():
+    op.create_table('component_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('component_id', sa.Integer(), nullable=False),
+    sa.Column('server_id', sa.Integer(), nullable=False),
+    *[sa.Column(name, type_, nullable=False) for name, type_ in NAME_COLUMNS],
+    sa.Column('valid_from', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['component_id'], ['component.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['server_id'], ['server.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_component_version_component_id', 'component_version',
+                    ['component_id', sa.text('id DESC')], unique=False)
+
+    op.add_column('metric', sa.Column('version_id', sa.Integer(), nullable=True))
+    op.add_column('metric', sa.Column('status_code', sa.SmallInteger(), nullable=True))
+    if not context.is_offline_mode():
+        # A running poller keeps adding rows (with the old columns); repeat
+        # until few enough are left for the last pass, or no progress is made
+        previous = None
+        while True:
+            op.execute(INSERT_VERSIONS)
+            _backfill(UPDATE_VERSIONS)
+            remaining = op.get_bind().execute(
+                sa.text('SELECT count(*) FROM metric WHERE version_id IS NULL')
+            ).scalar()
+            if remaining < BATCH_SIZE or (previous is not None and remaining >= previous):
+                break
+            previous = remaining
+
+    # Last pass in the transaction that drops the old columns, with new rows blocked
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute('LOCK TABLE metric IN SHARE ROW EXCLUSIVE MODE')
+    op.execute(INSERT_VERSIONS)
+    op.execute(UPDATE_VERSIONS.format(ids='1 = 1'))
+
+    op.drop_index('ix_metric_status_timestamp', table_name='metric')
+    with op.batch_alter_table('metric') as batch_op:
+        for name, _ in NAME_COLUMNS:
+            batch_op.drop_column(name)
+        batch_op.drop_column('status')
+        batch_op.alter_column('status_code', new_column_name='status', nullable=False,
+                              existing_type=sa.SmallInteger())
+        batch_op.alter_column('version_id', nullable=False, existing_type=sa.Integer())
+        batch_op.create_foreign_key('fk_metric_version_id_component_version',
+                                    'component_version', ['version_id'], ['id'])
+    op.create_index('ix_metric_status_timestamp', 'metric', ['status', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('metric') as batch_op:
+        for name, type_ in NAME_COLUMNS:
+            batch_op.add_column(sa.Column(name, type_, nullable=True))
+        batch_op.add_column(sa.Column('status_name', sa.String(length=16), nullable=True))
+
+    _backfill(f"""
+        UPDATE metric
+        SET ({NAMES}, status_name) = (
+            SELECT {', '.join(f'component_version.{name}' for name, _ in NAME_COLUMNS)}, {CODE_TO_STATUS}
+            FROM component_version
+            WHERE component_version.id = metric.version_id
+        )
+        WHERE {{ids}}
+    """)
+
+    op.drop_index('ix_metric_status_timestamp', table_name='metric')
+    with op.batch_alter_table('metric') as batch_op:
+        batch_op.drop_constraint('fk_metric_version_id_component_version', type_='foreignkey')
+        batch_op.drop_column('version_id')
+        batch_op.drop_column('status')
+        batch_op.alter_column('status_name', new_column_name='status', nullable=False,
+                              existing_type=sa.String(length=16))
+        for name, type_ in NAME_COLUMNS:
+            batch_op.alter_column(name, nullable=False, existing_type=type_)
+    op.create_index('ix_metric_status_timestamp', 'metric', ['status', 'timestamp'], unique=False)
+
+    op.drop_index('ix_component_version_component_id', table_name='component_version')
+    op.drop_table('component_version')
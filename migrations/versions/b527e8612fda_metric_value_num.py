@@ -0,0 +1,128 @@
+"""numeric metric value column
+
+Revision ID: b527e8612fda
+Revises: a872688efcdc
+Create Date: 2026-10-17 07:10:00.000000
+
+Existing rows are backfilled like the poller stores new ones: only values of
+components under a threshold classification rule (with the rules in use when
+the migration runs, see CLASSIFICATION_RULES) get a value_num, multiplied by
+the rule's scale. Metric rows are updated by id range, ``BATCH_SIZE`` rows per
+committed UPDATE. In offline (--sql) mode the rules can not be applied and
+existing rows keep a NULL value_num; run scripts/reclassify_metrics.py
+afterwards if rollups of old rows should have values.
+
+"""
+import math
+
+from alembic import context, op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b527e8612fda'
+down_revision = 'a872688efcdc'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('metric', 'latest_metric')
+
+# Plain decimal numbers, small exponents only so the cast can not overflow
+NUMBER_PATTERN = r'^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]{1,2})?\s*$'
+
+# Metric ids per UPDATE (and commit) of the backfill
+BATCH_SIZE = 100000
+
+
+def _numeric(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _scales(classifier, rows):
+    """Group (key, brand, category, oid) rows by the scale of their threshold rule.
+
+    Rows under state rules or without a rule are left out: they get no value_num.
+    """
+    scales = {}
+    for key, brand, category, oid in rows:
+        scale = classifier.measure(classifier.rule_for(brand, category, oid), 1.0)
+        if scale is not None:
+            scales.setdefault(scale, []).append(key)
+    return scales
+
+
+def _backfill_metric(classifier):
+    bind = op.get_bind()
+    versions = bind.execute(sa.text('SELECT id, brand, category, oid FROM component_version')).all()
+    scales = _scales(classifier, versions)
+    low, high = bind.execute(sa.text('SELECT min(id), max(id) FROM metric')).first()
+    if low is None or not scales:
+        return
+
+    is_postgresql = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for start in range(low, high + 1, BATCH_SIZE):
+            for scale, version_ids in scales.items():
+                ids = {'low': start, 'high': start + BATCH_SIZE, 'versions': version_ids}
+                if is_postgresql:
+                    bind.execute(sa.text(f"""
+                        UPDATE metric SET value_num = CAST(value AS double precision) * :scale
+                        WHERE id >= :low AND id < :high AND version_id = ANY(:versions)
+                          AND value ~ '{NUMBER_PATTERN}'
+                    """), {**ids, 'scale': scale})
+                    continue
+                rows = bind.execute(sa.text(
+                    'SELECT id, value FROM metric WHERE id >= :low AND id < :high AND version_id IN :versions'
+                ).bindparams(sa.bindparam('versions', expanding=True)), ids).all()
+                updates = []
+                for id_, value in rows:
+                    number = _numeric(value)
+                    if number is not None:
+                        updates.append({'id': id_, 'number': number * scale})
+                if updates:
+                    bind.execute(sa.text('UPDATE metric SET value_num = :number WHERE id = :id'), updates)
+
+
+def _backfill_latest_metric(classifier):
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("""
+        SELECT latest_metric.component_id, server.brand, component.category, component.oid, latest_metric.value
+        FROM latest_metric
+        JOIN component ON component.id = latest_metric.component_id
+        JOIN server ON server.id = component.server_id
+    """)).all()
+    values = {row[0]: row[4] for row in rows}
+    updates = []
+    for scale, keys in _scales(classifier, [row[:4] for row in rows]).items():
+        for key in keys:
+            number = _numeric(values[key])
+            if number is not None:
+                updates.append({'key': key, 'number': number * scale})
+    if updates:
+        bind.execute(sa.text('UPDATE latest_metric SET value_num = :number WHERE component_id = :key'), updates)
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('value_num', sa.Float(), nullable=True))
+    if not context.is_offline_mode():
+        from app.scheduler.classification import get_classifier
+        classifier = get_classifier(current_app.config.get('CLASSIFICATION_RULES'))
+        _backfill_metric(classifier)
+        _backfill_latest_metric(classifier)
+    op.create_index('ix_metric_value_num_timestamp', 'metric', ['value_num', 'timestamp'], unique=False,
+                    postgresql_where=sa.text('value_num IS NOT NULL'),
+                    sqlite_where=sa.text('value_num IS NOT NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_metric_value_num_timestamp', table_name='metric')
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('value_num')
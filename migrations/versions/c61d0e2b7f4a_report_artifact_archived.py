@@ -0,0 +1,40 @@
+"""report artifact archive flag
+
+Revision ID: c61d0e2b7f4a
+Revises: a320fd9fd24b
+Create Date: 2026-10-17 07:30:00.000000
+
+Artifacts of closed months up to the month of the oldest remaining raw
+metric are marked archived: earlier retention runs built them before
+pruning, so they may be the only copy of those metrics.
+
+"""
+from datetime import datetime
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c61d0e2b7f4a'
+down_revision = 'a320fd9fd24b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('report_artifact', sa.Column('archived', sa.Boolean(), nullable=False,
+                                               server_default=sa.false()))
+    if context.is_offline_mode():
+        return
+    oldest = op.get_bind().execute(sa.text('SELECT min(timestamp) FROM metric')).scalar()
+    if isinstance(oldest, str):  # SQLite
+        oldest = datetime.fromisoformat(oldest)
+    condition = 'closed' if oldest is None else 'closed AND year * 12 + month <= :oldest'
+    op.execute(sa.text(f'UPDATE report_artifact SET archived = true WHERE {condition}')
+               .bindparams(**({} if oldest is None else {'oldest': oldest.year * 12 + oldest.month})))
+
+
+def downgrade():
+    with op.batch_alter_table('report_artifact') as batch_op:
+        batch_op.drop_column('archived')
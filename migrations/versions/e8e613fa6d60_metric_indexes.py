@@ -0,0 +1,37 @@
+"""metric indexes
+
+Revision ID: e8e613fa6d60
+Revises: 1fc612179cbd
+Create Date: 2026-10-17 06:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8e613fa6d60'
+down_revision = '1fc612179cbd'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_metric_component_id_timestamp', ['component_id', sa.text('timestamp DESC')]),
+    ('ix_metric_server_id_timestamp', ['server_id', sa.text('timestamp DESC')]),
+    ('ix_metric_timestamp', ['timestamp']),
+    ('ix_metric_status_timestamp', ['status', 'timestamp']),
+]
+
+
+def upgrade():
+    # Build concurrently so the poller can keep inserting into a large table
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'metric', columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name='metric', postgresql_concurrently=True, if_exists=True)
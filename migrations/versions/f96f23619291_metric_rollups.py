@@ -0,0 +1,56 @@
+"""hourly and daily metric rollups
+
+Revision ID: f96f23619291
+Revises: 4ebdeb20e7c8
+Create Date: 2026-10-17 06:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f96f23619291'
+down_revision = '4ebdeb20e7c8'
+branch_labels = None
+depends_on = None
+
+
+ROLLUP_TABLES = ('metric_hourly', 'metric_daily')
+
+
+def upgrade():
+    for table in ROLLUP_TABLES:
+        op.create_table(table,
+        sa.Column('component_id', sa.Integer(), nullable=False),
+        sa.Column('server_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.Column('ok_count', sa.Integer(), nullable=False),
+        sa.Column('warning_count', sa.Integer(), nullable=False),
+        sa.Column('critical_count', sa.Integer(), nullable=False),
+        sa.Column('unknown_count', sa.Integer(), nullable=False),
+        sa.Column('value_count', sa.Integer(), nullable=False),
+        sa.Column('value_min', sa.Float(), nullable=True),
+        sa.Column('value_max', sa.Float(), nullable=True),
+        sa.Column('value_sum', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['component_id'], ['component.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['server_id'], ['server.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('component_id', 'bucket')
+        )
+        op.create_index(f'ix_{table}_bucket', table, ['bucket'], unique=False)
+
+    # Existing raw metrics are rolled up by the first run of the rollup job
+    op.create_table('rollup_state',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('last_metric_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_state')
+    for table in ROLLUP_TABLES:
+        op.drop_index(f'ix_{table}_bucket', table_name=table)
+        op.drop_table(table)
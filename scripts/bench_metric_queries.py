@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Script untuk benchmark query tabel metric di PostgreSQL.
+
+Membuat tabel sintetis `metric_bench` (struktur sama dengan `metric` yang
+ringkas: version_id ke `metric_bench_version`, status SMALLINT, value_num),
+mengisinya dengan data dummy (default 10 juta baris), lalu menampilkan
+query plan (EXPLAIN ANALYZE) dan latency setiap query dashboard/report
+sebelum dan sesudah index dibuat. Query report bulanan dijalankan dalam
+dua bentuk (extract month/year vs range [start, end)) untuk menunjukkan
+bahwa hanya bentuk range yang bisa memakai index timestamp.
+
+Jalankan dengan: python scripts/bench_metric_queries.py [--rows 10000000]
+
+Atau dengan Docker:
+docker-compose exec web python scripts/bench_metric_queries.py
+"""
+
+import argparse
+import sys
+import os
+import time
+from datetime import timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import create_worker_app, db
+from app.models.metric import STATUS_CODES
+from app.reports.query import month_range
+
+
+TABLE = 'metric_bench'
+VERSIONS = 'metric_bench_version'
+
+# Same definitions as the indexes of app.models.metric.Metric
+INDEXES = [
+    f'CREATE INDEX {TABLE}_component_id_timestamp ON {TABLE} (component_id, timestamp DESC)',
+    f'CREATE INDEX {TABLE}_server_id_timestamp ON {TABLE} (server_id, timestamp DESC)',
+    f'CREATE INDEX {TABLE}_timestamp ON {TABLE} (timestamp)',
+    f'CREATE INDEX {TABLE}_status_timestamp ON {TABLE} (status, timestamp)',
+    f'CREATE INDEX {TABLE}_value_num_timestamp ON {TABLE} (value_num, timestamp) WHERE value_num IS NOT NULL',
+]
+
+QUERIES = [
+    ('latest metric per component (dashboard)',
+     f'SELECT * FROM {TABLE} WHERE server_id = :server_id AND component_id = :component_id '
+     f'ORDER BY timestamp DESC LIMIT 1'),
+    ('component history, last 24 hours',
+     f'SELECT timestamp, value, status FROM {TABLE} WHERE component_id = :component_id '
+     f'AND timestamp >= :day_start ORDER BY timestamp DESC'),
+    ('monthly report, extract(month/year)',
+     f'SELECT count(*) FROM {TABLE} WHERE extract(month FROM timestamp) = :month '
+     f'AND extract(year FROM timestamp) = :year'),
+    ('monthly report, [start, end) range',
+     f'SELECT count(*) FROM {TABLE} WHERE timestamp >= :month_start AND timestamp < :month_end'),
+    ('monthly report rows with names (first 5000)',
+     f'SELECT v.server_name, v.server_ip, v.component_name, v.oid, v.brand, v.category, '
+     f'm.value, m.status, m.timestamp FROM {TABLE} m JOIN {VERSIONS} v ON v.id = m.version_id '
+     f'WHERE m.timestamp >= :month_start AND m.timestamp < :month_end ORDER BY m.timestamp DESC LIMIT 5000'),
+    ('critical metrics, last 24 hours',
+     f'SELECT count(*) FROM {TABLE} WHERE status = :critical AND timestamp >= :day_start'),
+    ('suhu above 60, last 24 hours',
+     f'SELECT count(*) FROM {TABLE} WHERE value_num > 60 AND timestamp >= :day_start'),
+]
+
+
+def create_table(conn, rows, components, servers, days):
+    """Create and fill the synthetic tables with generate_series.
+
+    Columns follow the compact metric schema (app.models.metric): names live
+    in one version row per component, status is a SMALLINT code and suhu
+    readings also have a value_num.
+    """
+    print(f"📦 Membuat {TABLE} dengan {rows:,} baris...")
+    conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+    conn.execute(text(f'DROP TABLE IF EXISTS {VERSIONS}'))
+    conn.execute(text(f"""
+        CREATE TABLE {VERSIONS} (
+            id serial PRIMARY KEY,
+            component_id integer NOT NULL,
+            server_id integer NOT NULL,
+            server_name varchar(128) NOT NULL,
+            server_ip varchar(64) NOT NULL,
+            brand varchar(64) NOT NULL,
+            component_name varchar(128) NOT NULL,
+            category varchar(32) NOT NULL,
+            oid varchar(128) NOT NULL,
+            valid_from timestamp NOT NULL
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE {TABLE} (
+            id serial PRIMARY KEY,
+            server_id integer NOT NULL,
+            component_id integer NOT NULL,
+            version_id integer NOT NULL REFERENCES {VERSIONS} (id),
+            value varchar(128) NOT NULL,
+            value_num double precision,
+            status smallint NOT NULL,
+            timestamp timestamp NOT NULL
+        )
+    """))
+    start = time.perf_counter()
+    conn.execute(text(f"""
+        INSERT INTO {VERSIONS} (id, component_id, server_id, server_name, server_ip, brand,
+                                component_name, category, oid, valid_from)
+        SELECT c + 1,
+               c + 1,
+               c % :servers + 1,
+               'Server ' || (c % :servers + 1),
+               '10.0.' || (c % :servers / 250) || '.' || (c % :servers % 250 + 1),
+               'HPE',
+               'Component ' || c,
+               (ARRAY['fan', 'PSU', 'harddisk', 'suhu'])[c % 4 + 1],
+               '1.3.6.1.4.1.232.6.2.6.7.1.9.0.' || c,
+               now()::timestamp - make_interval(days => :days)
+        FROM generate_series(0, :components - 1) AS c
+    """), {'components': components, 'servers': servers, 'days': days})
+    # One sample per component per step, spread evenly over `days` days;
+    # suhu components read degrees, the others state codes
+    conn.execute(text(f"""
+        INSERT INTO {TABLE} (server_id, component_id, version_id, value, value_num, status, timestamp)
+        SELECT c % :servers + 1,
+               c + 1,
+               c + 1,
+               CASE WHEN c % 4 = 3 THEN (20 + n % 50)::text WHEN n % 31 = 0 THEN '3' ELSE '2' END,
+               CASE WHEN c % 4 = 3 THEN 20 + n % 50 END,
+               CASE WHEN n % 97 = 0 THEN :critical WHEN n % 31 = 0 THEN :warning ELSE :ok END,
+               now()::timestamp - make_interval(secs => (:days * 86400.0) * s / (:rows / :components))
+        FROM generate_series(0, :rows - 1) AS n,
+             LATERAL (SELECT n % :components AS c, n / :components AS s) AS g
+    """), {'rows': rows, 'components': components, 'servers': servers, 'days': days,
+           'ok': STATUS_CODES['OK'], 'warning': STATUS_CODES['Warning'], 'critical': STATUS_CODES['Critical']})
+    conn.execute(text(f'ANALYZE {VERSIONS}'))
+    conn.execute(text(f'ANALYZE {TABLE}'))
+    print(f"✅ Data dibuat dalam {time.perf_counter() - start:.1f}s")
+
+
+def query_params(conn):
+    newest = conn.execute(text(f'SELECT max(timestamp) FROM {TABLE}')).scalar()
+    month_start, month_end = month_range(newest.month, newest.year)
+    return {
+        'month': newest.month,
+        'year': newest.year,
+        'server_id': 7,
+        'component_id': 42,
+        'day_start': newest - timedelta(days=1),
+        'month_start': month_start,
+        'month_end': month_end,
+        'critical': STATUS_CODES['Critical'],
+    }
+
+
+def run_queries(conn, params, repeat):
+    """Print the plan of each query and return its median latency in ms."""
+    results = {}
+    for name, sql in QUERIES:
+        plan = conn.execute(text(f'EXPLAIN (ANALYZE, BUFFERS) {sql}'), params).scalars().all()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = sorted(timings)[len(timings) // 2]
+        print(f"\n--- {name}: {results[name]:.2f} ms")
+        for line in plan:
+            print(f"    {line}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark metric table queries before/after indexing.')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--components', type=int, default=2000)
+    parser.add_argument('--servers', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query, median is reported')
+    parser.add_argument('--keep', action='store_true', help=f'keep {TABLE} and {VERSIONS} after the benchmark')
+    args = parser.parse_args()
+
+    app = create_worker_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("❌ Benchmark ini membutuhkan PostgreSQL (DATABASE_URL)")
+            sys.exit(1)
+
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            create_table(conn, args.rows, args.components, args.servers, args.days)
+            params = query_params(conn)
+
+            print("\n" + "=" * 50 + "\n  SEBELUM INDEX\n" + "=" * 50)
+            before = run_queries(conn, params, args.repeat)
+
+            start = time.perf_counter()
+            for ddl in INDEXES:
+                conn.execute(text(ddl))
+            conn.execute(text(f'ANALYZE {TABLE}'))
+            print(f"\n🔧 Index dibuat dalam {time.perf_counter() - start:.1f}s")
+
+            print("\n" + "=" * 50 + "\n  SESUDAH INDEX\n" + "=" * 50)
+            after = run_queries(conn, params, args.repeat)
+
+            print("\n" + "=" * 50 + "\n  RINGKASAN (median ms)\n" + "=" * 50)
+            for name, _ in QUERIES:
+                print(f"{name:45} {before[name]:>10.2f} -> {after[name]:>8.2f}  ({before[name] / max(after[name], 0.001):.0f}x)")
+
+            if not args.keep:
+                conn.execute(text(f'DROP TABLE {TABLE}'))
+                conn.execute(text(f'DROP TABLE {VERSIONS}'))
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("  BENCHMARK QUERY METRIC - Server Monitoring")
+    print("=" * 50)
+    main()
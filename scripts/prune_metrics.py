@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Script untuk menghapus data metric mentah yang lebih tua dari masa retensi.
+
+Hanya baris yang sudah masuk rollup (metric_hourly/metric_daily) yang dihapus,
+dan report bulanan dari bulan yang terdampak disimpan dulu ke cache report.
+Penghapusan dilakukan per batch kecil dengan jeda, agar insert dari poller
+tidak terhambat. Gunakan --dry-run untuk melihat jumlah baris tanpa menghapus.
+
+Jalankan dengan: python scripts/prune_metrics.py [--days 365] [--dry-run]
+
+Atau dengan Docker:
+docker-compose exec web python scripts/prune_metrics.py --dry-run
+"""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_worker_app
+from app.scheduler.rollup import run_rollup
+from app.scheduler.retention import prune_metrics
+
+
+def main():
+    app = create_worker_app()
+    config = app.config
+
+    parser = argparse.ArgumentParser(description='Prune raw metrics older than the retention period.')
+    parser.add_argument('--days', type=int, default=config.get('METRIC_RETENTION_DAYS'),
+                        help='retention in days (METRIC_RETENTION_DAYS)')
+    parser.add_argument('--dry-run', action='store_true', help='only count the rows that would be pruned')
+    parser.add_argument('--batch-size', type=int, default=config.get('RETENTION_BATCH_SIZE', 5000))
+    parser.add_argument('--pause', type=float, default=config.get('RETENTION_BATCH_PAUSE', 0.5),
+                        help='seconds to sleep between batches')
+    parser.add_argument('--max-seconds', type=int, default=config.get('RETENTION_MAX_SECONDS', 600),
+                        help='stop after this many seconds, the next run continues')
+    parser.add_argument('--no-keep-reports', action='store_true',
+                        help='do not archive monthly reports first, only prune months already archived')
+    args = parser.parse_args()
+
+    if args.days <= 0:
+        print("❌ Retensi harus lebih dari 0 hari")
+        sys.exit(1)
+
+    with app.app_context():
+        if not args.dry_run:
+            print("📊 Memperbarui rollup sebelum menghapus...")
+            run_rollup(batch_size=config.get('ROLLUP_BATCH_SIZE', 50000),
+                       lag_seconds=config.get('ROLLUP_LAG_SECONDS', 600))
+
+        stats = prune_metrics(
+            args.days,
+            batch_size=args.batch_size,
+            pause=args.pause,
+            max_seconds=args.max_seconds,
+            keep_reports=not args.no_keep_reports,
+            dry_run=args.dry_run,
+            chunk_size=config.get('REPORT_CHUNK_SIZE', 5000)
+        )
+
+    print(f"\n📅 Batas waktu: {stats['cutoff']:%Y-%m-%d %H:%M}")
+    if args.dry_run:
+        print(f"🔍 Dry run: {stats['rows']:,} baris akan dihapus")
+        if stats['partitions']:
+            print(f"🧱 {stats['partitions']} partisi bulanan akan dihapus")
+    else:
+        print(f"🗑️  {stats['rows']:,} baris dihapus dalam {stats['batches']} batch")
+        if stats['partitions']:
+            print(f"🧱 {stats['partitions']} partisi bulanan dihapus")
+    print(f"⏱️  Waktu: {stats['duration']:.2f}s")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("  RETENSI DATA METRIC - Server Monitoring")
+    print("=" * 50)
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Script untuk menghitung ulang status metric yang sudah tersimpan.
+
+Jalankan setelah aturan klasifikasi (threshold, state) diubah. Data metric
+dibaca per chunk, diklasifikasi ulang secara vektor (NumPy/pandas) per
+brand/kategori, lalu status yang berubah ditulis kembali per batch bersama
+koreksi rollup. Report bulanan dari bulan yang berubah akan dibuat ulang,
+sedangkan report arsip (bulan yang metric mentahnya sudah dihapus retensi)
+diperbarui statusnya langsung.
+Gunakan --dry-run untuk melihat perubahan tanpa menulis.
+
+Jalankan dengan: python scripts/reclassify_metrics.py [--start 2026-01-01] [--end 2026-02-01] [--dry-run]
+
+Atau dengan Docker:
+docker-compose exec web python scripts/reclassify_metrics.py --dry-run
+"""
+
+import argparse
+import sys
+import os
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_worker_app
+from app.scheduler.reclassify import reclassify_metrics
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Format tanggal harus YYYY-MM-DD: {value}")
+
+
+def print_progress(stats):
+    print(f"   {stats['rows']:,} baris dibaca, {stats['changed']:,} berubah "
+          f"({stats['rate']:,.0f} baris/detik)")
+
+
+def main():
+    app = create_worker_app()
+    config = app.config
+
+    parser = argparse.ArgumentParser(description='Reclassify stored metrics with the current rules.')
+    parser.add_argument('--start', type=parse_date, help='first day (YYYY-MM-DD), default all data')
+    parser.add_argument('--end', type=parse_date, help='day after the last day (YYYY-MM-DD)')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='metrics read per chunk')
+    parser.add_argument('--rules', default=config.get('CLASSIFICATION_RULES'),
+                        help='classification rules file (CLASSIFICATION_RULES)')
+    parser.add_argument('--dry-run', action='store_true', help='only count the statuses that would change')
+    args = parser.parse_args()
+
+    with app.app_context():
+        print("🔄 Klasifikasi ulang metric...")
+        stats = reclassify_metrics(
+            start=args.start,
+            end=args.end,
+            chunk_size=args.chunk_size,
+            dry_run=args.dry_run,
+            rules_path=args.rules,
+            progress=print_progress
+        )
+
+    print(f"\n📊 {stats['rows']:,} baris diperiksa")
+    if args.dry_run:
+        print(f"🔍 Dry run: {stats['changed']:,} status akan berubah")
+    else:
+        print(f"✅ {stats['changed']:,} status diperbarui")
+        if stats['archived']:
+            print(f"🗄️  {stats['archived']:,} status di report arsip diperbarui")
+    for transition, count in sorted(stats['transitions'].items()):
+        print(f"   {transition}: {count:,}")
+    print(f"⏱️  Waktu: {stats['duration']:.2f}s ({stats['rate']:,.0f} baris/detik)")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("  KLASIFIKASI ULANG METRIC - Server Monitoring")
+    print("=" * 50)
+    main()
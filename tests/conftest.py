@@ -0,0 +1,85 @@
+import logging
+
+import pytest
+
+from app import bcrypt, create_app, db
+from app.models.metric import ComponentVersion, LatestMetric, Metric
+from app.models.server import Component, Server
+from app.models.user import RoleEnum, User
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App on an empty in-memory database (see TestingConfig), inside an app context."""
+    # setup_logging writes logs/ relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('ENABLE_SCHEDULER', 'false')
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+
+    app = create_app('testing')
+    app.config['REPORT_DIR'] = str(tmp_path / 'reports')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+    for handler in root.handlers[:]:
+        if handler not in handlers:
+            root.removeHandler(handler)
+            handler.close()
+
+
+@pytest.fixture
+def client(app):
+    """Test client logged in as an admin."""
+    password = 'admin-password'
+    db.session.add(User(username='admin', password_hash=bcrypt.generate_password_hash(password).decode(),
+                        role=RoleEnum.admin))
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': password})
+    return client
+
+
+@pytest.fixture
+def make_component(app):
+    """Create a component (and its server and first version) and return (component, version)."""
+    servers = {}
+
+    def make(server_name='srv-1', name='PSU 1', category='PSU', brand='HPE', oid='1.3.6.1.4.1.232.6.2.9.3.1.4.0.1'):
+        server = servers.get(server_name)
+        if server is None:
+            server = servers[server_name] = Server(name=server_name, ip=f'10.0.0.{len(servers) + 1}',
+                                                   brand=brand, snmp_version='v2c', community='public')
+            db.session.add(server)
+            db.session.flush()
+        component = Component(name=name, oid=oid, category=category, brand=server.brand, server_id=server.id)
+        db.session.add(component)
+        db.session.flush()
+        version = ComponentVersion(component_id=component.id, server_id=server.id,
+                                   **ComponentVersion.snapshot(server, component))
+        db.session.add(version)
+        db.session.commit()
+        return component, version
+
+    return make
+
+
+@pytest.fixture
+def add_metrics(app):
+    """Store raw metrics of a component version at the given timestamps."""
+
+    def add(version, timestamps, value='2', status='OK', value_num=None, latest=False):
+        for timestamp in timestamps:
+            db.session.add(Metric(server_id=version.server_id, component_id=version.component_id,
+                                  version_id=version.id, value=value, value_num=value_num, status=status,
+                                  timestamp=timestamp))
+        if latest:
+            db.session.merge(LatestMetric(component_id=version.component_id, server_id=version.server_id,
+                                          value=value, value_num=value_num, status=status,
+                                          timestamp=max(timestamps)))
+        db.session.commit()
+
+    return add
@@ -0,0 +1,144 @@
+import json
+import os
+
+import pytest
+
+from app.scheduler.classification import (
+    DEFAULT_RULES_PATH, Classifier, RulesError, StateRule, ThresholdRule, get_classifier, load_classifier
+)
+
+DELL_TEMPERATURE_READING = '1.3.6.1.4.1.674.10892.5.4.700.20.1.6.1.1'
+DELL_PSU_STATUS = '1.3.6.1.4.1.674.10892.5.4.600.12.1.5.1.1'
+
+
+@pytest.fixture
+def classifier():
+    return load_classifier(DEFAULT_RULES_PATH)
+
+
+@pytest.mark.parametrize('value, status', [
+    ('2', 'OK'), (' OK ', 'OK'), ('Good', 'OK'), ('3', 'Warning'), ('degraded', 'Warning'),
+    ('4', 'Critical'), ('failed', 'Critical'), ('', 'Unknown'), (None, 'Unknown'),
+])
+def test_state_rule(classifier, value, status):
+    assert classifier.classify('HPE', 'PSU', '1.2.3', value) == status
+
+
+@pytest.mark.parametrize('value, status', [
+    ('49', 'OK'), ('49.9', 'OK'), ('50', 'Warning'), ('59', 'Warning'), ('60', 'Critical'),
+    ('hot', 'Critical'), ('nan', 'Critical'), ('', 'Unknown'),
+])
+def test_threshold_rule(classifier, value, status):
+    assert classifier.classify('HPE', 'suhu', '1.2.3', value) == status
+
+
+def test_brand_rules(classifier):
+    # 52 degrees is within Dell's limits but over HPE's
+    assert classifier.classify('Dell', 'suhu', '1.2.3', '52') == 'OK'
+    assert classifier.classify('HPE', 'suhu', '1.2.3', '52') == 'Warning'
+    # Unknown brands use default_brand ("custom": suhu is a state there)
+    assert classifier.classify('Lenovo', 'suhu', '1.2.3', 'ok') == 'OK'
+    assert classifier.classify('Lenovo', 'suhu', '1.2.3', '57') == 'Critical'
+    # Categories without a rule get default_status
+    assert classifier.classify('HPE', 'network', '1.2.3', 'down') == 'OK'
+
+
+def test_scaled_threshold(classifier):
+    rule = classifier.rule_for('Dell', 'suhu', DELL_TEMPERATURE_READING)
+    assert [classifier.apply(rule, value) for value in ('450', '600', '700')] == ['OK', 'Warning', 'Critical']
+    assert classifier.measure(rule, 450.0) == pytest.approx(45.0)
+
+
+def test_measure_only_threshold_rules(classifier):
+    assert classifier.measure(classifier.rule_for('HPE', 'suhu'), 55.0) == 55.0
+    assert classifier.measure(classifier.rule_for('HPE', 'PSU'), 2.0) is None
+    assert classifier.measure(classifier.rule_for('HPE', 'network'), 2.0) is None
+    assert classifier.measure(classifier.rule_for('HPE', 'suhu'), None) is None
+
+
+def test_oid_prefix_override(classifier):
+    # Dell status columns use 3 for OK, unlike the generic state rule
+    assert classifier.classify('Dell', 'PSU', DELL_PSU_STATUS, '3') == 'OK'
+    assert classifier.classify('Dell', 'PSU', DELL_PSU_STATUS, '4') == 'Warning'
+    assert classifier.classify('Dell', 'PSU', DELL_PSU_STATUS, '2') == 'Critical'
+    # Prefixes match whole arcs only
+    assert classifier.classify('Dell', 'PSU', DELL_PSU_STATUS.replace('.5.1.1', '.50.1.1'), '2') == 'OK'
+
+
+@pytest.mark.parametrize('value, status', [('2', 'OK'), ('3', 'Critical'), ('4', 'Warning'), ('1', 'Critical')])
+def test_hpe_drive_status_column(classifier, value, status):
+    # cpqDaPhyDrvStatus of drives discovered before the condition column was used
+    assert classifier.classify('HPE', 'harddisk', '1.3.6.1.4.1.232.3.2.5.1.1.6.0.1', value) == status
+    # cpqDaPhyDrvCondition: 3 is degraded
+    assert classifier.classify('HPE', 'harddisk', '1.3.6.1.4.1.232.3.2.5.1.1.37.0.1', '3') == 'Warning'
+
+
+def test_oid_override_before_prefix_and_brand():
+    classifier = Classifier({
+        'rules': {'state': {'type': 'state', 'ok': ['1']}},
+        'brands': {'HPE': {'fan': 'state'}},
+        'oids': {'1.2.3.4': {'type': 'threshold', 'bounds': [10], 'statuses': ['OK', 'Critical']}},
+        'oid_prefixes': {'1.2.3.': {'type': 'state', 'ok': ['up']}},
+    })
+    assert classifier.classify('HPE', 'fan', '1.2.3.4', '5') == 'OK'
+    assert classifier.classify('HPE', 'fan', '1.2.3.5', 'up') == 'OK'
+    assert classifier.classify('HPE', 'fan', '1.2.3.5', '1') == 'Critical'
+    assert classifier.classify('HPE', 'fan', '1.2.4.1', '1') == 'OK'
+
+
+def test_classify_server(classifier, make_component):
+    component, _ = make_component(brand='Dell', category='suhu', oid=DELL_TEMPERATURE_READING)
+    other, _ = make_component(category='PSU', oid='1.2.3')
+    results = [(component, '700', 700.0), (other, '2', 2.0), (other, '', None)]
+    assert classifier.classify_server(component.server, results) == [
+        ('Critical', pytest.approx(70.0)), ('OK', None), ('Unknown', None)
+    ]
+
+
+def test_invalid_rules():
+    with pytest.raises(RulesError):
+        ThresholdRule([60, 50], ['OK', 'Warning', 'Critical'])
+    with pytest.raises(RulesError):
+        ThresholdRule([50], ['OK'])
+    with pytest.raises(RulesError):
+        Classifier({'brands': {'HPE': {'fan': 'missing'}}})
+    with pytest.raises(RulesError):
+        Classifier({'rules': {'broken': {'type': 'state'}}})
+    assert StateRule(['OK'], ['warn'])('ok', None) == 'OK'
+
+
+def _write_rules(path, suhu_bounds, mtime):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'brands': {'custom': {'suhu': {
+            'type': 'threshold', 'bounds': suhu_bounds, 'statuses': ['OK', 'Warning', 'Critical']
+        }}}}, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_reload_on_change(tmp_path):
+    path = str(tmp_path / 'rules.json')
+    _write_rules(path, [50, 60], 1000)
+    assert get_classifier(path).classify('custom', 'suhu', None, '55') == 'Warning'
+    assert get_classifier(path) is get_classifier(path)
+
+    _write_rules(path, [70, 80], 2000)
+    assert get_classifier(path).classify('custom', 'suhu', None, '55') == 'OK'
+
+
+def test_reload_keeps_previous_rules_on_error(tmp_path):
+    path = str(tmp_path / 'rules.json')
+    _write_rules(path, [50, 60], 1000)
+    previous = get_classifier(path)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"brands": ')
+    os.utime(path, (2000, 2000))
+    assert get_classifier(path) is previous
+
+    os.remove(path)
+    assert get_classifier(path) is previous
+
+
+def test_missing_rules_file_uses_defaults(tmp_path):
+    classifier = get_classifier(str(tmp_path / 'missing.json'))
+    assert classifier.classify('HPE', 'suhu', None, '55') == 'Warning'
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.dashboard_state import (
+    InvalidCursor, decode_change_cursor, decode_cursor, encode_change_cursor, encode_cursor, get_current_state,
+    get_data_version, get_status_counts
+)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('server', 'asc', ('srv-1', 'srv-1', 3, 7))
+    assert '=' not in cursor
+    assert decode_cursor(cursor, 'server', 'asc') == ('srv-1', 'srv-1', 3, 7)
+
+
+def test_timestamp_cursor_round_trip():
+    timestamp = datetime(2026, 3, 4, 5, 6, 7, 890)
+    cursor = encode_cursor('timestamp', 'desc', (timestamp, 'srv-1', 3, 7))
+    assert decode_cursor(cursor, 'timestamp', 'desc') == (timestamp, 'srv-1', 3, 7)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', 'W10', encode_cursor('server', 'asc', ('srv-1',))])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 'server', 'asc')
+
+
+def test_cursor_of_another_sort():
+    cursor = encode_cursor('server', 'asc', ('srv-1', 'srv-1', 3, 7))
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 'server', 'desc')
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 'timestamp', 'asc')
+
+
+def test_change_cursor_round_trip():
+    version = (12, datetime(2026, 3, 4, 5, 6, 7), 10, 10, 15)
+    assert decode_change_cursor(encode_change_cursor(version)) == version
+    assert decode_change_cursor(encode_change_cursor((0, None, 0, None, None))) == (0, None, 0, None, None)
+    with pytest.raises(InvalidCursor):
+        decode_change_cursor(encode_cursor('server', 'asc', ('srv-1', 'srv-1', 3, 7)))
+
+
+@pytest.fixture
+def dashboard(make_component, add_metrics):
+    """Three servers with components of mixed names, statuses and poll times; some never polled."""
+    polled = datetime(2026, 3, 1, 12, 0)
+    statuses = ['OK', 'Warning', 'Critical']
+    for s, server_name in enumerate(['beta', 'Alpha', 'gamma']):
+        for c in range(5):
+            component, version = make_component(server_name=server_name, name=f'Comp {(c * 7) % 5}',
+                                                category=['PSU', 'fan'][c % 2], oid=f'1.2.{s}.{c}')
+            if (s + c) % 4:
+                # Equal timestamps on some rows, so ties are broken by server and component
+                add_metrics(version, [polled + timedelta(minutes=(s * c) % 3)], status=statuses[(s + c) % 3],
+                            latest=True)
+
+
+def _ids(rows):
+    return [component.id for _, component, _ in rows]
+
+
+@pytest.mark.parametrize('sort_by', ['server', 'component', 'category', 'status', 'timestamp'])
+@pytest.mark.parametrize('sort_order', ['asc', 'desc'])
+def test_pagination_matches_unpaginated(dashboard, sort_by, sort_order):
+    expected, cursor = get_current_state(sort_by=sort_by, sort_order=sort_order)
+    assert cursor is None and len(expected) == 15
+
+    pages, cursor = [], None
+    while True:
+        rows, cursor = get_current_state(sort_by=sort_by, sort_order=sort_order, cursor=cursor, limit=4)
+        assert len(rows) <= 4
+        pages.append(_ids(rows))
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [4, 4, 4, 3]
+    assert sum(pages, []) == _ids(expected)
+
+
+def test_pagination_with_filters(dashboard):
+    expected, _ = get_current_state(category='PSU', sort_by='timestamp', sort_order='desc')
+    rows, cursor = get_current_state(category='PSU', sort_by='timestamp', sort_order='desc', limit=5)
+    more, last = get_current_state(category='PSU', sort_by='timestamp', sort_order='desc', cursor=cursor, limit=5)
+    assert last is None
+    assert _ids(rows) + _ids(more) == _ids(expected)
+    assert all(component.category == 'PSU' for _, component, _ in expected)
+
+
+def test_sort_order(dashboard):
+    rows, _ = get_current_state(sort_by='server')
+    names = [server.name.lower() for server, _, _ in rows]
+    assert names == sorted(names)
+    # Components without data sort after every status
+    rows, _ = get_current_state(sort_by='status')
+    assert [metric is None for _, _, metric in rows] == sorted(metric is None for _, _, metric in rows)
+
+
+def test_status_counts(dashboard):
+    counts = get_status_counts()
+    assert sum(counts.values()) == 15
+    assert counts['no_data'] == len(get_current_state(status='no_data')[0]) == 4
+    assert counts['Warning'] == len(get_current_state(status='Warning')[0])
+
+
+def test_data_version_changes_with_components(dashboard, make_component):
+    version = get_data_version()
+    make_component(server_name='delta', oid='1.2.9.9')
+    assert get_data_version()[2:] != version[2:]
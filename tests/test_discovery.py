@@ -0,0 +1,24 @@
+from app.models.server import Component
+from app.scheduler import discovery
+
+DRIVE_STATUS = '1.3.6.1.4.1.232.3.2.5.1.1.6'
+DRIVE_CONDITION = '1.3.6.1.4.1.232.3.2.5.1.1.37'
+DRIVE_NAME = '1.3.6.1.4.1.232.3.2.5.1.1.64'
+
+
+def test_hpe_drives_move_to_condition_column(make_component, monkeypatch):
+    component, _ = make_component(name='Drive 0.1', category='harddisk', oid=f'{DRIVE_STATUS}.0.1')
+    walked = {
+        DRIVE_CONDITION: {f'{DRIVE_CONDITION}.0.1': '2', f'{DRIVE_CONDITION}.0.2': '3'},
+        DRIVE_NAME: {f'{DRIVE_NAME}.0.2': 'Port 1I Box 1 Bay 2'},
+    }
+    monkeypatch.setattr(discovery, 'walk_columns', lambda server, columns, *args, **kwargs: {
+        column: walked.get(column, {}) for column in columns
+    })
+
+    stats = discovery.discover_components(component.server)
+    assert stats == {'created': 1, 'updated': 1, 'unchanged': 0, 'failed': 0}
+    assert sorted((c.oid, c.name) for c in Component.query.filter_by(category='harddisk')) == [
+        (f'{DRIVE_CONDITION}.0.1', 'Drive 0.1'),
+        (f'{DRIVE_CONDITION}.0.2', 'Port 1I Box 1 Bay 2'),
+    ]
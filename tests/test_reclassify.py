@@ -0,0 +1,93 @@
+import csv
+from datetime import timedelta
+
+import pytest
+
+from app import db
+from app.models.metric import Metric, wib_now
+from app.models.report import ReportArtifact
+from app.reports.cache import get_report_file
+from app.scheduler.classification import NO_RESPONSE
+from app.scheduler.reclassify import reclassify_metrics
+from app.scheduler.retention import prune_metrics
+from app.scheduler.rollup import run_rollup
+
+
+def _statuses(path, column):
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    index = rows[0].index(column)
+    return [row[index] for row in rows[1:]]
+
+
+@pytest.fixture
+def partially_pruned(make_component, add_metrics):
+    """A month cut by the retention cutoff: 8 rows pruned, 4 left, all stored OK at 55 degrees.
+
+    Under the default rules 55 degrees on an HPE server is a Warning.
+    """
+    _, version = make_component(name='Suhu 1', category='suhu', oid='1.3.6.1.4.1.232.6.2.6.8.1.4.0.1')
+    cutoff = wib_now() - timedelta(days=365)
+    add_metrics(version, [cutoff - timedelta(seconds=second) for second in range(1, 9)], value='55')
+    add_metrics(version, [cutoff + timedelta(minutes=minute) for minute in range(1, 5)], value='55')
+    run_rollup(lag_seconds=0)
+    assert prune_metrics(365, pause=0)['rows'] == 8
+    return cutoff
+
+
+def test_reclassify_keeps_archive_of_partially_pruned_month(partially_pruned):
+    cutoff = partially_pruned
+    path, count = get_report_file(cutoff.month, cutoff.year, 'admin', 'csv')
+    assert count == 12
+    assert _statuses(path, 'Status Metric') == ['OK'] * 12
+
+    stats = reclassify_metrics()
+    assert stats['changed'] == 4
+    assert stats['archived'] == 2 * 12  # every row of both layouts
+    assert db.session.query(Metric.status).distinct().all() == [('Warning',)]
+
+    artifacts = ReportArtifact.query.filter_by(month=cutoff.month, year=cutoff.year).all()
+    assert len(artifacts) == 2
+    assert all(artifact.archived and artifact.row_count == 12 for artifact in artifacts)
+    # The download is rendered again from the rewritten rows
+    path, count = get_report_file(cutoff.month, cutoff.year, 'admin', 'csv')
+    assert count == 12
+    assert _statuses(path, 'Status Metric') == ['Warning'] * 12
+    path, _ = get_report_file(cutoff.month, cutoff.year, 'dashboard', 'csv')
+    assert _statuses(path, 'Status') == ['Warning'] * 12
+
+
+def test_reclassify_archive_is_idempotent(partially_pruned):
+    reclassify_metrics()
+    stats = reclassify_metrics()
+    assert stats['changed'] == stats['archived'] == 0
+
+
+def test_reclassify_dry_run_keeps_archive(partially_pruned):
+    cutoff = partially_pruned
+    stats = reclassify_metrics(dry_run=True)
+    assert stats['changed'] == 4 and stats['archived'] == 0
+    path, _ = get_report_file(cutoff.month, cutoff.year, 'admin', 'csv')
+    assert _statuses(path, 'Status Metric') == ['OK'] * 12
+
+
+def test_reclassify_outside_range_keeps_archive(partially_pruned):
+    cutoff = partially_pruned
+    stats = reclassify_metrics(start=cutoff + timedelta(days=40))
+    assert stats['archived'] == 0
+    path, _ = get_report_file(cutoff.month, cutoff.year, 'admin', 'csv')
+    assert _statuses(path, 'Status Metric') == ['OK'] * 12
+
+
+def test_no_response_keeps_status(make_component, add_metrics):
+    _, version = make_component(name='Suhu 1', category='suhu', oid='1.2.3')
+    old = wib_now() - timedelta(days=400)
+    # Stored before unanswered polls were Critical
+    add_metrics(version, [old], value=NO_RESPONSE, status='Unknown')
+    add_metrics(version, [old + timedelta(hours=1)], value='70', status='OK')
+    run_rollup(lag_seconds=0)
+    assert prune_metrics(365, pause=0)['rows'] == 2
+
+    reclassify_metrics()
+    path, _ = get_report_file(old.month, old.year, 'admin', 'csv')
+    assert _statuses(path, 'Status Metric') == ['Critical', 'Unknown']
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+import pytest
+
+from app.models.metric import wib_now
+from app.models.report import JOB_DONE, JOB_QUEUED, ReportJob
+from app.reports import jobs
+
+
+class InlineExecutor:
+    """Runs report jobs in the request that queues them."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class HeldExecutor:
+    """Keeps report jobs queued."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+
+
+@pytest.fixture
+def inline_jobs(monkeypatch):
+    monkeypatch.setattr(jobs, '_get_executor', lambda max_workers: InlineExecutor())
+
+
+@pytest.fixture
+def last_year(make_component, add_metrics):
+    _, version = make_component()
+    month = wib_now().replace(day=1) - timedelta(days=340)
+    add_metrics(version, [month + timedelta(hours=hour) for hour in range(5)])
+    return month
+
+
+def test_cache_miss_queues_job(client, inline_jobs, last_year):
+    form = {'month': last_year.month, 'year': last_year.year, 'format': 'csv'}
+    response = client.post('/admin/report', data=form)
+    assert response.status_code == 303
+    job = ReportJob.query.one()
+    assert response.location.endswith(f'/reports/jobs/{job.id}/download')
+    assert job.status == JOB_DONE
+
+    response = client.get(response.location)
+    assert response.status_code == 200
+    assert len(response.data.decode().splitlines()) == 6
+
+    # Ready in the cache: served directly, no new job
+    response = client.post('/admin/report', data=form)
+    assert response.status_code == 200
+    assert len(response.data.decode().splitlines()) == 6
+    assert ReportJob.query.count() == 1
+
+
+def test_requests_join_the_running_job(client, monkeypatch, last_year):
+    executor = HeldExecutor()
+    monkeypatch.setattr(jobs, '_get_executor', lambda max_workers: executor)
+    form = {'month': last_year.month, 'year': last_year.year, 'format': 'xlsx'}
+    first = client.post('/admin/report', data=form)
+    second = client.post('/admin/report', data=form)
+    assert first.location == second.location
+    assert len(executor.submitted) == 1
+
+    response = client.get(first.location)
+    assert response.status_code == 202
+    assert response.headers['Refresh'] == '3'
+    assert ReportJob.query.one().status == JOB_QUEUED
+
+
+def test_dashboard_download_queues_job(client, inline_jobs, make_component, add_metrics):
+    _, version = make_component()
+    add_metrics(version, [wib_now() - timedelta(minutes=5)])
+    now = wib_now()
+    form = {'month': now.month, 'year': now.year, 'format': 'csv'}
+    # The current month is never served without refreshing it first
+    for _ in range(2):
+        response = client.post('/download-report', data=form)
+        assert response.status_code == 303
+        assert '/reports/jobs/' in response.location
+    assert ReportJob.query.filter_by(layout='dashboard').count() == 2
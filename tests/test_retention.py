@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from app import db
+from app.models.metric import Metric, wib_now
+from app.models.report import ReportArtifact
+from app.models.rollup import MetricDaily, MetricHourly
+from app.reports.cache import invalidate_report_artifacts
+from app.scheduler.retention import prune_metrics
+from app.scheduler.rollup import run_rollup
+
+
+@pytest.fixture
+def version(make_component):
+    return make_component()[1]
+
+
+def _month_start(months_ago):
+    today = wib_now()
+    month = today.year * 12 + today.month - 1 - months_ago
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def _metric_count():
+    return db.session.query(func.count(Metric.id)).scalar()
+
+
+def _samples(model):
+    return db.session.query(func.sum(model.samples)).scalar() or 0
+
+
+def test_prune_keeps_rows_not_rolled_up(version, add_metrics):
+    old = _month_start(15)
+    add_metrics(version, [old + timedelta(days=day) for day in range(10)])
+
+    assert prune_metrics(365, pause=0)['rows'] == 0
+    assert _metric_count() == 10
+
+    run_rollup(lag_seconds=0)
+    assert prune_metrics(365, pause=0)['rows'] == 10
+    assert _metric_count() == 0
+    # The rolled up history outlives the raw rows
+    assert _samples(MetricDaily) == _samples(MetricHourly) == 10
+
+
+def test_prune_waits_for_rows_added_after_rollup(version, add_metrics):
+    old = _month_start(15)
+    add_metrics(version, [old + timedelta(days=day) for day in range(5)])
+    run_rollup(lag_seconds=0)
+    # Backfilled rows get ids above the watermark
+    add_metrics(version, [old + timedelta(days=day, hours=1) for day in range(5)])
+
+    assert prune_metrics(365, pause=0)['rows'] == 5
+    assert _metric_count() == 5
+
+    run_rollup(lag_seconds=0)
+    assert prune_metrics(365, pause=0)['rows'] == 5
+    assert _samples(MetricDaily) == 10
+
+
+def test_rollup_lag_protects_recent_rows(version, add_metrics):
+    old = _month_start(15)
+    add_metrics(version, [old + timedelta(days=day) for day in range(5)])
+    # A poll still being written is left to the next run
+    add_metrics(version, [wib_now()])
+
+    assert run_rollup(lag_seconds=600)['rows'] == 5
+    assert run_rollup(lag_seconds=600)['rows'] == 0
+    assert prune_metrics(365, pause=0)['rows'] == 5
+    assert _metric_count() == 1
+
+
+def test_prune_only_rows_past_cutoff(version, add_metrics):
+    now = wib_now()
+    add_metrics(version, [now - timedelta(days=400), now - timedelta(days=300), now - timedelta(days=1)])
+    run_rollup(lag_seconds=0)
+
+    stats = prune_metrics(365, pause=0)
+    assert stats['rows'] == 1
+    assert db.session.query(func.min(Metric.timestamp)).scalar() > now - timedelta(days=365)
+
+
+def test_dry_run_deletes_nothing(version, add_metrics):
+    add_metrics(version, [_month_start(15) + timedelta(days=day) for day in range(4)])
+    run_rollup(lag_seconds=0)
+
+    assert prune_metrics(365, dry_run=True)['rows'] == 4
+    assert _metric_count() == 4
+    assert ReportArtifact.query.count() == 0
+
+
+def test_pruned_months_are_archived(version, add_metrics):
+    old = _month_start(15)
+    add_metrics(version, [old + timedelta(days=day) for day in range(10)])
+    run_rollup(lag_seconds=0)
+
+    prune_metrics(365, pause=0)
+    artifacts = ReportArtifact.query.all()
+    assert len(artifacts) == 2
+    assert all(artifact.archived and artifact.row_count == 10 for artifact in artifacts)
+
+    # Invalidation (e.g. deleting a server) keeps the only copy of the pruned rows
+    assert invalidate_report_artifacts(None, None) == 0
+    assert ReportArtifact.query.count() == 2
+
+
+def test_prune_without_archive_skips_month(version, add_metrics):
+    add_metrics(version, [_month_start(15) + timedelta(days=day) for day in range(10)])
+    run_rollup(lag_seconds=0)
+
+    stats = prune_metrics(365, pause=0, keep_reports=False)
+    assert stats['rows'] == 0
+    assert stats['cutoff'] == _month_start(15)
+    assert _metric_count() == 10